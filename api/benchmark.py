@@ -0,0 +1,309 @@
+"""Benchmarks of the API queries and of realistic visualizer traffic.
+
+micro times each query behind the endpoints in main.py, one call after another,
+straight against the configured backend (DATA_BACKEND and the DB_* settings).
+load replays the request mix of a profile with concurrent clients, against the app
+in-process or against a running API at --url. Both report p50/p95/p99 latency,
+throughput and the time spent executing SQL statements, which is only measured for
+the PostgreSQL backend in this process. Results can be saved as a baseline, and
+compared with one: the run exits with status 1 when a benchmark got slower than its
+baseline by more than --tolerance.
+
+Load the data to measure first, such as a synthetic release from synthetic_data.py.
+
+Usage: python benchmark.py micro [--iterations 30] [--save baseline.json] [--baseline baseline.json]
+       python benchmark.py load [--profile visualizer] [--concurrency 8] [--duration 30] [--url URL]
+"""
+import argparse
+import asyncio
+import contextvars
+import json
+import random
+import sys
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from urllib.parse import quote
+
+import httpx
+import numpy as np
+from sqlalchemy import event
+
+import columnar
+import database
+import repository
+
+# Seconds spent in SQL statements by the current benchmark call, as a one-item list
+statement_seconds = contextvars.ContextVar("statement_seconds", default=None)
+
+def before_statement(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("statement_started", []).append(time.perf_counter())
+
+def after_statement(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["statement_started"].pop()
+    seconds = statement_seconds.get()
+    if seconds is not None:
+        seconds[0] += time.perf_counter() - started
+
+def time_statements():
+    """Measure the statements of both engines, for calls run with statement_seconds set"""
+    engines = [database.engine]
+    if database.async_engine is not None:
+        engines.append(database.async_engine.sync_engine)
+    for engine in engines:
+        if not event.contains(engine, "before_cursor_execute", before_statement):
+            event.listen(engine, "before_cursor_execute", before_statement)
+            event.listen(engine, "after_cursor_execute", after_statement)
+
+@contextmanager
+def measure_statements():
+    """Collect the statement time of the calls in the block into the yielded one-item list"""
+    seconds = [0.0]
+    token = statement_seconds.set(seconds)
+    try:
+        yield seconds
+    finally:
+        statement_seconds.reset(token)
+
+def summarize(latencies, elapsed, errors=0, db_seconds=None):
+    """Latency percentiles in milliseconds, throughput per second and mean statement time of a benchmark"""
+    latencies = np.array(latencies) * 1000
+    count = len(latencies)
+    p50, p95, p99 = np.percentile(latencies, (50, 95, 99)) if count else (None, None, None)
+    return {
+        "requests": count,
+        "errors": errors,
+        "p50_ms": p50,
+        "p95_ms": p95,
+        "p99_ms": p99,
+        "throughput": count / elapsed if elapsed else None,
+        "db_ms": db_seconds * 1000 / count if db_seconds is not None and count else None,
+    }
+
+def compare(results, baseline, tolerance=0.2, min_ms=1.0):
+    """Descriptions of the regressions of results against baseline results.
+
+    A latency percentile regresses when it grew by more than tolerance and by more than
+    min_ms, throughput when it fell by more than tolerance. Benchmarks missing from
+    either side are not compared.
+    """
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            if None in (result[key], base[key]):
+                continue
+            if result[key] > base[key] * (1 + tolerance) and result[key] - base[key] > min_ms:
+                regressions.append(f"{name}: {key} {base[key]:.1f} -> {result[key]:.1f}")
+        if None not in (result["throughput"], base["throughput"]) and \
+                result["throughput"] < base["throughput"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {base['throughput']:.1f}/s -> {result['throughput']:.1f}/s")
+        if result["errors"] > base["errors"]:
+            regressions.append(f"{name}: errors {base['errors']} -> {result['errors']}")
+    return regressions
+
+def format_results(results):
+    """Table of benchmark results"""
+    number = lambda value, spec: "-" if value is None else format(value, spec)
+    width = max([len(name) for name in results] + [9])
+    lines = [f"{'benchmark':<{width}} {'requests':>9} {'errors':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>9} {'db ms':>8}"]
+    for name, result in results.items():
+        lines.append(
+            f"{name:<{width}} {result['requests']:>9} {result['errors']:>7} "
+            f"{number(result['p50_ms'], '9.2f')} {number(result['p95_ms'], '9.2f')} {number(result['p99_ms'], '9.2f')} "
+            f"{number(result['throughput'], '9.1f')} {number(result['db_ms'], '8.2f')}"
+        )
+    return "\n".join(lines)
+
+# Micro benchmarks: the repository call behind each endpoint, given the backend handle and a country
+MICRO_BENCHMARKS = {
+    "data_version": lambda db, country: repository.data_version(db),
+    "national_stats": lambda db, country: repository.national_stats(db),
+    "top_countries": lambda db, country: repository.top_countries(db, 10),
+    "yearly_totals": lambda db, country: repository.yearly_totals(db),
+    "yearly_totals_country": lambda db, country: repository.yearly_totals(db, country),
+    "regional_totals": lambda db, country: repository.regional_totals(db, country, None, 20),
+    "temporal_records": lambda db, country: repository.temporal_records(db, country, None, None, 100),
+    "global_dashboard": lambda db, country: repository.global_dashboard(db, 10),
+    "country_dashboard": lambda db, country: repository.country_dashboard(db, country, 20, 100),
+}
+
+@contextmanager
+def open_db():
+    """Handle of the configured backend, opened like for one request"""
+    if repository.DATA_BACKEND == "columnar":
+        yield columnar.get_store()
+    else:
+        with database.SessionLocal() as db:
+            yield db
+
+def run_micro(iterations=30, warmup=3, names=None, report=print):
+    """Time each micro benchmark, cycling through the countries with the most cases"""
+    with open_db() as db:
+        countries = [row["country"] for row in repository.top_countries(db, 10)] or [None]
+    uses_database = repository.DATA_BACKEND != "columnar"
+    if uses_database:
+        time_statements()
+
+    results = {}
+    for name, query in MICRO_BENCHMARKS.items():
+        if names and name not in names:
+            continue
+        latencies, errors, db_seconds = [], 0, 0.0
+        for iteration in range(warmup + iterations):
+            country = countries[iteration % len(countries)]
+            with measure_statements() as seconds:
+                started = time.perf_counter()
+                try:
+                    with open_db() as db:
+                        query(db, country)
+                except Exception as e:
+                    errors += 1
+                    report(f"{name}: {e}")
+                elapsed = time.perf_counter() - started
+            if iteration >= warmup:
+                latencies.append(elapsed)
+                db_seconds += seconds[0]
+        results[name] = summarize(latencies, sum(latencies), errors, db_seconds if uses_database else None)
+    return results
+
+# Requests of the load profiles, given a random generator and a country
+def index_page(rng, country):
+    return "index", "/dashboard/global", {"limit": 10}
+
+def country_page(rng, country):
+    return "country", f"/dashboard/country/{quote(country, safe='')}", {"regions_limit": 20, "temporal_limit": 100}
+
+def regions_request(rng, country):
+    return "regions", "/spatial/regions", {"country": country, "limit": 20}
+
+def temporal_request(rng, country):
+    return "temporal", "/temporal/data", {"country": country, "limit": 100, "start_date": f"{rng.randint(2000, 2023)}-01-01"}
+
+def stats_request(rng, country):
+    return "stats", "/national/stats", {}
+
+def yearly_request(rng, country):
+    return "yearly", "/national/yearly", {"country": country}
+
+def export_request(rng, country):
+    return "export", "/export/temporal", {"country": country, "format": "ndjson"}
+
+# Weighted requests of each profile. visualizer is the API traffic of visualizer pages:
+# index and country pages make one dashboard call each, and the country page's tables
+# page through regions and temporal records by proxy
+PROFILES = {
+    "visualizer": ((40, index_page), (50, country_page), (5, regions_request), (5, temporal_request)),
+    "endpoints": (
+        (15, stats_request), (15, yearly_request), (20, regions_request), (20, temporal_request),
+        (10, index_page), (15, country_page), (5, export_request),
+    ),
+}
+
+async def run_load(client, profile, countries, concurrency=8, duration=30.0, max_requests=None, seed=0, time_db=False):
+    """Replay a profile with concurrent clients for duration seconds or max_requests requests.
+
+    Countries are picked with weights falling with their rank, since the countries with
+    the most cases get the most visits.
+    """
+    rng = random.Random(seed)
+    weights, requests = zip(*PROFILES[profile])
+    country_weights = [1 / (rank + 1) for rank in range(len(countries))]
+    samples = defaultdict(lambda: {"latencies": [], "errors": 0, "db_seconds": 0.0})
+    issued = 0
+    started = time.perf_counter()
+    deadline = started + duration
+
+    async def worker():
+        nonlocal issued
+        while time.perf_counter() < deadline and (max_requests is None or issued < max_requests):
+            issued += 1
+            request = rng.choices(requests, weights)[0]
+            label, path, params = request(rng, rng.choices(countries, country_weights)[0])
+            with measure_statements() as seconds:
+                request_started = time.perf_counter()
+                try:
+                    response = await client.get(path, params=params)
+                    failed = response.status_code >= 400
+                except httpx.HTTPError:
+                    failed = True
+                latency = time.perf_counter() - request_started
+            for sample in (samples[label], samples["all"]):
+                sample["latencies"].append(latency)
+                sample["errors"] += failed
+                sample["db_seconds"] += seconds[0]
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        label: summarize(sample["latencies"], elapsed, sample["errors"], sample["db_seconds"] if time_db else None)
+        for label, sample in sorted(samples.items())
+    }
+
+async def load(profile, concurrency, duration, max_requests, seed, url=None):
+    """Run a load profile against the API at url, or in-process against main.app"""
+    if url is None:
+        import main
+        transport = httpx.ASGITransport(app=main.app)
+        time_db = repository.DATA_BACKEND != "columnar"
+        if time_db:
+            time_statements()
+    else:
+        transport = httpx.AsyncHTTPTransport(limits=httpx.Limits(max_connections=concurrency))
+        time_db = False
+    async with httpx.AsyncClient(transport=transport, base_url=url or "http://api", timeout=60) as client:
+        response = await client.get("/national/countries", params={"limit": 50})
+        response.raise_for_status()
+        countries = [row["country"] for row in response.json()["data"]]
+        return await run_load(client, profile, countries, concurrency, duration, max_requests, seed, time_db)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the API queries and load profiles")
+    commands = parser.add_subparsers(dest="command", required=True)
+    micro = commands.add_parser("micro", help="Time the query behind each endpoint")
+    micro.add_argument("--iterations", type=int, default=30)
+    micro.add_argument("--warmup", type=int, default=3)
+    micro.add_argument("--only", type=lambda value: value.split(","), help="Comma-separated benchmarks to run")
+    replay = commands.add_parser("load", help="Replay a request mix with concurrent clients")
+    replay.add_argument("--profile", choices=sorted(PROFILES), default="visualizer")
+    replay.add_argument("--concurrency", type=int, default=8)
+    replay.add_argument("--duration", type=float, default=30.0, help="Seconds to run for")
+    replay.add_argument("--requests", type=int, help="Stop after this many requests")
+    replay.add_argument("--seed", type=int, default=0)
+    replay.add_argument("--url", help="Base URL of a running API (default: the app in this process)")
+    for command in (micro, replay):
+        command.add_argument("--save", help="Write the results to this JSON file, to serve as a baseline")
+        command.add_argument("--baseline", help="Compare the results with a file written by --save")
+        command.add_argument("--tolerance", type=float, default=0.2,
+                             help="Slowdown relative to the baseline that counts as a regression")
+    args = parser.parse_args(argv)
+
+    report = lambda message: print(message, flush=True)
+    if args.command == "micro":
+        results = run_micro(args.iterations, args.warmup, args.only, report)
+        run = {"command": "micro", "backend": repository.DATA_BACKEND, "results": results}
+    else:
+        results = asyncio.run(load(args.profile, args.concurrency, args.duration, args.requests, args.seed, args.url))
+        run = {"command": "load", "profile": args.profile, "concurrency": args.concurrency, "results": results}
+    report(format_results(results))
+
+    if args.save:
+        with open(args.save, "w") as out:
+            json.dump(run, out, indent=2)
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        settings = {key: value for key, value in run.items() if key != "results"}
+        if {key: baseline.get(key) for key in settings} != settings:
+            sys.exit(f"{args.baseline} was not run with the same settings")
+        regressions = compare(results, baseline["results"], args.tolerance)
+        for regression in regressions:
+            report(f"Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+        report(f"No regressions against {args.baseline}")
+
+if __name__ == "__main__":
+    main()
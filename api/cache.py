@@ -0,0 +1,330 @@
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import date
+
+import orjson
+
+# How long a looked-up dataset version is trusted before asking the database again
+DATASET_VERSION_CHECK_SECONDS = float(os.getenv("DATASET_VERSION_CHECK_SECONDS", "60"))
+
+# Response cache settings
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory")  # memory, redis or none
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1024"))
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "300"))
+RESPONSE_CACHE_URL = os.getenv("RESPONSE_CACHE_URL", "redis://localhost:6379/0")
+
+class SnapshotCache:
+    """Process-level cache of computed values, invalidated when the dataset version changes.
+
+    The dataset version is looked up with ``version_loader(db)`` at most once every
+    ``version_check_seconds``, so repeat calls inside that window never touch the database.
+    """
+
+    def __init__(self, version_loader, version_check_seconds=DATASET_VERSION_CHECK_SECONDS):
+        self.version_loader = version_loader
+        self.version_check_seconds = version_check_seconds
+        self._lock = threading.Lock()
+        self._snapshots = {}
+        self._version = None
+        self._version_checked_at = None
+        self.hits = 0
+        self.misses = 0
+
+    def current_version(self, db):
+        """Return the dataset version, reloading it once the check interval has passed"""
+        now = time.monotonic()
+        with self._lock:
+            checked_at = self._version_checked_at
+            if checked_at is not None and now - checked_at < self.version_check_seconds:
+                return self._version
+
+        version = self.version_loader(db)
+        with self._lock:
+            self._version = version
+            self._version_checked_at = now
+        return version
+
+    def get_or_compute(self, key, db, compute):
+        """Return the snapshot for key, computing it with compute(db) if missing or outdated"""
+        version = self.current_version(db)
+        with self._lock:
+            entry = self._snapshots.get(key)
+            if entry is not None and entry[0] == version:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        value = compute(db)
+        with self._lock:
+            self._snapshots[key] = (version, value)
+        return value
+
+    def clear(self):
+        """Drop all snapshots and force the next call to reload the dataset version"""
+        with self._lock:
+            self._snapshots.clear()
+            self._version = None
+            self._version_checked_at = None
+
+    def stats(self):
+        """Hit/miss counters for reporting on /health"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._snapshots),
+                "dataset_version": self._version,
+            }
+
+def cache_key(endpoint, params, version=None):
+    """Build a normalized cache key from an endpoint name, its query parameters and the data version.
+
+    Unset parameters are dropped, parameters are sorted, and country names are
+    lower-cased so keys match the case-insensitive country filters. A version, such as
+    the one the ETag is built from, is folded into the key so results computed before
+    an import are never served after it.
+    """
+    parts = []
+    for name in sorted(params):
+        value = params[name]
+        if value is None:
+            continue
+        if name == "country":
+            value = value.strip().lower()
+        elif isinstance(value, date):
+            value = value.isoformat()
+        parts.append(f"{name}={value}")
+    if version is not None:
+        endpoint = f"{endpoint}@{hashlib.sha1(repr(version).encode()).hexdigest()[:16]}"
+    return f"{endpoint}?{'&'.join(parts)}"
+
+# Returned by CacheBackend.get on a miss, so that None and empty results can be cached too
+MISSING = object()
+
+class CacheBackend(ABC):
+    """Storage interface for the response cache. get returns MISSING on a miss.
+
+    Backends whose calls block on the network set blocking, and the async cache path
+    then calls them in a worker thread instead of on the event loop.
+    """
+
+    blocking = False
+
+    @abstractmethod
+    def get(self, key):
+        """Cached value of key, or MISSING"""
+
+    @abstractmethod
+    def set(self, key, value):
+        """Store value under key"""
+
+    @abstractmethod
+    def clear(self):
+        """Drop every entry"""
+
+class NullCacheBackend(CacheBackend):
+    """Backend that stores nothing, used when response caching is disabled"""
+
+    def get(self, key):
+        return MISSING
+
+    def set(self, key, value):
+        pass
+
+    def clear(self):
+        pass
+
+class LRUCacheBackend(CacheBackend):
+    """In-process cache bounded by entry count (LRU eviction) and entry age (TTL)"""
+
+    def __init__(self, max_entries=RESPONSE_CACHE_MAX_ENTRIES, ttl_seconds=RESPONSE_CACHE_TTL_SECONDS,
+                 clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISSING
+            expires_at, value = entry
+            if self.clock() >= expires_at:
+                del self._entries[key]
+                return MISSING
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (self.clock() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+class SharedCacheBackend(CacheBackend):
+    """Cache held in an external key-value store shared by all API replicas.
+
+    The client needs redis-py style ``get(key)``, ``set(key, value, ex=seconds)``,
+    ``scan_iter(match=pattern)`` and ``delete(*keys)`` methods. Values are stored as JSON.
+    """
+
+    blocking = True
+
+    def __init__(self, client, ttl_seconds=RESPONSE_CACHE_TTL_SECONDS, prefix="dengue-api:"):
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        if raw is None:
+            return MISSING
+        return orjson.loads(raw)
+
+    def set(self, key, value):
+        self.client.set(self.prefix + key, orjson.dumps(value), ex=max(1, int(self.ttl_seconds)))
+
+    def clear(self):
+        keys = list(self.client.scan_iter(match=self.prefix + "*"))
+        if keys:
+            self.client.delete(*keys)
+
+class InProcessStore:
+    """Local stand-in for a shared key-value store, implementing the client calls SharedCacheBackend uses"""
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._data = {}
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and self.clock() >= expires_at:
+                del self._data[key]
+                return None
+            return value
+
+    def set(self, key, value, ex=None):
+        with self._lock:
+            self._data[key] = (value, self.clock() + ex if ex else None)
+
+    def scan_iter(self, match="*"):
+        prefix = match.rstrip("*")
+        with self._lock:
+            return [key for key in self._data if key.startswith(prefix)]
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+class ResponseCache:
+    """Caches JSON-ready endpoint results by normalized query parameters.
+
+    Concurrent misses for the same key are coalesced: the first request computes the
+    result and the others wait for it instead of running the same query, whether or
+    not the backend stores results.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._lock = threading.Lock()
+        self._in_flight = {}  # Key -> task computing and storing its result
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def _count(self, value):
+        with self._lock:
+            if value is not MISSING:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return value
+
+    async def _call_backend(self, method, *args):
+        """Call a backend method, off the event loop when the backend blocks on the network"""
+        if self.backend.blocking:
+            return await asyncio.to_thread(method, *args)
+        return method(*args)
+
+    def get_or_compute(self, endpoint, params, compute, version=None):
+        """Return the cached result for endpoint/params at a data version, or compute() and store it"""
+        key = cache_key(endpoint, params, version)
+        value = self._count(self.backend.get(key))
+        if value is MISSING:
+            value = compute()
+            self.backend.set(key, value)
+        return value
+
+    async def get_or_compute_async(self, endpoint, params, compute, version=None):
+        """Like get_or_compute, for a coroutine function compute, sharing one computation between concurrent misses"""
+        key = cache_key(endpoint, params, version)
+        value = self._count(await self._call_backend(self.backend.get, key))
+        if value is not MISSING:
+            return value
+
+        task = self._in_flight.get(key)
+        if task is not None and task.get_loop() is asyncio.get_running_loop():
+            with self._lock:
+                self.coalesced += 1
+        else:
+            task = asyncio.ensure_future(self._compute_and_store(key, compute))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        # Shielded, so a request that goes away does not cancel the computation others wait for
+        return await asyncio.shield(task)
+
+    async def _compute_and_store(self, key, compute):
+        value = await compute()
+        await self._call_backend(self.backend.set, key, value)
+        return value
+
+    def _forget(self, key, task):
+        """Drop a finished computation, unless a newer one for the key replaced it"""
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        """Hit/miss counters for reporting on /health"""
+        with self._lock:
+            return {
+                "backend": type(self.backend).__name__,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._in_flight),
+            }
+
+def build_response_cache(backend_name=RESPONSE_CACHE_BACKEND):
+    """Create the response cache selected by RESPONSE_CACHE_BACKEND"""
+    if backend_name == "none":
+        return ResponseCache(NullCacheBackend())
+    if backend_name == "redis":
+        import redis  # only imported when the shared backend is selected
+        return ResponseCache(SharedCacheBackend(redis.Redis.from_url(RESPONSE_CACHE_URL)))
+    if backend_name == "memory":
+        return ResponseCache(LRUCacheBackend())
+    raise ValueError(f"Unknown RESPONSE_CACHE_BACKEND: {backend_name}")
@@ -0,0 +1,703 @@
+"""Embedded columnar backend: the API's read queries over memory-mapped column files.
+
+convert() turns the three CSV extracts into one directory per table holding a .npy
+file per column, once. Strings are dictionary-encoded: integer codes index a sorted
+array of the distinct values, so codes order rows like their strings. The API
+memory-maps those files (no copy, no database) and answers each query with
+vectorized numpy filters and aggregations. Query functions take the ColumnarStore
+in place of a session and return the same JSON-ready data as queries.py.
+
+Usage: python columnar.py [--data-dir ..] [--out-dir ../columnar]
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import shutil
+import threading
+import time
+from collections import namedtuple
+from datetime import date
+from typing import Optional
+
+import numpy as np
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import Date, Float, Integer
+
+import database
+import export
+import forecasting
+import import_data
+import queries
+import resampling
+import schemas
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+COLUMNAR_DATA_DIR = os.getenv("COLUMNAR_DATA_DIR", os.path.join(BASE_DIR, "..", "columnar"))
+
+TABLES = {
+    "national_data": database.national_data,
+    "spatial_data": database.spatial_data,
+    "temporal_data": database.temporal_data,
+}
+
+# A column while converting: its values plus, for strings, the sorted distinct values
+# the codes index and, for integers, the mask of non-NULL values
+Column = namedtuple("Column", "values extra")
+
+# Row shapes expected by queries.regional_page, queries.temporal_page and forecasting.build_panel
+RegionalRow = namedtuple("RegionalRow", "country region total_cases")
+TemporalRow = namedtuple("TemporalRow", "id adm_0_name calendar_start_date calendar_end_date year dengue_total t_res")
+SeriesRow = namedtuple("SeriesRow", "country_key region_key country region t_res month total")
+
+def column_kind(name):
+    """Storage kind of a column: integer, float, date or string"""
+    column_type = database.national_data.c[name].type
+    if isinstance(column_type, Integer):
+        return "integer"
+    if isinstance(column_type, Float):
+        return "float"
+    if isinstance(column_type, Date):
+        return "date"
+    return "string"
+
+def encode_strings(values):
+    """Dictionary-encode strings, with None for NULL coded as -1"""
+    present = np.array([value is not None for value in values], dtype=bool)
+    strings = np.array([value for value in values if value is not None], dtype=str)
+    categories = np.unique(strings)
+    codes = np.full(len(values), -1, dtype=np.int32)
+    codes[present] = np.searchsorted(categories, strings)
+    return Column(codes, categories)
+
+def recode(codes, values):
+    """Re-encode codes with a new value per dictionary entry, merging equal values"""
+    categories, inverse = np.unique(values, return_inverse=True)
+    mapped = np.full(len(codes), -1, dtype=np.int32)
+    present = codes >= 0
+    mapped[present] = inverse.reshape(-1)[codes[present]]
+    return Column(mapped, categories)
+
+def normalize_keys(categories):
+    """Normalize strings the same way as the generated country_key columns"""
+    return np.char.lower(np.char.strip(categories, " ")) if len(categories) else categories
+
+def parse_column(name, values):
+    """Column of a CSV field list, with unquoted NA fields as NULL"""
+    kind = column_kind(name)
+    if kind == "integer":
+        return Column(
+            np.array([0 if value == "NA" else int(value) for value in values], dtype=np.int64),
+            np.array([value != "NA" for value in values], dtype=bool)
+        )
+    if kind == "float":
+        return Column(np.array([np.nan if value == "NA" else float(value) for value in values]), None)
+    if kind == "date":
+        return Column(np.array(["NaT" if value == "NA" else value for value in values], dtype="datetime64[D]"), None)
+    return encode_strings([None if value == "NA" else value for value in values])
+
+def read_extract(path):
+    """Read a CSV extract into Columns typed like the database tables.
+
+    Like the COPY in import_data.py, fields are taken by position and NA fields are
+    NULL; the extracts quote names such as "PANAMA" but never NA itself.
+    """
+    with import_data.open_extract(path) as raw:
+        reader = csv.reader(io.TextIOWrapper(raw, encoding="utf-8", newline=""))
+        next(reader)  # Header
+        fields = list(zip(*reader)) or [()] * len(database.SOURCE_COLUMNS)
+    return {name: parse_column(name, values) for name, values in zip(database.SOURCE_COLUMNS, fields)}
+
+def group_index(*keys):
+    """Group number of each row for the combination of its key values, and the number of groups"""
+    groups = np.zeros(len(keys[0]), dtype=np.int64)
+    count = 1
+    for key in keys:
+        # Densify after each key so the combined numbers stay below rows * distinct values
+        values, dense = np.unique(np.asarray(key).astype(np.int64), return_inverse=True)
+        combined, groups = np.unique(groups * len(values) + dense.reshape(-1), return_inverse=True)
+        groups = groups.reshape(-1)
+        count = len(combined)
+    return groups, count if len(groups) else 0
+
+def first_rows(groups, count):
+    """Position of the first row of each group"""
+    first = np.zeros(count, dtype=np.int64)
+    first[groups[::-1]] = np.arange(len(groups))[::-1]
+    return first
+
+def prepare(columns, name, deduplicate=True):
+    """Add the id and country_key columns, keeping the latest row per key like the *_unique views.
+
+    Ids number the rows in file order, as a full import into an empty table does.
+    """
+    rows = len(columns["year"].values)
+    columns["id"] = Column(np.arange(1, rows + 1, dtype=np.int64), np.ones(rows, dtype=bool))
+    countries = columns["adm_0_name"]
+    columns["country_key"] = recode(countries.values, normalize_keys(countries.extra))
+    if not deduplicate or not rows:
+        return columns
+
+    groups, count = group_index(*(columns[key].values for key in database.DEDUP_KEYS[name]))
+    latest = np.zeros(count, dtype=np.int64)
+    np.maximum.at(latest, groups, columns["id"].values)
+    keep = columns["id"].values == latest[groups]
+    return {
+        column_name: Column(
+            column.values[keep],
+            column.extra[keep] if column_kind(column_name) == "integer" else column.extra
+        )
+        for column_name, column in columns.items()
+    }
+
+def write_table(columns, path):
+    """Write one .npy file per column, plus dictionaries, validity masks and a manifest.
+
+    The table directory is swapped in as a whole, so readers never map a partial table.
+    """
+    staging = f"{path}.tmp-{os.getpid()}"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    kinds = {}
+    for name, column in columns.items():
+        kind = kinds[name] = column_kind(name)
+        np.save(os.path.join(staging, f"{name}.npy"), column.values)
+        if kind == "string":
+            np.save(os.path.join(staging, f"{name}.values.npy"), column.extra)
+        elif kind == "integer":
+            np.save(os.path.join(staging, f"{name}.valid.npy"), column.extra)
+    with open(os.path.join(staging, "manifest.json"), "w") as manifest:
+        json.dump({"rows": len(columns["id"].values), "columns": kinds}, manifest)
+
+    previous = f"{path}.old-{os.getpid()}"
+    if os.path.exists(path):
+        os.rename(path, previous)
+    os.rename(staging, path)
+    shutil.rmtree(previous, ignore_errors=True)
+
+def convert(data_dir, out_dir, deduplicate=True, report=print):
+    """Convert the extracts found in data_dir into tables in out_dir"""
+    os.makedirs(out_dir, exist_ok=True)
+    for name, filename in import_data.EXTRACTS.items():
+        path = import_data.find_extract(data_dir, filename)
+        if path is None:
+            raise FileNotFoundError(f"{filename} not found in {data_dir}")
+        started = time.monotonic()
+        columns = prepare(read_extract(path), name, deduplicate)
+        write_table(columns, os.path.join(out_dir, name))
+        report(f"{name}: wrote {len(columns['id'].values):,} rows in {time.monotonic() - started:.1f}s")
+
+def load_array(path):
+    """Memory-map a .npy file; empty arrays cannot be mapped and are read instead"""
+    try:
+        return np.load(path, mmap_mode="r")
+    except ValueError:
+        return np.load(path)
+
+class ColumnarTable:
+    """One table's columns, memory-mapped from the files written by write_table"""
+
+    def __init__(self, path):
+        self.path = path
+        manifest_path = os.path.join(path, "manifest.json")
+        self.modified = os.stat(manifest_path).st_mtime_ns
+        with open(manifest_path) as manifest:
+            manifest = json.load(manifest)
+        self.num_rows = manifest["rows"]
+        self.kinds = manifest["columns"]
+        self.data = {}
+        self.categories = {}
+        self.valid = {}
+        for name, kind in self.kinds.items():
+            self.data[name] = load_array(os.path.join(path, f"{name}.npy"))
+            if kind == "string":
+                self.categories[name] = load_array(os.path.join(path, f"{name}.values.npy"))
+            elif kind == "integer":
+                self.valid[name] = load_array(os.path.join(path, f"{name}.valid.npy"))
+
+    def code(self, name, value):
+        """Dictionary code of a string, or -2 (matching no row) when it does not occur"""
+        categories = self.categories[name]
+        position = int(np.searchsorted(categories, value))
+        if position < len(categories) and categories[position] == value:
+            return position
+        return -2
+
+    def equals(self, name, value):
+        """Row mask of a string column equal to value"""
+        return np.asarray(self.data[name]) == self.code(name, value)
+
+    def is_valid(self, name):
+        """Row mask of the non-NULL values of a column"""
+        kind = self.kinds[name]
+        data = np.asarray(self.data[name])
+        if kind == "string":
+            return data >= 0
+        if kind == "integer":
+            return np.array(self.valid[name])
+        if kind == "float":
+            return ~np.isnan(data)
+        return ~np.isnat(data)
+
+    def values(self, name, index=None):
+        """Python values of a column, optionally at the given row positions, with None for NULL"""
+        data = np.asarray(self.data[name] if index is None else self.data[name][index])
+        kind = self.kinds[name]
+        if kind == "string":
+            categories = self.categories[name].tolist()
+            return [categories[code] if code >= 0 else None for code in data.tolist()]
+        if kind == "integer":
+            valid = np.asarray(self.valid[name] if index is None else self.valid[name][index])
+            return [value if present else None for value, present in zip(data.tolist(), valid.tolist())]
+        if kind == "float":
+            return [None if value != value else value for value in data.tolist()]
+        return data.tolist()  # Dates, with NaT as None
+
+class ColumnarStore:
+    """The converted tables, memory-mapped from their directories in data_dir"""
+
+    def __init__(self, data_dir):
+        self.data_dir = data_dir
+        self.tables = {name: ColumnarTable(os.path.join(data_dir, name)) for name in TABLES}
+
+        # Country keys by ISO3 code, for resolve_country_key
+        national = self.tables["national_data"]
+        self.iso_keys = {}
+        for iso, key in zip(national.values("iso_a0"), national.values("country_key")):
+            if iso is not None:
+                self.iso_keys.setdefault(iso, key)
+
+    def is_stale(self):
+        """Whether any table was converted again since it was mapped"""
+        return any(
+            os.stat(os.path.join(table.path, "manifest.json")).st_mtime_ns != table.modified
+            for table in self.tables.values()
+        )
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_store(data_dir=None):
+    """The process-wide store, remapped when the tables are converted again"""
+    global _store
+    data_dir = data_dir or COLUMNAR_DATA_DIR
+    with _store_lock:
+        if _store is None or _store.data_dir != data_dir or _store.is_stale():
+            _store = ColumnarStore(data_dir)
+        return _store
+
+def get_db():
+    """Session generator yielding the store, standing in for database.get_db"""
+    yield get_store()
+
+def dataset_version(store: ColumnarStore, name):
+    """Version of a table: its highest id and when it was converted"""
+    table = store.tables[name]
+    return (int(np.max(table.data["id"])) if table.num_rows else None, table.modified)
+
+def national_data_version(store: ColumnarStore):
+    """Dataset version for national statistics"""
+    return dataset_version(store, "national_data")
+
+def temporal_data_version(store: ColumnarStore):
+    """Dataset version for temporal series"""
+    return dataset_version(store, "temporal_data")
+
+def data_version(store: ColumnarStore):
+    """Version of all served data: the dataset version of each table, then the Unix time of the last conversion"""
+    versions = tuple(value for name in TABLES for value in dataset_version(store, name))
+    return versions + (max(table.modified for table in store.tables.values()) / 1e9,)
+
+def ping(store: ColumnarStore):
+    """Nothing to check: the store is mapped once get_db has yielded it"""
+    return 1
+
+def resolve_country_key(store: ColumnarStore, country: str) -> str:
+    """Resolve a country name or ISO3 code to its normalized country_key"""
+    key = database.normalize_country(country)
+    if len(key) == 3 and key.isalpha():
+        return store.iso_keys.get(key.upper(), key)
+    return key
+
+def name_rows(store: ColumnarStore):
+    """Distinct (country_key, adm_0_name, iso_a0, adm_1_name) rows for the name index, like queries.name_rows"""
+    national = store.tables["national_data"]
+    groups, count = group_index(national.data["country_key"])
+    first = first_rows(groups, count)
+    rows = list(zip(
+        national.values("country_key", first), national.values("adm_0_name", first),
+        national.values("iso_a0", first), [None] * count
+    ))
+
+    spatial = store.tables["spatial_data"]
+    named = np.flatnonzero(spatial.is_valid("adm_1_name"))
+    groups, count = group_index(spatial.data["country_key"][named], spatial.data["adm_1_name"][named])
+    first = named[first_rows(groups, count)]
+    rows.extend(zip(
+        spatial.values("country_key", first), spatial.values("adm_0_name", first),
+        [None] * count, spatial.values("adm_1_name", first)
+    ))
+    return rows
+
+def group_sums(groups, count, values):
+    """Per-group sums ignoring NaN, with None for groups without values, like SQL SUM"""
+    present = ~np.isnan(values)
+    sums = np.bincount(groups[present], weights=values[present], minlength=count)
+    seen = np.bincount(groups[present], minlength=count)
+    return [total if n else None for total, n in zip(sums.tolist(), seen.tolist())]
+
+def descending_order(totals, *ties, nulls_last=False):
+    """Group positions by total descending with NULL totals first, as in PostgreSQL, or last with nulls_last, then by ties"""
+    missing = np.array([total is None for total in totals], dtype=bool)
+    values = np.array([0.0 if total is None else total for total in totals])
+    return np.lexsort(tuple(reversed(ties)) + (-values, missing if nulls_last else ~missing)).tolist()
+
+def national_stats(store: ColumnarStore):
+    """Overall statistics"""
+    table = store.tables["national_data"]
+    years = np.asarray(table.data["year"])[table.is_valid("year")]
+    countries = np.asarray(table.data["adm_0_name"])
+    min_year = int(years.min()) if len(years) else None
+    max_year = int(years.max()) if len(years) else None
+    stats = schemas.DengueStats(
+        total_records=table.num_rows,
+        total_cases=float(np.nansum(table.data["dengue_total"])),
+        countries_count=len(np.unique(countries[countries >= 0])),
+        year_range=list(range(min_year, max_year + 1)) if min_year and max_year else []
+    )
+    return jsonable_encoder(stats)
+
+def top_countries(store: ColumnarStore, limit: int):
+    """Top countries by total dengue cases"""
+    table = store.tables["national_data"]
+    groups = np.asarray(table.data["adm_0_name"]) + 1  # Group 0 holds NULL names
+    count = len(table.categories["adm_0_name"]) + 1
+    sums = group_sums(groups, count, np.asarray(table.data["dengue_total"]))
+    occurs = np.bincount(groups, minlength=count) > 0
+    names = [None] + table.categories["adm_0_name"].tolist()
+
+    results = [
+        schemas.CountryTotal(country=names[group], total_cases=sums[group])
+        for group in descending_order(sums) if occurs[group]
+    ][:limit]
+    return jsonable_encoder(results)
+
+def yearly_totals(store: ColumnarStore, country: Optional[str] = None):
+    """Yearly dengue case totals, optionally filtered by country"""
+    table = store.tables["national_data"]
+    mask = table.is_valid("year")
+    if country:
+        mask &= table.equals("country_key", resolve_country_key(store, country))
+    years, groups = np.unique(np.asarray(table.data["year"])[mask], return_inverse=True)
+    sums = group_sums(groups.reshape(-1), len(years), np.asarray(table.data["dengue_total"])[mask])
+    results = [
+        schemas.YearlyTotal(year=year, total_cases=total)
+        for year, total in zip(years.tolist(), sums)
+    ]
+    return jsonable_encoder(results)
+
+def is_after(row, after):
+    """Whether a regional row sorts after the REGIONAL_CURSOR values of the previous page"""
+    after_total, after_country, after_region = after
+    if row.country is None:
+        return False
+    # Regions without any case count sort last
+    if after_total is None:
+        return row.total_cases is None and (row.country, row.region) > (after_country, after_region)
+    if row.total_cases is None:
+        return True
+    if row.total_cases != after_total:
+        return row.total_cases < after_total
+    return (row.country, row.region) > (after_country, after_region)
+
+def regional_totals(
+    store: ColumnarStore,
+    country: Optional[str] = None,
+    year: Optional[int] = None,
+    limit: int = 20,
+    after: Optional[list] = None
+):
+    """One page of regional dengue case totals, ranked and paged like queries.regional_totals"""
+    table = store.tables["spatial_data"]
+    mask = table.is_valid("adm_1_name")
+    if country:
+        mask &= table.equals("country_key", resolve_country_key(store, country))
+    if year:
+        mask &= table.is_valid("year") & (np.asarray(table.data["year"]) == year)
+
+    country_codes = np.asarray(table.data["adm_0_name"])[mask]
+    region_codes = np.asarray(table.data["adm_1_name"])[mask]
+    groups, count = group_index(country_codes, region_codes)
+    sums = group_sums(groups, count, np.asarray(table.data["dengue_total"])[mask])
+    first = first_rows(groups, count)
+    group_countries = country_codes[first]
+    group_regions = region_codes[first]
+
+    # Code -1 (NULL) picks the trailing None, and sorts last as NULLs do in PostgreSQL
+    countries = table.categories["adm_0_name"].tolist() + [None]
+    regions = table.categories["adm_1_name"].tolist()
+    country_order = np.where(group_countries >= 0, group_countries, len(countries))
+    rows = []
+    for group in descending_order(sums, country_order, group_regions, nulls_last=True):
+        row = RegionalRow(countries[group_countries[group]], regions[group_regions[group]], sums[group])
+        if after and not is_after(row, after):
+            continue
+        rows.append(row)
+        if len(rows) > limit:
+            break
+    return queries.regional_page(rows, limit)
+
+def temporal_records(
+    store: ColumnarStore,
+    country: str,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    limit: int = 100,
+    after: Optional[list] = None
+):
+    """One page of temporal dengue case records, ordered and paged like queries.temporal_records"""
+    table = store.tables["temporal_data"]
+    starts = np.asarray(table.data["calendar_start_date"])
+    ids = np.asarray(table.data["id"])
+    mask = table.equals("country_key", resolve_country_key(store, country))
+    if start_date:
+        mask &= starts >= np.datetime64(start_date, "D")
+    if end_date:
+        mask &= np.asarray(table.data["calendar_end_date"]) <= np.datetime64(end_date, "D")
+    if after:
+        after_start, after_id = np.datetime64(after[0], "D"), after[1]
+        mask &= (starts > after_start) | ((starts == after_start) & (ids > after_id))
+
+    index = np.flatnonzero(mask)
+    index = index[np.lexsort((ids[index], starts[index]))][:limit + 1]
+    columns = ("id", "adm_0_name", "calendar_start_date", "calendar_end_date", "year", "dengue_total", "t_res")
+    rows = [TemporalRow(*values) for values in zip(*(table.values(name, index) for name in columns))]
+    return queries.temporal_page(rows, limit)
+
+def global_dashboard(store: ColumnarStore, limit: int = 10):
+    """Overall statistics, top countries and yearly totals"""
+    return {
+        "stats": national_stats(store),
+        "countries": top_countries(store, limit),
+        "yearly": yearly_totals(store)
+    }
+
+def temporal_series(
+    store: ColumnarStore,
+    country: str,
+    resolution: str,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    max_points: Optional[int] = None
+):
+    """National dengue cases of a country per week, month or year, resampled like queries.temporal_series"""
+    table = store.tables["temporal_data"]
+    starts = np.asarray(table.data["calendar_start_date"])
+    ends = np.asarray(table.data["calendar_end_date"])
+    totals = np.asarray(table.data["dengue_total"])
+    mask = table.equals("country_key", resolve_country_key(store, country)) & table.equals("s_res", "Admin0")
+    mask &= ~np.isnan(totals)
+    if start_date:
+        mask &= ends >= np.datetime64(start_date, "D")
+    if end_date:
+        mask &= starts <= np.datetime64(end_date, "D")
+
+    index = np.flatnonzero(mask)
+    names = table.values("adm_0_name", index[:1])
+    records = resampling.series_records(
+        names[0] if names else None,
+        starts[index], ends[index], totals[index], np.array(table.values("t_res", index), dtype=object),
+        resolution, start_date, end_date, max_points
+    )
+    return {"data": records, "next_cursor": None}
+
+def country_dashboard(
+    store: ColumnarStore,
+    country: str,
+    regions_limit: int = 20,
+    temporal_limit: int = 100,
+    series_resolution: Optional[str] = None,
+    series_max_points: Optional[int] = None
+):
+    """Yearly totals and the first pages of regional totals and temporal records of one country, and optionally its resampled series"""
+    results = {
+        "yearly": yearly_totals(store, country),
+        "regions": regional_totals(store, country, None, regions_limit),
+        "temporal": temporal_records(store, country, None, None, temporal_limit)
+    }
+    if series_resolution:
+        results["series"] = temporal_series(store, country, series_resolution, max_points=series_max_points)["data"]
+    return results
+
+def forecast_metrics(store: ColumnarStore, country: str, region: Optional[str] = None):
+    """Backtest results are only stored in PostgreSQL, by train_models.py"""
+    return []
+
+def forecast_parameters(store: ColumnarStore, country: str, region: Optional[str] = None):
+    """Trained models are only stored in PostgreSQL, by train_models.py"""
+    return None
+
+def outbreak_alerts(store: ColumnarStore, country: Optional[str] = None, region: Optional[str] = None,
+                    method: Optional[str] = None, since: Optional[date] = None, limit: int = 100):
+    """Outbreak alerts are only stored in PostgreSQL, by detect_outbreaks.py"""
+    return []
+
+def aggregate(
+    store: ColumnarStore,
+    dataset: str,
+    group_by: list,
+    metrics: list,
+    country: Optional[str] = None,
+    region: Optional[str] = None,
+    start_year: Optional[int] = None,
+    end_year: Optional[int] = None,
+    s_res: Optional[str] = None,
+    t_res: Optional[str] = None,
+    limit: int = 1000
+):
+    """Metrics of dengue_total per combination of the group_by dimensions, like queries.aggregate"""
+    name = queries.AGGREGATE_DATASETS[dataset][0].name
+    table = store.tables[name]
+    mask = np.ones(table.num_rows, dtype=bool)
+    if country:
+        mask &= table.equals("country_key", resolve_country_key(store, country))
+    if region:
+        mask &= table.equals("adm_1_name", region)
+    years = np.asarray(table.data["year"])
+    if start_year is not None:
+        mask &= table.is_valid("year") & (years >= start_year)
+    if end_year is not None:
+        mask &= table.is_valid("year") & (years <= end_year)
+    for column, value in (("s_res", s_res), ("t_res", t_res)):
+        if value:
+            mask &= table.equals(column, value)
+    rows = np.flatnonzero(mask)
+
+    # NULL keys follow every value, so group numbers order groups as ORDER BY does in PostgreSQL
+    keys = []
+    for dimension in group_by:
+        column = queries.AGGREGATE_DIMENSIONS[dimension]
+        values = np.asarray(table.data[column])[rows].astype(np.int64)
+        keys.append(np.where(table.is_valid(column)[rows], values, values.max(initial=0) + 1))
+    if keys:
+        groups, count = group_index(*keys)
+    else:
+        groups, count = np.zeros(len(rows), dtype=np.int64), 1
+    count = min(count, limit)
+    kept = groups < count
+    groups = groups[kept]
+    first = rows[kept][first_rows(groups, count)] if len(groups) else np.zeros(0, dtype=np.int64)
+
+    totals = np.asarray(table.data["dengue_total"])[rows][kept]
+    present = ~np.isnan(totals)
+    value_counts = np.bincount(groups[present], minlength=count)
+    sums = np.bincount(groups[present], weights=totals[present], minlength=count)
+    minima = np.full(count, np.inf)
+    np.minimum.at(minima, groups[present], totals[present])
+    maxima = np.full(count, -np.inf)
+    np.maximum.at(maxima, groups[present], totals[present])
+    # Groups without any non-NULL total get None, like the SQL aggregates
+    has_values = (value_counts > 0).tolist()
+    columns = {
+        "sum": sums.tolist(),
+        "min": minima.tolist(),
+        "max": maxima.tolist(),
+        "mean": (sums / np.maximum(value_counts, 1)).tolist(),
+    }
+    columns = {metric: [value if has else None for value, has in zip(values, has_values)] for metric, values in columns.items()}
+    columns["count"] = np.bincount(groups, minlength=count).tolist()
+    columns.update({dimension: table.values(queries.AGGREGATE_DIMENSIONS[dimension], first) for dimension in group_by})
+
+    return {
+        "source": name,
+        "estimated_rows": None,
+        "groups": [{field: columns[field][group] for field in [*group_by, *metrics]} for group in range(count)]
+    }
+
+def load_series(store: ColumnarStore) -> forecasting.SeriesPanel:
+    """Monthly case totals for all national and regional series, grouped like forecasting.load_series"""
+    table = store.tables["temporal_data"]
+    codes = lambda name, *values: np.isin(table.data[name], [table.code(name, value) for value in values])
+    mask = codes("t_res", "Week", "Month") & codes("s_res", "Admin0", "Admin1") & table.is_valid("dengue_total")
+
+    region_keys = recode(np.asarray(table.data["adm_1_name"])[mask], normalize_keys(table.categories["adm_1_name"]))
+    country_keys = np.asarray(table.data["country_key"])[mask]
+    resolutions = np.asarray(table.data["t_res"])[mask]
+    months = np.asarray(table.data["calendar_start_date"])[mask].astype("datetime64[M]")
+    groups, count = group_index(country_keys, region_keys.values, resolutions, months)
+    totals = np.bincount(groups, weights=np.asarray(table.data["dengue_total"])[mask], minlength=count)
+
+    # Codes order like their strings, so the smallest code of a group is its min() name
+    names = {}
+    for name in ("adm_0_name", "adm_1_name"):
+        none = len(table.categories[name])
+        smallest = np.full(count, none)
+        group_codes = np.asarray(table.data[name])[mask]
+        np.minimum.at(smallest, groups, np.where(group_codes >= 0, group_codes, none))
+        names[name] = table.categories[name].tolist() + [None]
+        names[name] = [names[name][code] for code in smallest.tolist()]
+
+    lookup = lambda categories, code: categories[code].item() if code >= 0 else None
+    rows = [
+        SeriesRow(
+            lookup(table.categories["country_key"], country_keys[i]),
+            lookup(region_keys.extra, region_keys.values[i]),
+            names["adm_0_name"][group],
+            names["adm_1_name"][group],
+            lookup(table.categories["t_res"], resolutions[i]),
+            months[i].astype("datetime64[D]").item(),
+            totals[group]
+        )
+        for group, i in enumerate(first_rows(groups, count).tolist())
+    ]
+    return forecasting.build_panel(rows)
+
+def export_rows(
+    store: ColumnarStore,
+    dataset: str,
+    country_key: Optional[str] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    year: Optional[int] = None
+):
+    """Table and row positions of an export, filtered and ordered like export.build_export_query"""
+    table = store.tables[export.EXPORT_TABLES[dataset].name]
+    mask = np.ones(table.num_rows, dtype=bool)
+    if country_key:
+        mask &= table.equals("country_key", country_key)
+    if start_date:
+        mask &= np.asarray(table.data["calendar_start_date"]) >= np.datetime64(start_date, "D")
+    if end_date:
+        mask &= np.asarray(table.data["calendar_end_date"]) <= np.datetime64(end_date, "D")
+    if year:
+        mask &= table.is_valid("year") & (np.asarray(table.data["year"]) == year)
+
+    index = np.flatnonzero(mask)
+    if country_key:
+        starts = np.asarray(table.data["calendar_start_date"])[index]
+        index = index[np.lexsort((np.asarray(table.data["id"])[index], starts))]
+    return table, index
+
+async def iter_batches(rows, batch_size: int):
+    """Yield export rows in batches of source-column tuples, like export.iter_batches"""
+    table, index = rows
+    for offset in range(0, len(index), batch_size):
+        batch = index[offset:offset + batch_size]
+        yield list(zip(*(table.values(name, batch) for name in database.SOURCE_COLUMNS)))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert the OpenDengue CSV extracts into tables for the columnar backend")
+    parser.add_argument("--data-dir", default=os.path.join(BASE_DIR, ".."),
+                        help="Directory holding the extracts, as .csv or .csv.zip (default: repository root)")
+    parser.add_argument("--out-dir", default=COLUMNAR_DATA_DIR,
+                        help="Directory to write the tables to (default: COLUMNAR_DATA_DIR)")
+    parser.add_argument("--keep-duplicates", action="store_true",
+                        help="Keep every row instead of only the latest row per key, like DB_READ_DEDUPLICATED=false")
+    args = parser.parse_args(argv)
+    convert(args.data_dir, args.out_dir, deduplicate=not args.keep_duplicates,
+            report=lambda message: print(message, flush=True))
+
+if __name__ == "__main__":
+    main()
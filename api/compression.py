@@ -0,0 +1,146 @@
+"""Response compression negotiated from the Accept-Encoding request header.
+
+Responses of at least COMPRESSION_MIN_SIZE bytes are compressed with brotli when the
+client accepts it and the brotli package is installed, and with gzip otherwise.
+Streamed responses are compressed chunk by chunk, flushing after each one so clients
+receive every chunk as soon as it is produced.
+"""
+import os
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # Brotli compression is optional
+    brotli = None
+
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+
+class GzipCompressor:
+    """gzip stream compressor"""
+
+    def __init__(self, level=COMPRESSION_GZIP_LEVEL):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush()
+
+class BrotliCompressor:
+    """Brotli stream compressor"""
+
+    def __init__(self, quality=COMPRESSION_BROTLI_QUALITY):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+COMPRESSORS = {"gzip": GzipCompressor}
+if brotli is not None:
+    COMPRESSORS["br"] = BrotliCompressor
+
+def choose_encoding(accept_encoding):
+    """The preferred supported content coding the client accepts, or None"""
+    accepted = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[name.strip().lower()] = quality
+
+    for encoding in ("br", "gzip"):
+        if encoding in COMPRESSORS and accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+class CompressionMiddleware:
+    """ASGI middleware compressing responses, like Starlette's GZipMiddleware with brotli support"""
+
+    def __init__(self, app, minimum_size=COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+            if encoding is not None:
+                await CompressionResponder(self.app, encoding, self.minimum_size)(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+class CompressionResponder:
+    """Compresses the body of a single response"""
+
+    def __init__(self, app, encoding, minimum_size):
+        self.app = app
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.send = None
+        self.initial_message = None
+        self.compressor = None
+        self.passthrough = False
+
+    async def __call__(self, scope, receive, send):
+        self.send = send
+        await self.app(scope, receive, self.send_compressed)
+
+    async def send_compressed(self, message):
+        if message["type"] == "http.response.start":
+            # Held back until the first body chunk shows whether to compress
+            self.initial_message = message
+            self.passthrough = "content-encoding" in Headers(raw=message["headers"])
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            if self.initial_message is not None:
+                await self.send(self.initial_message)
+                self.initial_message = None
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.compressor is None:
+            if len(body) < self.minimum_size and not more_body:
+                self.passthrough = True
+                await self.send_compressed(message)
+                return
+
+            self.compressor = COMPRESSORS[self.encoding]()
+            data = self.compress(body, more_body)
+            headers = MutableHeaders(raw=self.initial_message["headers"])
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            if more_body:
+                del headers["Content-Length"]
+            else:
+                headers["Content-Length"] = str(len(data))
+            await self.send(self.initial_message)
+            self.initial_message = None
+        else:
+            data = self.compress(body, more_body)
+        await self.send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+    def compress(self, body, more_body):
+        """Compress one body chunk, ending the stream with the last one"""
+        data = self.compressor.compress(body)
+        return data + (self.compressor.flush() if more_body else self.compressor.finish())
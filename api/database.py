@@ -1,6 +1,7 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, Date, MetaData, Table
+from sqlalchemy import create_engine, func, select, Boolean, Column, Computed, Integer, JSON, String, Float, Date, DateTime, MetaData, Table
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from starlette.concurrency import run_in_threadpool
 import os
 from dotenv import load_dotenv
 
@@ -13,24 +14,100 @@ DB_NAME = os.getenv("DB_NAME", "sampledb")
 DB_USER = os.getenv("DB_USER", "user5T0")
 DB_PASSWORD = os.getenv("DB_PASSWORD", "I1A37SHxlTjB6ulf")
 
+# Engine and pool settings
+DB_ASYNC = os.getenv("DB_ASYNC", "true").lower() in ("1", "true", "yes")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))
+
+# Read deduplicated rows (the *_unique views) instead of the raw tables, which can hold
+# the same record more than once
+DB_READ_DEDUPLICATED = os.getenv("DB_READ_DEDUPLICATED", "true").lower() in ("1", "true", "yes")
+
+pool_settings = {
+    "pool_size": DB_POOL_SIZE,
+    "max_overflow": DB_MAX_OVERFLOW,
+    "pool_timeout": DB_POOL_TIMEOUT,
+    "pool_pre_ping": DB_POOL_PRE_PING,
+}
+
 # Create SQLAlchemy engine
 DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-engine = create_engine(DATABASE_URL)
+engine = create_engine(
+    DATABASE_URL,
+    connect_args={"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"},
+    **pool_settings
+)
 
 # Create session factory bound to engine
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine and session factory, used when DB_ASYNC is enabled
+ASYNC_DATABASE_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+async_engine = None
+AsyncSessionLocal = None
+if DB_ASYNC:
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+    async_engine = create_async_engine(
+        ASYNC_DATABASE_URL,
+        connect_args={"server_settings": {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}},
+        **pool_settings
+    )
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 # Create Base class for declarative models
 Base = declarative_base()
 
-# Database dependency
-def get_db():
+def get_sync_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
 
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+# Database dependency
+def get_db():
+    """Return a session generator: async when DB_ASYNC is enabled, sync otherwise"""
+    if DB_ASYNC:
+        return get_async_db()
+    return get_sync_db()
+
+async def run_sync(db, fn, *args):
+    """Call fn(session, *args) without blocking the event loop.
+
+    Async sessions run fn through AsyncSession.run_sync, so the same query code
+    serves both modes; sync sessions run it in the threadpool.
+    """
+    if AsyncSessionLocal is not None and isinstance(db, AsyncSession):
+        return await db.run_sync(fn, *args)
+    return await run_in_threadpool(fn, db, *args)
+
+async def release_connection(db):
+    """End the session's read transaction, returning its connection to the pool until it queries again"""
+    if AsyncSessionLocal is not None and isinstance(db, AsyncSession):
+        if db.in_transaction():
+            await db.rollback()
+    elif isinstance(db, Session) and db.in_transaction():
+        await run_in_threadpool(db.rollback)
+
+# Columns of the OpenDengue extract files, in file order
+SOURCE_COLUMNS = [
+    'adm_0_name', 'adm_1_name', 'adm_2_name', 'full_name', 'iso_a0', 'fao_gaul_code',
+    'rne_iso_code', 'ibge_code', 'calendar_start_date', 'calendar_end_date', 'year',
+    'dengue_total', 'case_definition_standardised', 's_res', 't_res', 'uuid'
+]
+
+def normalize_country(name):
+    """Normalize a country name the same way as the generated country_key columns"""
+    return name.strip().lower()
+
 # Define tables that match existing PostgreSQL tables
 metadata = MetaData()
 
@@ -54,7 +131,8 @@ national_data = Table(
     Column('case_definition_standardised', String(50)),
     Column('s_res', String(50)),
     Column('t_res', String(50)),
-    Column('uuid', String(100))
+    Column('uuid', String(100)),
+    Column('country_key', String(255), Computed('lower(btrim(adm_0_name))'))
 )
 
 # Spatial data table
@@ -77,7 +155,8 @@ spatial_data = Table(
     Column('case_definition_standardised', String(50)),
     Column('s_res', String(50)),
     Column('t_res', String(50)),
-    Column('uuid', String(100))
+    Column('uuid', String(100)),
+    Column('country_key', String(255), Computed('lower(btrim(adm_0_name))'))
 )
 
 # Temporal data table
@@ -100,5 +179,159 @@ temporal_data = Table(
     Column('case_definition_standardised', String(50)),
     Column('s_res', String(50)),
     Column('t_res', String(50)),
-    Column('uuid', String(100))
-)
\ No newline at end of file
+    Column('uuid', String(100)),
+    Column('country_key', String(255), Computed('lower(btrim(adm_0_name))'))
+)
+
+# Deduplicated materialized views of the source tables, rebuilt by refresh_table_rollups().
+# Each keeps the row with the highest id for its key columns.
+DEDUP_KEYS = {
+    'national_data': ('iso_a0', 'calendar_start_date', 'calendar_end_date'),
+    'spatial_data': ('iso_a0', 'adm_1_name', 'adm_2_name', 'calendar_start_date', 'calendar_end_date'),
+    'temporal_data': ('iso_a0', 'adm_1_name', 'adm_2_name', 'calendar_start_date', 'calendar_end_date', 't_res'),
+}
+
+def unique_table(table):
+    """Table for the deduplicated materialized view of a source table"""
+    return Table(
+        f'{table.name}_unique',
+        metadata,
+        *[Column(column.name, column.type, primary_key=column.primary_key) for column in table.columns]
+    )
+
+national_data_unique = unique_table(national_data)
+spatial_data_unique = unique_table(spatial_data)
+temporal_data_unique = unique_table(temporal_data)
+
+def deduplicate(table):
+    """DISTINCT ON subquery selecting the same rows as the table's deduplicated view"""
+    keys = [table.c[name] for name in DEDUP_KEYS[table.name]]
+    return select(table).distinct(*keys).order_by(*keys, table.c.id.desc()).subquery(f'{table.name}_deduplicated')
+
+# Rollup tables maintained by refresh_table_rollups() in sql/load_data.sql
+national_year_rollup = Table(
+    'national_year_rollup',
+    metadata,
+    Column('adm_0_name', String(255)),
+    Column('year', Integer),
+    Column('dengue_total', Float),
+    Column('record_count', Integer),
+    Column('value_count', Integer),
+    Column('min_total', Float),
+    Column('max_total', Float),
+    Column('country_key', String(255), Computed('lower(btrim(adm_0_name))'))
+)
+
+spatial_region_year_rollup = Table(
+    'spatial_region_year_rollup',
+    metadata,
+    Column('adm_0_name', String(255)),
+    Column('adm_1_name', String(255)),
+    Column('year', Integer),
+    Column('dengue_total', Float),
+    Column('record_count', Integer),
+    Column('value_count', Integer),
+    Column('min_total', Float),
+    Column('max_total', Float),
+    Column('country_key', String(255), Computed('lower(btrim(adm_0_name))'))
+)
+
+temporal_region_year_rollup = Table(
+    'temporal_region_year_rollup',
+    metadata,
+    Column('adm_0_name', String(255)),
+    Column('adm_1_name', String(255)),
+    Column('year', Integer),
+    Column('s_res', String(50)),
+    Column('t_res', String(50)),
+    Column('dengue_total', Float),
+    Column('record_count', Integer),
+    Column('value_count', Integer),
+    Column('min_total', Float),
+    Column('max_total', Float),
+    Column('country_key', String(255), Computed('lower(btrim(adm_0_name))'))
+)
+
+rollup_status = Table(
+    'rollup_status',
+    metadata,
+    Column('rollup_name', String(100), primary_key=True),
+    Column('source_table', String(100)),
+    Column('source_max_id', Integer),
+    Column('source_generation', Integer),
+    Column('refreshed_at', DateTime)
+)
+
+# Rows changed in each table by each import run, written by import_data.py
+import_log = Table(
+    'import_log',
+    metadata,
+    Column('generation', Integer, primary_key=True),
+    Column('table_name', String(100), primary_key=True),
+    Column('mode', String(20)),
+    Column('rows_inserted', Integer),
+    Column('rows_deleted', Integer),
+    Column('imported_at', DateTime)
+)
+
+def data_generation(table):
+    """Scalar subquery for the last import generation that changed the rows of table"""
+    return select(func.max(import_log.c.generation)).where(
+        import_log.c.table_name == table.name,
+        import_log.c.rows_inserted + import_log.c.rows_deleted > 0
+    ).scalar_subquery()
+
+# Forecast model parameters and backtest accuracy, written by train_models.py
+forecast_models = Table(
+    'forecast_models',
+    metadata,
+    Column('id', Integer, primary_key=True),
+    Column('country_key', String(255)),
+    Column('region_key', String(255)),
+    Column('adm_0_name', String(255)),
+    Column('adm_1_name', String(255)),
+    Column('model', String(50)),
+    Column('selected', Boolean),
+    Column('parameters', JSON),
+    Column('history_end', Date),
+    Column('mae', Float),
+    Column('mape', Float),
+    Column('coverage', Float),
+    Column('points', Integer),
+    Column('horizon', Integer),
+    Column('folds', Integer),
+    Column('source_max_id', Integer),
+    Column('source_generation', Integer),
+    Column('trained_at', DateTime)
+)
+
+# Periods flagged by outbreak detection, per source table and series, written by detect_outbreaks.py
+outbreak_alerts = Table(
+    'outbreak_alerts',
+    metadata,
+    Column('id', Integer, primary_key=True),
+    Column('source', String(20)),
+    Column('country_key', String(255)),
+    Column('region_key', String(255)),
+    Column('adm_0_name', String(255)),
+    Column('adm_1_name', String(255)),
+    Column('t_res', String(50)),
+    Column('period_start', Date),
+    Column('period_end', Date),
+    Column('cases', Float),
+    Column('expected', Float),
+    Column('threshold', Float),
+    Column('score', Float),
+    Column('method', String(50)),
+    Column('detected_at', DateTime)
+)
+
+# Version of each source table that outbreak_alerts was last brought up to date with
+outbreak_status = Table(
+    'outbreak_status',
+    metadata,
+    Column('source_table', String(100), primary_key=True),
+    Column('source_max_id', Integer),
+    Column('source_generation', Integer),
+    Column('detected_at', DateTime)
+)
@@ -0,0 +1,166 @@
+"""Flag outbreak periods in every temporal and spatial series, outside the API.
+
+The weekly and monthly series of temporal_data (national and first-level regions) and
+spatial_data (first-level regions) are scanned with the methods of outbreaks.py, and
+the flagged periods stored in outbreak_alerts for the /alerts endpoint. import_data.py
+runs this after every import that changed the data.
+
+Runs are incremental: outbreak_status records the version of each source table the
+alerts were computed from. When an import only added rows, just the series those rows
+belong to are read again and their alerts replaced; when rows were deleted, or with
+--full, all series of the table are.
+
+Usage: python detect_outbreaks.py [--full] [--baseline-years 5] [--k 2.0]
+"""
+import argparse
+import time
+from datetime import datetime
+
+from sqlalchemy import delete, func, insert, select, tuple_
+
+import database
+import outbreaks
+import queries
+import rollups
+
+# Source table and the spatial resolutions of its series
+SOURCES = {
+    "temporal": (database.temporal_data, ("Admin0", "Admin1")),
+    "spatial": (database.spatial_data, ("Admin1",)),
+}
+
+def region_key(table):
+    """Lower-cased adm_1_name of a table's rows, NULL for national rows, as in forecasting.load_series"""
+    return func.lower(func.btrim(table.c.adm_1_name))
+
+def series_filter(table, keys):
+    """Condition selecting the rows of the given (country_key, region_key) series"""
+    return tuple_(table.c.country_key, func.coalesce(region_key(table), "")).in_(
+        [(country_key, region or "") for country_key, region in keys]
+    )
+
+def load_rows(db, name, keys=None):
+    """Case totals of the weekly and monthly series of a source, by period start, in one query"""
+    table, spatial_resolutions = SOURCES[name]
+    source = rollups.rows_for(db, table)
+    query = select(
+        source.c.country_key,
+        region_key(source).label("region_key"),
+        func.min(source.c.adm_0_name).label("country"),
+        func.min(source.c.adm_1_name).label("region"),
+        source.c.t_res,
+        source.c.calendar_start_date.label("start"),
+        func.sum(source.c.dengue_total).label("total")
+    ).where(
+        source.c.t_res.in_(tuple(outbreaks.SEASONS)),
+        source.c.s_res.in_(spatial_resolutions),
+        source.c.dengue_total.is_not(None),
+        source.c.calendar_start_date.is_not(None)
+    ).group_by(
+        source.c.country_key,
+        region_key(source),
+        source.c.t_res,
+        source.c.calendar_start_date
+    )
+    if keys is not None:
+        query = query.where(series_filter(source, keys))
+    return db.execute(query).all()
+
+def changed_series(db, name, status, version):
+    """Series keys to detect again since the version in status, or None for all of them.
+
+    All series are rescanned on the first run and after imports that deleted rows.
+    """
+    table, spatial_resolutions = SOURCES[name]
+    if status is None or status.source_max_id is None or version[0] is None:
+        return None
+    deleted = db.execute(
+        select(func.coalesce(func.sum(database.import_log.c.rows_deleted), 0)).where(
+            database.import_log.c.table_name == table.name,
+            database.import_log.c.generation > (status.source_generation or 0)
+        )
+    ).scalar()
+    if deleted or version[0] < status.source_max_id:
+        return None
+
+    query = select(table.c.country_key, region_key(table)).where(
+        table.c.id > status.source_max_id,
+        table.c.s_res.in_(spatial_resolutions)
+    ).distinct()
+    return [tuple(row) for row in db.execute(query).all()]
+
+def write_alerts(db, name, records, keys, version):
+    """Replace the alerts of a source, or of the given series of it, and record the version, in one transaction"""
+    table = database.outbreak_alerts
+    detected_at = datetime.utcnow()
+    for record in records:
+        record["detected_at"] = detected_at
+
+    stale = delete(table).where(table.c.source == name)
+    if keys is not None:
+        stale = stale.where(series_filter(table, keys))
+    db.execute(stale)
+    if records:
+        db.execute(insert(table), records)
+
+    status = database.outbreak_status
+    db.execute(delete(status).where(status.c.source_table == SOURCES[name][0].name))
+    db.execute(insert(status).values(
+        source_table=SOURCES[name][0].name,
+        source_max_id=version[0],
+        source_generation=version[1],
+        detected_at=detected_at
+    ))
+    db.commit()
+
+def detect_source(db, name, full=False, baseline_years=outbreaks.BASELINE_YEARS, k=outbreaks.ENDEMIC_K, report=print):
+    """Bring the alerts of one source table up to date, returning the number of series scanned"""
+    table = SOURCES[name][0]
+    version = queries.dataset_version(db, table)
+    status = db.execute(
+        select(database.outbreak_status).where(database.outbreak_status.c.source_table == table.name)
+    ).first()
+    if not full and status is not None and (status.source_max_id, status.source_generation) == version:
+        report(f"{name}: alerts are up to date")
+        return 0
+
+    keys = None if full else changed_series(db, name, status, version)
+    if keys == []:
+        write_alerts(db, name, [], [], version)
+        report(f"{name}: no weekly or monthly series changed")
+        return 0
+
+    started = time.perf_counter()
+    rows = load_rows(db, name, keys)
+    records = outbreaks.detect(rows, name, baseline_years, k)
+    write_alerts(db, name, records, keys, version)
+    series = len({tuple(row[:2]) for row in rows})
+    scope = "all" if keys is None else "changed"
+    report(
+        f"{name}: scanned {series} {scope} series ({len(rows):,} periods) "
+        f"and stored {len(records):,} alerts in {time.perf_counter() - started:.2f}s"
+    )
+    return series
+
+def run(full=False, baseline_years=outbreaks.BASELINE_YEARS, k=outbreaks.ENDEMIC_K, report=print):
+    """Bring the alerts of every source table up to date"""
+    db = database.SessionLocal()
+    try:
+        for name in SOURCES:
+            detect_source(db, name, full, baseline_years, k, report)
+    finally:
+        db.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Flag outbreak periods in the dengue case series")
+    parser.add_argument("--full", action="store_true", help="Rescan every series instead of those changed since the last run")
+    parser.add_argument("--baseline-years", type=int, default=outbreaks.BASELINE_YEARS,
+                        help="Previous years forming the endemic channel of each period")
+    parser.add_argument("--k", type=float, default=outbreaks.ENDEMIC_K,
+                        help="Standard deviations above the expected count that flag a period")
+    args = parser.parse_args(argv)
+
+    run(args.full, args.baseline_years, args.k, report=lambda message: print(message, flush=True))
+
+if __name__ == "__main__":
+    main()
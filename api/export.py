@@ -0,0 +1,141 @@
+import csv
+import inspect
+import io
+from datetime import date
+from typing import Optional
+
+import orjson
+from sqlalchemy import select
+from starlette.concurrency import iterate_in_threadpool
+
+import database
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+except ImportError:  # Arrow export is optional
+    pyarrow = None
+
+EXPORT_TABLES = {
+    "temporal": database.temporal_data,
+    "spatial": database.spatial_data,
+}
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+def build_export_query(
+    table,
+    country_key: Optional[str] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    year: Optional[int] = None
+):
+    """Select the source columns of table (a source table or its deduplicated rows) with the optional filters applied"""
+    query = select(*[table.c[name] for name in database.SOURCE_COLUMNS])
+
+    if country_key:
+        query = query.where(table.c.country_key == country_key)
+    # Year bounds implied by the date filters prune the yearly partitions
+    if start_date:
+        query = query.where(table.c.calendar_start_date >= start_date, table.c.year >= start_date.year)
+    if end_date:
+        query = query.where(table.c.calendar_end_date <= end_date, table.c.year <= end_date.year)
+    if year:
+        query = query.where(table.c.year == year)
+
+    if country_key:
+        return query.order_by(table.c.calendar_start_date, table.c.id)
+    return query.order_by(table.c.id)
+
+def _sync_batches(sessions, query, batch_size):
+    db = next(sessions)
+    try:
+        result = db.execute(query.execution_options(yield_per=batch_size))
+        for partition in result.partitions(batch_size):
+            yield partition
+    finally:
+        sessions.close()
+
+async def iter_batches(query, batch_size: int):
+    """Stream query rows in fixed-size batches from a server-side cursor.
+
+    Uses its own session rather than the request's, since the response body
+    is produced after the endpoint function has returned.
+    """
+    sessions = database.get_db()
+    if inspect.isasyncgen(sessions):
+        db = await sessions.__anext__()
+        try:
+            result = await db.stream(query.execution_options(yield_per=batch_size))
+            async for partition in result.partitions(batch_size):
+                yield partition
+        finally:
+            await sessions.aclose()
+    else:
+        async for partition in iterate_in_threadpool(_sync_batches(sessions, query, batch_size)):
+            yield partition
+
+async def encode_csv(batches, columns):
+    """Encode batches of rows as CSV, one chunk per batch"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    async for batch in batches:
+        writer.writerows(batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+async def encode_ndjson(batches, columns):
+    """Encode batches of rows as newline-delimited JSON objects"""
+    async for batch in batches:
+        yield b"".join(
+            orjson.dumps(dict(zip(columns, row)), default=str, option=orjson.OPT_APPEND_NEWLINE)
+            for row in batch
+        )
+
+def arrow_schema(table):
+    """Arrow schema for the source columns of table"""
+    types = {
+        "INTEGER": pyarrow.int64(),
+        "FLOAT": pyarrow.float64(),
+        "DATE": pyarrow.date32(),
+    }
+    return pyarrow.schema([
+        (name, types.get(str(table.c[name].type), pyarrow.string()))
+        for name in database.SOURCE_COLUMNS
+    ])
+
+async def encode_arrow(batches, schema):
+    """Encode batches of rows as an Arrow IPC stream, one record batch per row batch"""
+    sink = io.BytesIO()
+    writer = pyarrow.ipc.new_stream(sink, schema)
+    async for batch in batches:
+        columns = list(zip(*batch)) if batch else [[] for _ in schema]
+        writer.write_batch(pyarrow.record_batch(
+            [pyarrow.array(values, type=field.type) for values, field in zip(columns, schema)],
+            schema=schema
+        ))
+        yield sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+    writer.close()
+    yield sink.getvalue()
+
+def encode(batches, table, export_format: str):
+    """Encode streamed batches of table rows in the requested format"""
+    if export_format == "csv":
+        return encode_csv(batches, database.SOURCE_COLUMNS)
+    if export_format == "ndjson":
+        return encode_ndjson(batches, database.SOURCE_COLUMNS)
+    if export_format == "arrow":
+        if pyarrow is None:
+            raise RuntimeError("Arrow export requires the pyarrow package")
+        return encode_arrow(batches, arrow_schema(table))
+    raise ValueError(f"Unknown export format: {export_format}")
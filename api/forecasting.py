@@ -0,0 +1,387 @@
+"""Seasonal baseline forecasts for monthly dengue case series.
+
+All models are fitted in batch: every country (and region) series is a row of one
+2D array, right-aligned so each row ends at its own last observed month, and the
+fitting code operates on whole arrays at once.
+"""
+import warnings
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+import database
+import rollups
+
+SEASON = 12
+MAX_HISTORY_MONTHS = 120
+MIN_REGRESSION_MONTHS = 2 * SEASON
+SMOOTHING_ALPHAS = np.linspace(0.05, 0.95, 19)
+INTERVAL_Z = 1.959963984540054  # 95% prediction intervals
+MODELS = ("seasonal_naive", "exponential_smoothing", "seasonal_regression")
+
+# Series key: (country_key, region_key), with region_key the lower-cased adm_1_name,
+# or None for the national series
+SeriesKey = Tuple[str, Optional[str]]
+
+@dataclass
+class SeriesPanel:
+    """Monthly series as rows of a right-aligned array"""
+    keys: List[SeriesKey]
+    names: Dict[SeriesKey, Tuple[str, Optional[str]]]
+    values: np.ndarray  # (n_series, n_months), NaN where unobserved
+    last_month: np.ndarray  # (n_series,) datetime64[M] of each row's last column
+
+@dataclass
+class FittedModels:
+    """Fitted parameters of every model for every series in a panel"""
+    panel: SeriesPanel
+    index: Dict[SeriesKey, int]
+    last_season: np.ndarray  # (n, 12) values of the last observed season
+    naive_sigma: np.ndarray
+    level: np.ndarray
+    alpha: np.ndarray
+    smoothing_sigma: np.ndarray
+    beta: np.ndarray  # (n, 13) intercept, trend and 11 month effects on log1p scale
+    regression_sigma: np.ndarray
+    scores: np.ndarray  # (n, len(MODELS)) recent mean absolute one-step error
+    best_model: np.ndarray  # (n,) index into MODELS
+
+def load_series(db: Session) -> SeriesPanel:
+    """Read monthly case totals for all national and regional series in one query.
+
+    Weekly and monthly rows are summed by the month they start in. Each series keeps
+    only the temporal resolution it reports most often, so weekly and monthly rows
+    for the same period are not double counted.
+    """
+    source = rollups.rows_for(db, database.temporal_data)
+    month = func.date_trunc("month", source.c.calendar_start_date)
+    region_key = func.lower(func.btrim(source.c.adm_1_name))
+    query = select(
+        source.c.country_key,
+        region_key.label("region_key"),
+        func.min(source.c.adm_0_name).label("country"),
+        func.min(source.c.adm_1_name).label("region"),
+        source.c.t_res,
+        month.label("month"),
+        func.sum(source.c.dengue_total).label("total")
+    ).where(
+        source.c.t_res.in_(("Week", "Month")),
+        source.c.s_res.in_(("Admin0", "Admin1")),
+        source.c.dengue_total != None
+    ).group_by(
+        source.c.country_key,
+        region_key,
+        source.c.t_res,
+        month
+    )
+
+    return build_panel(db.execute(query).all())
+
+def build_panel(rows) -> SeriesPanel:
+    """Build a right-aligned SeriesPanel from rows of load_series' query"""
+    counts = {}
+    for row in rows:
+        key = (row.country_key, row.region_key)
+        counts[(key, row.t_res)] = counts.get((key, row.t_res), 0) + 1
+
+    resolution = {}
+    for (key, t_res), count in sorted(counts.items(), key=lambda item: item[1]):
+        resolution[key] = t_res
+
+    keys = sorted(resolution, key=lambda key: (key[0] or "", key[1] or ""))
+    index = {key: i for i, key in enumerate(keys)}
+    names = {}
+    points = []
+    for row in rows:
+        key = (row.country_key, row.region_key)
+        if resolution.get(key) != row.t_res:
+            continue
+        names[key] = (row.country, row.region)
+        month = np.datetime64(row.month.date() if hasattr(row.month, "date") else row.month, "M")
+        points.append((index[key], month, float(row.total)))
+
+    if not points:
+        return SeriesPanel([], {}, np.empty((0, MAX_HISTORY_MONTHS)), np.empty(0, dtype="datetime64[M]"))
+
+    series_index = np.array([point[0] for point in points])
+    months = np.array([point[1] for point in points], dtype="datetime64[M]")
+    totals = np.array([point[2] for point in points])
+
+    last_month = np.full(len(keys), np.datetime64("NaT"), dtype="datetime64[M]")
+    np.maximum.at(last_month.view("int64"), series_index, months.view("int64"))
+    offset = (last_month[series_index] - months).astype(int)
+    keep = offset < MAX_HISTORY_MONTHS
+
+    cells = (series_index[keep], MAX_HISTORY_MONTHS - 1 - offset[keep])
+    sums = np.zeros((len(keys), MAX_HISTORY_MONTHS))
+    np.add.at(sums, cells, totals[keep])
+    seen = np.zeros(sums.shape, dtype=bool)
+    seen[cells] = True
+
+    return SeriesPanel(keys, names, np.where(seen, sums, np.nan), last_month)
+
+def month_of_year(last_month: np.ndarray, n_columns: int, start: int = 0) -> np.ndarray:
+    """Month of year (0-11) of columns start..start+n_columns-1 for each right-aligned row.
+
+    Column MAX_HISTORY_MONTHS - 1 holds each row's last_month.
+    """
+    last = last_month.astype(int) % SEASON
+    columns = np.arange(start, start + n_columns) - (MAX_HISTORY_MONTHS - 1)
+    return (last[:, None] + columns[None, :]) % SEASON
+
+def regression_design(moy: np.ndarray, columns: np.ndarray) -> np.ndarray:
+    """Design matrix (n, t, 13): intercept, trend in years and month-of-year dummies"""
+    n, t = moy.shape
+    design = np.zeros((n, t, 2 + SEASON - 1))
+    design[:, :, 0] = 1.0
+    design[:, :, 1] = (columns - (MAX_HISTORY_MONTHS - 1)) / SEASON
+    for month in range(1, SEASON):
+        design[:, :, 1 + month] = moy == month
+    return design
+
+def recent_mae(errors: np.ndarray) -> np.ndarray:
+    """Mean absolute error over each row's last season of observed errors, inf if none"""
+    recent = np.abs(errors[:, -SEASON:])
+    counts = (~np.isnan(recent)).sum(axis=1)
+    totals = np.nansum(recent, axis=1)
+    return np.where(counts > 0, totals / np.maximum(counts, 1), np.inf)
+
+def fit_panel(panel: SeriesPanel) -> FittedModels:
+    """Fit every model to every series of the panel at once"""
+    values = panel.values
+    n, t = values.shape
+    observed = ~np.isnan(values)
+    moy = month_of_year(panel.last_month, t)
+
+    # All-NaN rows and months are expected here and resolved below
+    with np.errstate(invalid="ignore", divide="ignore"), warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+
+        # Seasonal naive: repeat the last observed season, filling gaps with month-of-year means
+        month_means = np.full((n, SEASON), np.nan)
+        for month in range(SEASON):
+            in_month = np.where(moy == month, values, np.nan)
+            month_means[:, month] = np.nanmean(in_month, axis=1)
+        overall_mean = np.nanmean(values, axis=1)
+        month_means = np.where(np.isnan(month_means), overall_mean[:, None], month_means)
+        last_season = values[:, -SEASON:].copy()
+        season_moy = moy[:, -SEASON:]
+        gaps = np.isnan(last_season)
+        last_season[gaps] = np.take_along_axis(month_means, season_moy, axis=1)[gaps]
+        last_season = np.nan_to_num(last_season)
+
+        naive_errors = values[:, SEASON:] - values[:, :-SEASON]
+        naive_sigma = np.nan_to_num(np.nanstd(naive_errors, axis=1))
+
+        # Simple exponential smoothing, grid-searching alpha per series
+        alphas = SMOOTHING_ALPHAS[:, None]
+        first = np.argmax(observed, axis=1)
+        level = np.broadcast_to(values[np.arange(n), first], (len(SMOOTHING_ALPHAS), n)).copy()
+        level = np.nan_to_num(level)
+        errors = np.full((len(SMOOTHING_ALPHAS), n, t), np.nan)
+        for column in range(t):
+            y = values[:, column]
+            error = y[None, :] - level
+            has_value = ~np.isnan(error) & (column > first)[None, :]
+            errors[:, :, column] = np.where(has_value, error, np.nan)
+            level = np.where(~np.isnan(y)[None, :], level + alphas * np.nan_to_num(error), level)
+        sse = np.nansum(errors ** 2, axis=2)
+        best_alpha = np.argmin(sse, axis=0)
+        rows = np.arange(n)
+        smoothing_errors = errors[best_alpha, rows]
+        smoothing_sigma = np.nan_to_num(np.nanstd(smoothing_errors, axis=1))
+
+        # Log-linear seasonal regression, solved with batched weighted normal equations
+        columns = np.arange(t)
+        design = regression_design(moy, columns[None, :])
+        weights = observed.astype(float)
+        target = np.log1p(np.clip(np.nan_to_num(values), 0, None))
+        xtx = np.einsum("nti,nt,ntj->nij", design, weights, design)
+        xtx += 1e-6 * np.eye(design.shape[2])[None, :, :]
+        xty = np.einsum("nti,nt,nt->ni", design, weights, target)
+        beta = np.linalg.solve(xtx, xty[:, :, None])[:, :, 0]
+        fitted = np.einsum("nti,ni->nt", design, beta)
+        log_residuals = np.where(observed, target - fitted, np.nan)
+        regression_sigma = np.nan_to_num(np.nanstd(log_residuals, axis=1))
+        regression_errors = np.where(observed, values - np.expm1(fitted), np.nan)
+
+    regression_score = recent_mae(regression_errors)
+    regression_score[observed.sum(axis=1) < MIN_REGRESSION_MONTHS] = np.inf
+    scores = np.stack([
+        recent_mae(naive_errors),
+        recent_mae(smoothing_errors),
+        regression_score
+    ], axis=1)
+    best_model = np.argmin(scores, axis=1)
+    # Fall back to exponential smoothing when no model has a usable score
+    best_model[np.isinf(scores).all(axis=1)] = MODELS.index("exponential_smoothing")
+
+    return FittedModels(
+        panel=panel,
+        index={key: i for i, key in enumerate(panel.keys)},
+        last_season=last_season,
+        naive_sigma=naive_sigma,
+        level=level[best_alpha, rows],
+        alpha=SMOOTHING_ALPHAS[best_alpha],
+        smoothing_sigma=smoothing_sigma,
+        beta=beta,
+        regression_sigma=regression_sigma,
+        scores=scores,
+        best_model=best_model
+    )
+
+def forecast_panel(fitted: FittedModels, horizon: int, model: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Point forecasts and 95% interval bounds, each (n_series, horizon), for one model"""
+    n = len(fitted.panel.keys)
+    steps = np.arange(1, horizon + 1)
+
+    if model == "seasonal_naive":
+        point = fitted.last_season[:, (steps - 1) % SEASON]
+        seasons_ahead = np.ceil(steps / SEASON)
+        spread = INTERVAL_Z * fitted.naive_sigma[:, None] * np.sqrt(seasons_ahead)[None, :]
+        lower, upper = point - spread, point + spread
+    elif model == "exponential_smoothing":
+        point = np.repeat(fitted.level[:, None], horizon, axis=1)
+        growth = np.sqrt(1 + (steps[None, :] - 1) * fitted.alpha[:, None] ** 2)
+        spread = INTERVAL_Z * fitted.smoothing_sigma[:, None] * growth
+        lower, upper = point - spread, point + spread
+    elif model == "seasonal_regression":
+        columns = MAX_HISTORY_MONTHS - 1 + steps
+        moy = month_of_year(fitted.panel.last_month, horizon, start=MAX_HISTORY_MONTHS)
+        design = regression_design(moy, np.broadcast_to(columns, (n, horizon)))
+        log_point = np.einsum("nti,ni->nt", design, fitted.beta)
+        spread = INTERVAL_Z * fitted.regression_sigma[:, None]
+        point = np.expm1(log_point)
+        lower, upper = np.expm1(log_point - spread), np.expm1(log_point + spread)
+    else:
+        raise ValueError(f"Unknown model: {model}")
+
+    return np.clip(point, 0, None), np.clip(lower, 0, None), np.clip(upper, 0, None)
+
+def model_parameters(fitted: FittedModels, row: int, model: str) -> dict:
+    """Fitted parameters of one model for one series, as a JSON-ready artifact"""
+    if model == "seasonal_naive":
+        return {"last_season": fitted.last_season[row].tolist(), "sigma": float(fitted.naive_sigma[row])}
+    if model == "exponential_smoothing":
+        return {
+            "level": float(fitted.level[row]),
+            "alpha": float(fitted.alpha[row]),
+            "sigma": float(fitted.smoothing_sigma[row])
+        }
+    if model == "seasonal_regression":
+        return {"beta": fitted.beta[row].tolist(), "sigma": float(fitted.regression_sigma[row])}
+    raise ValueError(f"Unknown model: {model}")
+
+def truncate_panel(panel: SeriesPanel, months: int) -> SeriesPanel:
+    """The panel as it was months months before each series' last observation"""
+    values = np.full_like(panel.values, np.nan)
+    values[:, months:] = panel.values[:, :MAX_HISTORY_MONTHS - months]
+    return SeriesPanel(panel.keys, panel.names, values, panel.last_month - months)
+
+def backtest_panel(panel: SeriesPanel, horizon: int = 6, folds: int = 4, step: int = 3) -> Dict[str, dict]:
+    """Rolling-origin backtest of every model on every series of the panel.
+
+    Fold k refits all models on the history up to horizon + k * step months before
+    each series' end and scores the next horizon months. Returns, per model, arrays
+    (n_series,) of MAE, MAPE (%, over non-zero actuals), 95% interval coverage and
+    the number of scored points; metrics are NaN where nothing could be scored.
+    """
+    cuts = [horizon + fold * step for fold in range(folds)]
+    if not cuts or cuts[-1] + SEASON > MAX_HISTORY_MONTHS:
+        raise ValueError("Backtest folds need a season of history within MAX_HISTORY_MONTHS")
+
+    errors = {model: [] for model in MODELS}
+    pct_errors = {model: [] for model in MODELS}
+    covered = {model: [] for model in MODELS}
+    for cut in cuts:
+        history = truncate_panel(panel, cut)
+        fitted = fit_panel(history)
+        start = MAX_HISTORY_MONTHS - cut
+        actual = panel.values[:, start:start + horizon]
+        # Only score series with a full season of history at the origin
+        long_enough = (~np.isnan(history.values)).sum(axis=1) >= SEASON
+        actual = np.where(long_enough[:, None], actual, np.nan)
+        scored = ~np.isnan(actual)
+        positive = scored & (actual > 0)
+        for model in MODELS:
+            point, lower, upper = forecast_panel(fitted, horizon, model)
+            error = np.abs(actual - point)
+            errors[model].append(error)
+            pct_errors[model].append(np.where(positive, error / np.where(positive, actual, 1), np.nan))
+            covered[model].append(np.where(scored, (actual >= lower) & (actual <= upper), np.nan))
+
+    metrics = {}
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        for model in MODELS:
+            error = np.concatenate(errors[model], axis=1)
+            metrics[model] = {
+                "mae": np.nanmean(error, axis=1),
+                "mape": 100 * np.nanmean(np.concatenate(pct_errors[model], axis=1), axis=1),
+                "coverage": np.nanmean(np.concatenate(covered[model], axis=1), axis=1),
+                "points": (~np.isnan(error)).sum(axis=1),
+            }
+    return metrics
+
+def stored_models(records) -> FittedModels:
+    """Rebuild the fitted models of one series from its forecast_models records.
+
+    The records hold the parameters model_parameters wrote for every model, so the
+    series can be forecast without its history.
+    """
+    by_model = {record["model"]: record for record in records}
+    first = records[0]
+    key = (first["country_key"], first["region_key"])
+    last_month = np.array([np.datetime64(first["history_end"], "M")])
+    panel = SeriesPanel([key], {key: (first["adm_0_name"], first["adm_1_name"])},
+                        np.full((1, MAX_HISTORY_MONTHS), np.nan), last_month)
+    naive = by_model["seasonal_naive"]["parameters"]
+    smoothing = by_model["exponential_smoothing"]["parameters"]
+    regression = by_model["seasonal_regression"]["parameters"]
+    selected = next((MODELS.index(record["model"]) for record in records if record["selected"]),
+                    MODELS.index("exponential_smoothing"))
+
+    return FittedModels(
+        panel=panel,
+        index={key: 0},
+        last_season=np.array([naive["last_season"]]),
+        naive_sigma=np.array([naive["sigma"]]),
+        level=np.array([smoothing["level"]]),
+        alpha=np.array([smoothing["alpha"]]),
+        smoothing_sigma=np.array([smoothing["sigma"]]),
+        beta=np.array([regression["beta"]]),
+        regression_sigma=np.array([regression["sigma"]]),
+        scores=np.full((1, len(MODELS)), np.nan),
+        best_model=np.array([selected])
+    )
+
+def predict(fitted: FittedModels, key: SeriesKey, horizon: int, model: str = "auto"):
+    """Forecast one series, returning None if it was not fitted"""
+    row = fitted.index.get(key)
+    if row is None:
+        return None
+
+    model_name = MODELS[fitted.best_model[row]] if model == "auto" else model
+    point, lower, upper = forecast_panel(fitted, horizon, model_name)
+    last_month = fitted.panel.last_month[row]
+    country, region = fitted.panel.names[key]
+
+    return {
+        "country": country,
+        "region": region,
+        "model": model_name,
+        "resolution": "month",
+        "history_end": str(last_month),
+        "forecasts": [
+            {
+                "period": str(last_month + step),
+                "forecast": float(point[row, step - 1]),
+                "lower": float(lower[row, step - 1]),
+                "upper": float(upper[row, step - 1])
+            }
+            for step in range(1, horizon + 1)
+        ]
+    }
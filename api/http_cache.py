@@ -0,0 +1,67 @@
+"""HTTP cache validators and Cache-Control policies for the API responses.
+
+ETags are derived from the version of the served data (the highest id and import
+generation of each source table) and the normalized request parameters, so they
+change exactly when a re-import or a different query could change the response.
+"""
+import hashlib
+import os
+from email.utils import formatdate, parsedate_to_datetime
+
+import cache
+
+# How long clients and shared caches may reuse a data response without revalidating it
+HTTP_CACHE_MAX_AGE = int(os.getenv("HTTP_CACHE_MAX_AGE", "60"))
+
+DEFAULT_CACHE_CONTROL = f"public, max-age={HTTP_CACHE_MAX_AGE}"
+
+# Cache-Control by route path, for routes that differ from DEFAULT_CACHE_CONTROL
+CACHE_CONTROL = {
+    "/health": "no-store",
+    "/ready": "no-store",
+    "/metrics": "no-store",
+    # Changes when train_models.py runs, which the data version does not track
+    "/predict/metrics": "no-cache",
+    # Changes when detect_outbreaks.py runs, after the import that changed the data version
+    "/alerts": "no-cache",
+}
+
+def cache_control(path):
+    """Cache-Control policy of a route path"""
+    return CACHE_CONTROL.get(path, DEFAULT_CACHE_CONTROL)
+
+def validators(version, path, params):
+    """ETag, Last-Modified and Cache-Control headers for a response of route path with params.
+
+    The last item of version is the Unix time of the last import, or None before any import.
+    """
+    digest = hashlib.sha1(repr((version, cache.cache_key(path, params))).encode()).hexdigest()
+    # Weak, since the same data may be sent with different content encodings
+    headers = {"ETag": f'W/"{digest[:32]}"', "Cache-Control": cache_control(path)}
+    if version[-1] is not None:
+        headers["Last-Modified"] = formatdate(int(version[-1]), usegmt=True)
+    return headers
+
+def etag_matches(if_none_match, etag):
+    """Weak comparison of an If-None-Match header against an ETag"""
+    if if_none_match.strip() == "*":
+        return True
+    opaque = lambda tag: tag.strip().removeprefix("W/")
+    return any(opaque(tag) == opaque(etag) for tag in if_none_match.split(","))
+
+def is_not_modified(request_headers, headers):
+    """Whether the client's cached copy, described by its conditional request headers, is still current.
+
+    If-None-Match takes precedence over If-Modified-Since, as in RFC 9110.
+    """
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag_matches(if_none_match, headers["ETag"])
+
+    if_modified_since = request_headers.get("if-modified-since")
+    if if_modified_since is None or "Last-Modified" not in headers:
+        return False
+    try:
+        return parsedate_to_datetime(if_modified_since) >= parsedate_to_datetime(headers["Last-Modified"])
+    except (TypeError, ValueError):
+        return False
@@ -0,0 +1,384 @@
+"""Bulk load the OpenDengue CSV extracts into PostgreSQL.
+
+Each extract is streamed, from a .csv file or straight out of a .csv.zip archive,
+into COPY FROM STDIN, and the three tables load concurrently on separate connections.
+COPY loads unquoted NA fields as NULL itself, so quoted values containing "NA"
+(such as "PANAMA") are never rewritten.
+
+Empty tables are loaded in full: secondary indexes are dropped before the COPY and
+rebuilt afterwards in the same transaction. Tables that already hold data are
+synchronized incrementally instead: the release is copied into a staging table and
+only rows whose content hash (row_hash) is new are inserted, and rows missing from
+the release deleted, so re-importing an unchanged release changes nothing. Either
+way readers see the previous data or the complete new data, and every run records
+its import generation and per-table changes in import_log.
+
+After an import that changed rows, the rollup tables are refreshed, and the import fails
+if any of them was not rebuilt from the imported rows. The outbreak alerts of the
+changed series are then recomputed with detect_outbreaks.py.
+
+spatial_data and temporal_data are partitioned by year. Rows are routed to their
+year's partition, which is created on demand; full loads scan the extract's years first
+so that the COPY writes straight into the year partitions. --years reloads only the given
+years: their partitions are truncated and refilled from the extract.
+
+Usage: python import_data.py [--data-dir ..] [--schema ../sql/load_data.sql] [--mode auto|full|incremental] [--years 2022,2023] [--skip-alerts]
+"""
+import argparse
+import csv
+import io
+import os
+import sys
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import database
+import detect_outbreaks
+import rollups
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+EXTRACTS = {
+    "national_data": "National_extract_V1_2_2.csv",
+    "spatial_data": "Spatial_extract_V1_2_2.csv",
+    "temporal_data": "Temporal_extract_V1_2_2.csv",
+}
+
+# Bytes handed to COPY per read, and how often load progress is reported
+COPY_BUFFER_BYTES = 1 << 20
+PROGRESS_SECONDS = 5
+
+# Memory for rebuilding indexes after the load
+MAINTENANCE_WORK_MEM = os.getenv("IMPORT_MAINTENANCE_WORK_MEM", "256MB")
+
+def find_extract(data_dir, filename):
+    """Path of the extract in data_dir, preferring the plain CSV over its .zip archive"""
+    for candidate in (filename, filename + ".zip"):
+        path = os.path.join(data_dir, candidate)
+        if os.path.exists(path):
+            return path
+    return None
+
+def open_extract(path):
+    """Open a CSV extract for binary reading, reading .zip archives without extracting them"""
+    if not path.endswith(".zip"):
+        return open(path, "rb")
+
+    with zipfile.ZipFile(path) as archive:
+        members = [
+            name for name in archive.namelist()
+            if name.endswith(".csv") and not name.startswith("__MACOSX/")
+        ]
+        if len(members) != 1:
+            raise ValueError(f"Expected one CSV file in {path}, found {len(members)}")
+        # The member stays readable after the archive is closed
+        return archive.open(members[0])
+
+def extract_years(path):
+    """Distinct years of the rows in an extract, read from its year column ahead of the COPY"""
+    with open_extract(path) as raw:
+        rows = csv.reader(io.TextIOWrapper(raw, encoding="latin-1", newline=""))
+        header = [name.lower() for name in next(rows, [])]
+        if "year" not in header:
+            return []
+        column = header.index("year")
+        values = {row[column] for row in rows if len(row) > column}
+    return sorted(int(value) for value in values if value.isdigit())
+
+def copy_sql(table, years=None):
+    """COPY statement loading the source columns of table from CSV on STDIN, optionally only rows of years"""
+    columns = ", ".join(database.SOURCE_COLUMNS)
+    sql = f"COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv, HEADER true, NULL 'NA')"
+    if years:
+        sql += f" WHERE year IN ({', '.join(str(int(year)) for year in years)})"
+    return sql
+
+def parse_years(value):
+    """Parse a comma-separated list of years"""
+    try:
+        years = sorted({int(year) for year in value.split(",") if year.strip()})
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid year list: {value}")
+    if not years:
+        raise argparse.ArgumentTypeError("No years given")
+    return years
+
+class ProgressReader:
+    """File wrapper that counts the lines read through it and reports load throughput"""
+
+    def __init__(self, raw, label, report=print, clock=time.monotonic, interval=PROGRESS_SECONDS):
+        self.raw = raw
+        self.label = label
+        self.report = report
+        self.clock = clock
+        self.interval = interval
+        self.lines = 0
+        self.started_at = clock()
+        self.reported_at = self.started_at
+
+    def read(self, size=-1):
+        chunk = self.raw.read(size)
+        self.lines += chunk.count(b"\n")
+        now = self.clock()
+        if now - self.reported_at >= self.interval:
+            self.reported_at = now
+            rows = max(self.lines - 1, 0)  # Excluding the header
+            self.report(f"{self.label}: {rows:,} rows ({rows / (now - self.started_at):,.0f} rows/s)")
+        return chunk
+
+def secondary_indexes(cursor, table):
+    """Names and definitions of the indexes on table that do not back a constraint.
+
+    Indexes of partitioned tables are defined ON ONLY the parent; the returned definitions
+    recreate them on every partition.
+    """
+    cursor.execute(
+        """
+        SELECT format('%%I.%%I', n.nspname, c.relname), pg_get_indexdef(i.indexrelid)
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE i.indrelid = %s::regclass
+          AND NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conindid = i.indexrelid)
+        ORDER BY c.relname
+        """,
+        (table,)
+    )
+    return [(name, definition.replace(" ON ONLY ", " ON ", 1)) for name, definition in cursor.fetchall()]
+
+def is_partitioned(cursor, table):
+    """Whether table is partitioned by year"""
+    cursor.execute("SELECT relkind = 'p' FROM pg_class WHERE oid = %s::regclass", (table,))
+    return cursor.fetchone()[0]
+
+def create_year_partitions(cursor, table, years_sql, params=(), report=print):
+    """Create the partitions missing for the years selected by years_sql, before rows are routed to them"""
+    cursor.execute(f"SELECT create_year_partitions(%s, ARRAY({years_sql}))", (table, *params))
+    created = cursor.fetchone()[0]
+    if created:
+        report(f"{table}: created {created} year partitions")
+
+def copy_extract(cursor, table, path, report, years=None):
+    """COPY an extract into table, returning the number of rows loaded"""
+    started = time.monotonic()
+    with open_extract(path) as raw:
+        cursor.copy_expert(copy_sql(table, years), ProgressReader(raw, table, report), size=COPY_BUFFER_BYTES)
+    rows = cursor.rowcount
+    elapsed = time.monotonic() - started
+    report(f"{table}: copied {rows:,} rows in {elapsed:.1f}s ({rows / max(elapsed, 1e-9):,.0f} rows/s)")
+    return rows
+
+def full_load(cursor, table, path, keep_indexes, report):
+    """Append every row of the extract, rebuilding secondary indexes afterwards"""
+    indexes = [] if keep_indexes else secondary_indexes(cursor, table)
+    for name, _ in indexes:
+        cursor.execute(f"DROP INDEX {name}")
+
+    if is_partitioned(cursor, table):
+        # The year partitions exist before the COPY, so rows are routed straight to them.
+        # Only the ASCII year column is read, so the scan decodes the extract as latin-1
+        years = extract_years(path)
+        if years:
+            create_year_partitions(cursor, table, "SELECT unnest(%s::int[])", (years,), report)
+
+    rows = copy_extract(cursor, table, path, report)
+    # Only rows the pre-scan could not place, such as unparsable years, land in the default partition
+    cursor.execute("SELECT split_default_partition(%s)", (table,))
+    created = cursor.fetchone()[0]
+    if created:
+        report(f"{table}: created {created} year partitions for stray rows")
+
+    started = time.monotonic()
+    for _, definition in indexes:
+        cursor.execute(definition)
+    if indexes:
+        report(f"{table}: rebuilt {len(indexes)} indexes in {time.monotonic() - started:.1f}s")
+    return rows, 0
+
+def incremental_load(cursor, table, path, report):
+    """Synchronize table with the extract by row content, returning (inserted, deleted)"""
+    columns = ", ".join(database.SOURCE_COLUMNS)
+    stage = f"{table}_stage"
+    # The stage keeps the table's NOT NULL and CHECK constraints and its generated row_hash, so
+    # rows the table would reject fail the COPY; ids are only assigned on insert into the table
+    cursor.execute(
+        f"CREATE TEMP TABLE {stage} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING GENERATED) "
+        f"ON COMMIT DROP"
+    )
+    cursor.execute(f"ALTER TABLE {stage} DROP COLUMN id")
+    copy_extract(cursor, stage, path, report)
+    cursor.execute(f"CREATE INDEX ON {stage} (row_hash)")
+    cursor.execute(f"ANALYZE {stage}")
+    create_year_partitions(cursor, table, f"SELECT DISTINCT year FROM {stage}", report=report)
+
+    # Changed rows are replaced: the old version is deleted and the new one inserted
+    cursor.execute(
+        f"DELETE FROM {table} t WHERE NOT EXISTS (SELECT 1 FROM {stage} s WHERE s.row_hash = t.row_hash)"
+    )
+    deleted = cursor.rowcount
+    cursor.execute(
+        f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {stage} s "
+        f"WHERE NOT EXISTS (SELECT 1 FROM {table} t WHERE t.row_hash = s.row_hash)"
+    )
+    inserted = cursor.rowcount
+    return inserted, deleted
+
+def years_load(cursor, table, path, years, report):
+    """Replace the rows of years with those in the extract, returning (inserted, deleted)"""
+    if is_partitioned(cursor, table):
+        create_year_partitions(cursor, table, "SELECT unnest(%s::int[])", (years,), report)
+        partitions = ", ".join(f"{table}_y{year}" for year in years)
+        cursor.execute(
+            " UNION ALL ".join(f"SELECT count(*) FROM {table}_y{year}" for year in years)
+        )
+        deleted = sum(row[0] for row in cursor.fetchall())
+        cursor.execute(f"TRUNCATE {partitions}")
+    else:
+        cursor.execute(f"DELETE FROM {table} WHERE year = ANY(%s)", (years,))
+        deleted = cursor.rowcount
+    inserted = copy_extract(cursor, table, path, report, years)
+    return inserted, deleted
+
+def load_table(table, path, generation, mode="auto", keep_indexes=False, report=print, years=None):
+    """Load one extract into table in a single transaction, returning (inserted, deleted)"""
+    connection = database.engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        # The API's statement timeout applies to the engine's connections
+        cursor.execute("SET statement_timeout = 0")
+        cursor.execute("SET maintenance_work_mem = %s", (MAINTENANCE_WORK_MEM,))
+
+        if years:
+            mode = "years"
+        elif mode == "auto":
+            cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {table})")
+            mode = "incremental" if cursor.fetchone()[0] else "full"
+
+        if mode == "years":
+            inserted, deleted = years_load(cursor, table, path, years, report)
+        elif mode == "full":
+            inserted, deleted = full_load(cursor, table, path, keep_indexes, report)
+        else:
+            inserted, deleted = incremental_load(cursor, table, path, report)
+        report(f"{table}: {mode} load inserted {inserted:,} and deleted {deleted:,} rows")
+
+        cursor.execute(
+            "INSERT INTO import_log (generation, table_name, mode, rows_inserted, rows_deleted) "
+            "VALUES (%s, %s, %s, %s, %s)",
+            (generation, table, mode, inserted, deleted)
+        )
+        if inserted or deleted:
+            cursor.execute(f"ANALYZE {table}")
+        connection.commit()
+        return inserted, deleted
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+
+def run_sql(sql, params=None):
+    """Execute a script of SQL statements in one transaction, returning the first row of the last result"""
+    connection = database.engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute("SET statement_timeout = 0")
+        cursor.execute(sql, params)
+        row = cursor.fetchone() if cursor.description else None
+        connection.commit()
+        return row
+    finally:
+        connection.close()
+
+def report_year_mismatches(table, report, years=None, sample=5):
+    """Report rows whose year lies outside the years of their dates, which date-filtered queries miss"""
+    condition = "year NOT BETWEEN EXTRACT(YEAR FROM calendar_start_date) AND EXTRACT(YEAR FROM calendar_end_date)"
+    params = (sample,)
+    if years:
+        condition += " AND year = ANY(%s)"
+        params = (sample, years)
+    count, ids = run_sql(f"SELECT count(*), (array_agg(id ORDER BY id))[1:%s] FROM {table} WHERE {condition}", params)
+    if count:
+        report(f"{table}: {count:,} rows have a year outside their calendar dates (ids {', '.join(map(str, ids))})")
+    return count
+
+def stale_rollups(tables):
+    """Names of the rollups and deduplicated views of tables not built from their current rows"""
+    with database.SessionLocal() as db:
+        return [
+            derived.name
+            for table in tables
+            for derived in rollups.derived_tables(table)
+            if not rollups.is_fresh(db, derived, table)
+        ]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load the OpenDengue CSV extracts into PostgreSQL")
+    parser.add_argument("--data-dir", default=os.path.join(BASE_DIR, ".."),
+                        help="Directory holding the extracts, as .csv or .csv.zip (default: repository root)")
+    parser.add_argument("--schema", default=os.path.join(BASE_DIR, "..", "sql", "load_data.sql"),
+                        help="Schema script to apply before loading")
+    parser.add_argument("--mode", choices=("auto", "full", "incremental"), default="auto",
+                        help="full appends every row, incremental synchronizes with the release; "
+                             "auto loads empty tables in full and the rest incrementally")
+    parser.add_argument("--keep-indexes", action="store_true",
+                        help="Run full loads with secondary indexes in place instead of rebuilding them")
+    parser.add_argument("--years", type=parse_years,
+                        help="Comma-separated years to reload, replacing only their rows; "
+                             "years missing from the extracts are emptied")
+    parser.add_argument("--skip-alerts", action="store_true",
+                        help="Do not update the outbreak alerts; run detect_outbreaks.py later instead")
+    args = parser.parse_args(argv)
+
+    report = lambda message: print(message, flush=True)
+
+    with open(args.schema) as schema:
+        run_sql(schema.read())
+
+    sources = {}
+    for table, filename in EXTRACTS.items():
+        path = find_extract(args.data_dir, filename)
+        if path is None:
+            report(f"{table}: {filename} not found in {args.data_dir}, skipping")
+        else:
+            sources[table] = path
+    if not sources:
+        sys.exit("No extracts found")
+
+    generation = run_sql("SELECT nextval('import_generation_seq')")[0]
+    report(f"Import generation {generation}")
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=len(sources)) as pool:
+        futures = {
+            table: pool.submit(load_table, table, path, generation, args.mode, args.keep_indexes, report, args.years)
+            for table, path in sources.items()
+        }
+        changes = {table: future.result() for table, future in futures.items()}
+    inserted = sum(change[0] for change in changes.values())
+    deleted = sum(change[1] for change in changes.values())
+    elapsed = time.monotonic() - started
+    report(f"Inserted {inserted:,} and deleted {deleted:,} rows in {len(sources)} tables in {elapsed:.1f}s")
+    for table, (table_inserted, _) in changes.items():
+        if table_inserted:
+            report_year_mismatches(table, report, args.years)
+
+    # Only the views and rollups of tables whose rows changed, or that an earlier run left
+    # stale, are rebuilt
+    refresh = [
+        table for table, (table_inserted, table_deleted) in changes.items()
+        if table_inserted or table_deleted or stale_rollups([getattr(database, table)])
+    ]
+    if refresh:
+        for table in refresh:
+            run_sql("SELECT refresh_table_rollups(%s)", (table,))
+        stale = stale_rollups([getattr(database, table) for table in refresh])
+        if stale:
+            sys.exit(f"Rollups not refreshed from the imported rows: {', '.join(stale)}")
+        report(f"Refreshed the rollup tables of {', '.join(refresh)}")
+        if not args.skip_alerts:
+            detect_outbreaks.run(report=report)
+
+if __name__ == "__main__":
+    main()
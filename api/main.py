@@ -1,17 +1,43 @@
-from fastapi import FastAPI, Depends, HTTPException, Query
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from sqlalchemy.orm import Session
-from sqlalchemy import func, select, and_, desc
 from typing import List, Optional
+from contextlib import asynccontextmanager
 from datetime import date
+import inspect
 
+import cache
+import compression
 import database
+import export
+import forecasting
+import http_cache
+import metrics
+import name_index
+import pagination
+import queries
+import repository
 import schemas
+import serialization
+
+@asynccontextmanager
+async def lifespan(app):
+    """Build the name index before serving, so the first requests do not wait for its query"""
+    try:
+        async for db in get_db():
+            await database.run_sync(db, get_name_index)
+    except Exception:
+        # The data is not available yet; the first request needing the index builds it
+        pass
+    yield
 
 app = FastAPI(
     title="Dengue Data API",
     description="API for accessing dengue fever data from around the world",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Enable CORS
@@ -23,8 +49,48 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress large responses with brotli or gzip
+app.add_middleware(compression.CompressionMiddleware)
+
+# Time every request, including compression, and label its SQL statements with its route
+app.add_middleware(metrics.MetricsMiddleware)
+metrics.instrument_engine(database.engine, "sync")
+if database.async_engine is not None:
+    metrics.instrument_engine(database.async_engine.sync_engine, "async")
+
+@asynccontextmanager
+async def open_db():
+    """Session of the data backend, resolved per use so database.get_db can be swapped out"""
+    sessions = repository.get_db()
+    if inspect.isasyncgen(sessions):
+        db = await sessions.__anext__()
+        try:
+            yield db
+        finally:
+            await sessions.aclose()
+    else:
+        db = next(sessions)
+        try:
+            yield db
+        finally:
+            sessions.close()
+
+async def get_db():
+    """Session dependency of the data backend"""
+    async with open_db() as db:
+        yield db
+
+def decode_cursor(cursor: Optional[str], types):
+    """Decode a pagination cursor parameter, rejecting malformed tokens with a 400"""
+    if cursor is None:
+        return None
+    try:
+        return pagination.decode_cursor(cursor, types)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 @app.get("/", response_model=schemas.ApiResponse)
-def root():
+async def root():
     """Root endpoint with API information"""
     return schemas.ApiResponse(
         status="success",
@@ -37,227 +103,482 @@ def root():
                 "/national/yearly",
                 "/spatial/regions",
                 "/temporal/data",
-                "/health"
+                "/dashboard/global",
+                "/dashboard/country/{country}",
+                "/export/{dataset}",
+                "/predict",
+                "/predict/metrics",
+                "/alerts",
+                "/aggregate",
+                "/search",
+                "/health",
+                "/ready",
+                "/metrics"
             ]
         },
         message="Welcome to the Dengue Data API"
     )
 
-@app.get("/health")
-def health_check(db: Session = Depends(database.get_db)):
-    """Health check endpoint that tests database connection"""
+# Snapshot of /national/stats, recomputed only after new national data is imported
+stats_cache = cache.SnapshotCache(repository.national_data_version)
+
+# Forecast models for every series, refitted only after new temporal data is imported
+forecast_cache = cache.SnapshotCache(repository.temporal_data_version)
+
+# Cache of read endpoint results keyed by normalized query parameters
+response_cache = cache.build_response_cache()
+
+# Version of all served data, for the ETag and Last-Modified validators
+data_version_cache = cache.SnapshotCache(repository.data_version)
+
+# Index of the country and region names, rebuilt after new data is imported
+name_index_cache = cache.SnapshotCache(repository.data_version)
+
+metrics.register_caches({
+    "stats": stats_cache,
+    "forecast": forecast_cache,
+    "response": response_cache,
+    "data_version": data_version_cache,
+    "names": name_index_cache,
+})
+
+def get_name_index(db):
+    """The name index of the current data, built from one query when the data changed"""
+    return name_index_cache.get_or_compute(
+        "names", db, lambda session: name_index.NameIndex(repository.name_rows(session))
+    )
+
+def canonical_names(db, country, region=None):
+    """Canonical adm_0_name and adm_1_name for country and region parameters, resolved through the name index.
+
+    ISO3 codes and close misspellings resolve to the names in the data; names the index
+    does not know are returned unchanged.
+    """
+    index = get_name_index(db)
+    canonical_country = index.resolve_country(country) or country
+    canonical_region = region and (index.resolve_region(country, region) or region)
+    return canonical_country, canonical_region
+
+async def resolve_names(db, country, region=None):
+    """canonical_names for the parameters of a request, when a country is given"""
+    if country is None:
+        return None, region
+    return await database.run_sync(db, canonical_names, country, region)
+
+async def cached_response(db, endpoint, params, fn, *args):
+    """Response cache lookup at the current data version, the one the ETag is built from.
+
+    On a miss fn(session, *args) runs as in database.run_sync, but on a session of its own:
+    concurrent requests wait for the same computation, which must outlive the request that
+    started it and the session get_db closes when that request goes away. The request's
+    connection goes back to the pool first, so a miss never holds two connections at once.
+    """
+    version = await database.run_sync(db, data_version_cache.current_version)
+    await database.release_connection(db)
+
+    async def compute():
+        async with open_db() as session:
+            return await database.run_sync(session, fn, *args)
+
+    return await response_cache.get_or_compute_async(endpoint, params, compute, version)
+
+async def conditional_get(request: Request, db: Session = Depends(get_db)):
+    """Cache validator headers for the response, answering 304 before any query runs when the client's copy is current"""
+    version = await database.run_sync(db, data_version_cache.current_version)
+    path = request.scope["route"].path
+    headers = http_cache.validators(version, path, {**request.path_params, **request.query_params})
+    if http_cache.is_not_modified(request.headers, headers):
+        raise HTTPException(status_code=304, headers=headers)
+    return headers
+
+def cache_control(request: Request, response: Response):
+    """Add the Cache-Control policy of the route to the response, for endpoints without validators"""
+    headers = {"Cache-Control": http_cache.cache_control(request.scope["route"].path)}
+    response.headers.update(headers)
+    return headers
+
+@app.get("/health", dependencies=[Depends(cache_control)])
+async def health_check(db: Session = Depends(get_db)):
+    """Liveness check: the database answers a trivial query"""
     try:
-        # Simple database connection test
-        result = db.execute(select(func.count()).select_from(database.national_data)).scalar()
-        return {"status": "healthy", "database_connection": "ok", "records_count": result}
+        await database.run_sync(db, repository.ping)
+        return {
+            "status": "healthy",
+            "database_connection": "ok",
+            "stats_cache": stats_cache.stats(),
+            "forecast_cache": forecast_cache.stats(),
+            "response_cache": response_cache.stats()
+        }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database connection error: {str(e)}")
 
+@app.get("/ready", dependencies=[Depends(cache_control)])
+async def readiness_check(db: Session = Depends(get_db)):
+    """Readiness check: the data tables can be queried"""
+    try:
+        await database.run_sync(db, repository.data_version)
+        return {"status": "ready", "database_connection": "ok"}
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Data not available: {str(e)}")
+
+@app.get("/metrics")
+async def get_metrics(headers: dict = Depends(cache_control)):
+    """Prometheus metrics of the API"""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST, headers=headers)
+
 @app.get("/national/stats", response_model=schemas.ApiResponse)
-def get_national_stats(db: Session = Depends(database.get_db)):
+async def get_national_stats(db: Session = Depends(get_db), validators: dict = Depends(conditional_get)):
     """Get overall statistics about the dengue data"""
     try:
-        # Get record count
-        record_count = db.execute(select(func.count()).select_from(database.national_data)).scalar()
-        
-        # Get total cases
-        total_cases = db.execute(
-            select(func.sum(database.national_data.c.dengue_total)).select_from(database.national_data)
-        ).scalar() or 0
-        
-        # Get unique countries count
-        countries_count = db.execute(
-            select(func.count(database.national_data.c.adm_0_name.distinct())).select_from(database.national_data)
-        ).scalar()
-        
-        # Get year range
-        min_year = db.execute(
-            select(func.min(database.national_data.c.year)).select_from(database.national_data)
-        ).scalar()
-        
-        max_year = db.execute(
-            select(func.max(database.national_data.c.year)).select_from(database.national_data)
-        ).scalar()
-        
-        year_range = list(range(min_year, max_year + 1)) if min_year and max_year else []
-        
-        stats = schemas.DengueStats(
-            total_records=record_count,
-            total_cases=total_cases,
-            countries_count=countries_count,
-            year_range=year_range
+        stats = await cached_response(
+            db, "national/stats", {},
+            lambda session: stats_cache.get_or_compute("national_stats", session, repository.national_stats)
         )
         
-        return schemas.ApiResponse(status="success", data=stats)
+        return serialization.api_response(stats, headers=validators)
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/national/countries", response_model=schemas.ApiResponse)
-def get_top_countries(
+async def get_top_countries(
     limit: int = Query(10, description="Number of top countries to return"),
-    db: Session = Depends(database.get_db)
+    layout: str = Query("rows", pattern="^(rows|columns)$", description="rows (a list of records) or columns (one list per field)"),
+    db: Session = Depends(get_db),
+    validators: dict = Depends(conditional_get)
 ):
     """Get top countries by total dengue cases"""
     try:
-        query = select(
-            database.national_data.c.adm_0_name.label("country"),
-            func.sum(database.national_data.c.dengue_total).label("total_cases")
-        ).select_from(
-            database.national_data
-        ).group_by(
-            database.national_data.c.adm_0_name
-        ).order_by(
-            desc("total_cases")
-        ).limit(limit)
-        
-        results = [
-            schemas.CountryTotal(country=row.country, total_cases=row.total_cases)
-            for row in db.execute(query).all()
-        ]
+        results = await cached_response(
+            db, "national/countries", {"limit": limit},
+            repository.top_countries, limit
+        )
         
-        return schemas.ApiResponse(status="success", data=results)
+        return serialization.api_response(results, layout=layout, headers=validators)
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/national/yearly", response_model=schemas.ApiResponse)
-def get_yearly_data(
+async def get_yearly_data(
     country: Optional[str] = None,
-    db: Session = Depends(database.get_db)
+    layout: str = Query("rows", pattern="^(rows|columns)$", description="rows (a list of records) or columns (one list per field)"),
+    db: Session = Depends(get_db),
+    validators: dict = Depends(conditional_get)
 ):
     """Get yearly dengue case totals, optionally filtered by country"""
     try:
-        query = select(
-            database.national_data.c.year.label("year"),
-            func.sum(database.national_data.c.dengue_total).label("total_cases")
-        ).select_from(
-            database.national_data
-        )
-        
-        if country:
-            query = query.where(
-                func.lower(database.national_data.c.adm_0_name) == func.lower(country)
-            )
-        
-        query = query.group_by(
-            database.national_data.c.year
-        ).order_by(
-            database.national_data.c.year
+        country, _ = await resolve_names(db, country)
+        results = await cached_response(
+            db, "national/yearly", {"country": country},
+            repository.yearly_totals, country
         )
         
-        results = [
-            schemas.YearlyTotal(year=row.year, total_cases=row.total_cases)
-            for row in db.execute(query).all()
-        ]
-        
-        return schemas.ApiResponse(status="success", data=results)
+        return serialization.api_response(results, layout=layout, headers=validators)
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/spatial/regions", response_model=schemas.ApiResponse)
-def get_regional_data(
+async def get_regional_data(
     country: Optional[str] = None,
     year: Optional[int] = None,
     limit: int = Query(20, description="Number of regions to return"),
-    db: Session = Depends(database.get_db)
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    layout: str = Query("rows", pattern="^(rows|columns)$", description="rows (a list of records) or columns (one list per field)"),
+    db: Session = Depends(get_db),
+    validators: dict = Depends(conditional_get)
 ):
     """Get regional dengue case totals, optionally filtered by country and year"""
+    after = decode_cursor(cursor, queries.REGIONAL_CURSOR)
     try:
-        query = select(
-            database.spatial_data.c.adm_0_name.label("country"),
-            database.spatial_data.c.adm_1_name.label("region"),
-            func.sum(database.spatial_data.c.dengue_total).label("total_cases")
-        ).select_from(
-            database.spatial_data
-        ).where(
-            database.spatial_data.c.adm_1_name != None  # Filter out None values
+        country, _ = await resolve_names(db, country)
+        page = await cached_response(
+            db, "spatial/regions", {"country": country, "year": year, "limit": limit, "cursor": cursor},
+            repository.regional_totals, country, year, limit, after
         )
         
-        # Apply optional filters
-        if country:
-            query = query.where(
-                func.lower(database.spatial_data.c.adm_0_name) == func.lower(country)
-            )
-        
-        if year:
-            query = query.where(
-                database.spatial_data.c.year == year
-            )
-        
-        query = query.group_by(
-            database.spatial_data.c.adm_0_name,
-            database.spatial_data.c.adm_1_name
-        ).order_by(
-            desc("total_cases")
-        ).limit(limit)
-        
-        results = [
-            schemas.RegionalTotal(
-                country=row.country, 
-                region=row.region if row.region else "Unknown", 
-                total_cases=row.total_cases
-            )
-            for row in db.execute(query).all()
-        ]
-        
-        return schemas.ApiResponse(status="success", data=results)
+        return serialization.api_response(page["data"], page["next_cursor"], layout, headers=validators)
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/temporal/data", response_model=schemas.ApiResponse)
-def get_temporal_data(
+async def get_temporal_data(
     country: str = Query(..., description="Country to get temporal data for"),
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
     limit: int = Query(100, description="Number of records to return"),
-    db: Session = Depends(database.get_db)
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    resolution: Optional[str] = Query(None, pattern="^(week|month|year)$", description="Aggregate national cases per week, month or year instead of returning records"),
+    max_points: Optional[int] = Query(None, ge=3, description="With resolution, downsample to at most this many points, keeping peaks"),
+    layout: str = Query("rows", pattern="^(rows|columns)$", description="rows (a list of records) or columns (one list per field)"),
+    db: Session = Depends(get_db),
+    validators: dict = Depends(conditional_get)
 ):
-    """Get temporal dengue case data for a specific country"""
+    """Get temporal dengue case data for a specific country.
+
+    With resolution, the national records are prorated onto a calendar grid and returned
+    as one series, without pagination.
+    """
+    if max_points is not None and resolution is None:
+        raise HTTPException(status_code=400, detail="max_points requires resolution")
+    after = decode_cursor(cursor, queries.TEMPORAL_CURSOR)
     try:
-        query = select(
-            database.temporal_data.c.adm_0_name,
-            database.temporal_data.c.calendar_start_date,
-            database.temporal_data.c.calendar_end_date,
-            database.temporal_data.c.year,
-            database.temporal_data.c.dengue_total,
-            database.temporal_data.c.t_res
-        ).select_from(
-            database.temporal_data
-        ).where(
-            func.lower(database.temporal_data.c.adm_0_name) == func.lower(country)
-        )
-        
-        # Apply date filters if provided
-        if start_date:
-            query = query.where(
-                database.temporal_data.c.calendar_start_date >= start_date
+        country, _ = await resolve_names(db, country)
+        if resolution:
+            page = await cached_response(
+                db, "temporal/data",
+                {"country": country, "start_date": start_date, "end_date": end_date, "resolution": resolution, "max_points": max_points},
+                repository.temporal_series, country, resolution, start_date, end_date, max_points
             )
-        
-        if end_date:
-            query = query.where(
-                database.temporal_data.c.calendar_end_date <= end_date
+        else:
+            page = await cached_response(
+                db, "temporal/data",
+                {"country": country, "start_date": start_date, "end_date": end_date, "limit": limit, "cursor": cursor},
+                repository.temporal_records, country, start_date, end_date, limit, after
             )
         
-        query = query.order_by(
-            database.temporal_data.c.calendar_start_date
-        ).limit(limit)
+        return serialization.api_response(page["data"], page["next_cursor"], layout, headers=validators)
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/dashboard/global", response_model=schemas.ApiResponse)
+async def get_global_dashboard(
+    limit: int = Query(10, description="Number of top countries to return"),
+    db: Session = Depends(get_db),
+    validators: dict = Depends(conditional_get)
+):
+    """Get the overall stats, top countries and yearly totals of the dashboard page in one request"""
+    try:
+        results = await cached_response(
+            db, "dashboard/global", {"limit": limit},
+            repository.global_dashboard, limit
+        )
         
-        results = [
+        return serialization.api_response(results, headers=validators)
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/dashboard/country/{country}", response_model=schemas.ApiResponse)
+async def get_country_dashboard(
+    country: str,
+    regions_limit: int = Query(20, description="Number of regions to return"),
+    temporal_limit: int = Query(100, description="Number of temporal records to return"),
+    series_resolution: Optional[str] = Query(None, pattern="^(week|month|year)$", description="Add the national series per week, month or year"),
+    series_max_points: Optional[int] = Query(None, ge=3, description="Downsample the series to at most this many points"),
+    db: Session = Depends(get_db),
+    validators: dict = Depends(conditional_get)
+):
+    """Get the yearly totals, regions and temporal records of a country page in one request.
+
+    regions and temporal hold the first page of /spatial/regions and /temporal/data,
+    with the next_cursor to continue from on those endpoints. series, when requested,
+    holds the data of /temporal/data with resolution and max_points.
+    """
+    try:
+        country, _ = await resolve_names(db, country)
+        results = await cached_response(
+            db, "dashboard/country",
             {
-                "country": row.adm_0_name,
-                "start_date": row.calendar_start_date.isoformat() if row.calendar_start_date else None,
-                "end_date": row.calendar_end_date.isoformat() if row.calendar_end_date else None,
-                "year": row.year,
-                "dengue_cases": row.dengue_total,
-                "time_resolution": row.t_res
-            }
-            for row in db.execute(query).all()
-        ]
+                "country": country, "regions_limit": regions_limit, "temporal_limit": temporal_limit,
+                "series_resolution": series_resolution, "series_max_points": series_max_points
+            },
+            repository.country_dashboard, country, regions_limit, temporal_limit, series_resolution, series_max_points
+        )
         
-        return schemas.ApiResponse(status="success", data=results)
+        return serialization.api_response(results, headers=validators)
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/export/{dataset}")
+async def export_data(
+    dataset: str,
+    country: Optional[str] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    year: Optional[int] = None,
+    export_format: str = Query("csv", alias="format", description="Export format: csv, ndjson or arrow"),
+    batch_size: int = Query(5000, ge=100, le=100000, description="Rows fetched from the database per batch"),
+    db: Session = Depends(get_db),
+    validators: dict = Depends(conditional_get)
+):
+    """Stream all matching temporal or spatial records as CSV, NDJSON or Arrow IPC"""
+    table = export.EXPORT_TABLES.get(dataset)
+    if table is None:
+        raise HTTPException(status_code=404, detail=f"Unknown dataset: {dataset}")
+    if export_format not in export.MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"Unknown export format: {export_format}")
+    if export_format == "arrow" and export.pyarrow is None:
+        raise HTTPException(status_code=501, detail="Arrow export requires the pyarrow package")
+    
+    try:
+        country, _ = await resolve_names(db, country)
+        batches = await repository.export_batches(db, dataset, country, start_date, end_date, year, batch_size)
+        body = export.encode(batches, table, export_format)
+        
+        return StreamingResponse(
+            body,
+            media_type=export.MEDIA_TYPES[export_format],
+            headers={**validators, "Content-Disposition": f'attachment; filename="{dataset}_data.{export_format}"'}
+        )
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/predict", response_model=schemas.ApiResponse)
+async def predict_cases(
+    country: str = Query(..., description="Country name or ISO3 code to forecast"),
+    region: Optional[str] = Query(None, description="First-level region (adm_1_name) to forecast instead of the whole country"),
+    horizon: int = Query(12, ge=1, le=36, description="Number of months to forecast"),
+    model: str = Query("auto", description="seasonal_naive, exponential_smoothing, seasonal_regression or auto"),
+    db: Session = Depends(get_db),
+    validators: dict = Depends(conditional_get)
+):
+    """Forecast monthly dengue cases with prediction intervals"""
+    if model != "auto" and model not in forecasting.MODELS:
+        raise HTTPException(status_code=400, detail=f"Unknown model: {model}")
+    
+    def compute(session):
+        # Forecast from the parameters train_models.py stored; fit in-process only until it has run
+        records = repository.forecast_parameters(session, country, region)
+        if records is None:
+            fitted = forecast_cache.get_or_compute("forecast_models", session, repository.fit_forecasts)
+        elif records:
+            fitted = forecasting.stored_models(records)
+        else:
+            return None
+        key = (repository.resolve_country_key(session, country), region.strip().lower() if region else None)
+        return forecasting.predict(fitted, key, horizon, model)
+    
+    try:
+        country, region = await resolve_names(db, country, region)
+        prediction = await cached_response(
+            db, "predict", {"country": country, "region": region, "horizon": horizon, "model": model},
+            compute
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    if prediction is None:
+        raise HTTPException(status_code=404, detail="No monthly or weekly series found to forecast")
+    
+    return serialization.api_response(prediction, headers=validators)
+
+@app.get("/predict/metrics", response_model=schemas.ApiResponse)
+async def get_forecast_metrics(
+    country: str = Query(..., description="Country name or ISO3 code"),
+    region: Optional[str] = Query(None, description="First-level region (adm_1_name)"),
+    db: Session = Depends(get_db),
+    headers: dict = Depends(cache_control)
+):
+    """Get backtest accuracy of each forecasting model from the last training run"""
+    try:
+        country, region = await resolve_names(db, country, region)
+        results = await cached_response(
+            db, "predict_metrics", {"country": country, "region": region},
+            repository.forecast_metrics, country, region
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    if not results:
+        raise HTTPException(status_code=404, detail="No trained models found; run train_models.py")
+    
+    return serialization.api_response(results, headers=headers)
+
+@app.get("/alerts", response_model=schemas.ApiResponse)
+async def get_outbreak_alerts(
+    country: Optional[str] = Query(None, description="Country name or ISO3 code"),
+    region: Optional[str] = Query(None, description="First-level region (adm_1_name)"),
+    method: Optional[str] = Query(None, pattern="^(endemic_channel|ears_c3)$", description="Only return alerts of one detection method"),
+    since: Optional[date] = Query(None, description="Only return periods starting on or after this date (YYYY-MM-DD)"),
+    limit: int = Query(100, ge=1, le=1000, description="Number of alerts to return"),
+    db: Session = Depends(get_db),
+    headers: dict = Depends(cache_control)
+):
+    """Get the periods flagged as outbreaks by the last detection run, most recent first"""
+    try:
+        country, region = await resolve_names(db, country, region)
+        results = await cached_response(
+            db, "alerts", {"country": country, "region": region, "method": method, "since": since, "limit": limit},
+            repository.outbreak_alerts, country, region, method, since, limit
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return serialization.api_response(results, headers=headers)
+
+def parse_names(value, allowed, parameter):
+    """Comma-separated names of a parameter, without duplicates, rejecting names not allowed with a 400"""
+    names = list(dict.fromkeys(name.strip() for name in value.split(",") if name.strip()))
+    unknown = [name for name in names if name not in allowed]
+    if unknown:
+        raise HTTPException(
+            status_code=400, detail=f"Unknown {parameter}: {', '.join(unknown)}; expected {', '.join(allowed)}"
+        )
+    return names
+
+@app.get("/aggregate", response_model=schemas.ApiResponse)
+async def aggregate_cases(
+    dataset: str = Query("national", pattern="^(national|spatial|temporal)$", description="Rows to aggregate: national, spatial or temporal"),
+    group_by: str = Query("", description="Comma-separated dimensions: country, region, year, s_res, t_res"),
+    metrics: str = Query("sum", description="Comma-separated metrics of dengue_total: sum, count, min, max, mean"),
+    country: Optional[str] = Query(None, description="Country name or ISO3 code"),
+    region: Optional[str] = Query(None, description="First-level region (adm_1_name)"),
+    start_year: Optional[int] = Query(None, description="First year to include"),
+    end_year: Optional[int] = Query(None, description="Last year to include"),
+    s_res: Optional[str] = Query(None, description="Spatial resolution of the rows, such as Admin0 or Admin1"),
+    t_res: Optional[str] = Query(None, description="Temporal resolution of the rows: Week, Month or Year"),
+    limit: int = Query(1000, ge=1, le=10000, description="Number of groups to return"),
+    db: Session = Depends(get_db),
+    validators: dict = Depends(conditional_get)
+):
+    """Aggregate dengue cases by any combination of dimensions.
+
+    Answered from the smallest rollup keeping the grouped and filtered dimensions; queries
+    that need the raw rows are refused when the planner estimates them too expensive.
+    """
+    dimensions = parse_names(group_by, queries.AGGREGATE_DATASETS[dataset][1], "group_by dimension")
+    selected = parse_names(metrics, queries.AGGREGATE_METRICS, "metric")
+    if not selected:
+        raise HTTPException(status_code=400, detail="metrics requires at least one metric")
+    if region and "region" not in queries.AGGREGATE_DATASETS[dataset][1]:
+        raise HTTPException(status_code=400, detail=f"The {dataset} dataset has no regions")
+    try:
+        country, region = await resolve_names(db, country, region)
+        results = await cached_response(
+            db, "aggregate",
+            {
+                "dataset": dataset, "group_by": ",".join(dimensions), "metrics": ",".join(selected),
+                "country": country, "region": region,
+                "start_year": start_year, "end_year": end_year, "s_res": s_res, "t_res": t_res, "limit": limit
+            },
+            repository.aggregate, dataset, dimensions, selected,
+            country, region, start_year, end_year, s_res, t_res, limit
+        )
+    except queries.QueryTooExpensive as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return serialization.api_response(results, headers=validators)
+
+@app.get("/search", response_model=schemas.ApiResponse)
+async def search_names(
+    q: str = Query(..., min_length=1, description="Country name, region name or ISO3 code, or its beginning"),
+    limit: int = Query(10, ge=1, le=100, description="Number of matches to return"),
+    kind: Optional[str] = Query(None, alias="type", pattern="^(country|region)$", description="Only return countries or only regions"),
+    db: Session = Depends(get_db),
+    validators: dict = Depends(conditional_get)
+):
+    """Search country and region names by exact name or ISO3 code, prefix, then similarity"""
+    try:
+        index = await database.run_sync(db, get_name_index)
+        return serialization.api_response(index.search(q, limit, kind), headers=validators)
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
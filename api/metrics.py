@@ -0,0 +1,174 @@
+"""Prometheus metrics of the API, served on /metrics.
+
+MetricsMiddleware records the latency of every request by route template. SQLAlchemy
+cursor events record the duration and row count of every SQL statement, labelled with
+the route of the request that ran it: the middleware puts the request scope in a
+context variable, which follows the request into the threadpool and the async engine.
+Connection pool gauges and cache hit counters are read from the engines and caches
+when the metrics are scraped. Reads that deduplicate a raw table because its *_unique
+view is stale are counted per table.
+"""
+import contextvars
+import time
+
+from prometheus_client import Counter, Histogram
+from prometheus_client.core import REGISTRY, CounterMetricFamily, GaugeMetricFamily
+from sqlalchemy import event
+
+# Route label of requests no route matched, and of statements run outside requests
+UNMATCHED_ROUTE = "unmatched"
+NO_ROUTE = "none"
+
+REQUEST_DURATION = Histogram(
+    "api_request_duration_seconds", "Request latency by route template",
+    ["method", "route", "status"]
+)
+STATEMENT_DURATION = Histogram(
+    "api_db_statement_duration_seconds", "SQL statement execution time by route",
+    ["route"], buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+STATEMENT_ROWS = Histogram(
+    "api_db_statement_rows", "Rows returned or changed by SQL statements by route",
+    ["route"], buckets=(0, 1, 10, 100, 1000, 10000, 100000, 1000000)
+)
+POOL_WAIT = Histogram(
+    "api_db_pool_wait_seconds", "Time to check out a pooled connection, including pre-ping",
+    ["engine"], buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5, 30)
+)
+STALE_FALLBACKS = Counter(
+    "api_deduplicated_fallbacks", "Reads that deduplicated a raw table with DISTINCT ON because its *_unique view was stale",
+    ["table"]
+)
+
+# ASGI scope of the request being handled
+request_scope = contextvars.ContextVar("request_scope", default=None)
+
+def route_label(scope):
+    """Route template of a request scope, once routing has matched it"""
+    if scope is None:
+        return NO_ROUTE
+    route = scope.get("route")
+    return route.path if route is not None else UNMATCHED_ROUTE
+
+class MetricsMiddleware:
+    """ASGI middleware timing each request and exposing its scope to the statement events"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        token = request_scope.set(scope)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            request_scope.reset(token)
+            REQUEST_DURATION.labels(scope["method"], route_label(scope), str(status)).observe(
+                time.perf_counter() - started
+            )
+
+# The start time is kept on the statement's execution context, which is discarded with it
+# whether the statement completes or fails
+def before_statement(conn, cursor, statement, parameters, context, executemany):
+    context.metrics_started = time.perf_counter()
+
+def after_statement(conn, cursor, statement, parameters, context, executemany):
+    route = route_label(request_scope.get())
+    STATEMENT_DURATION.labels(route).observe(time.perf_counter() - context.metrics_started)
+    # Server-side cursors, used by exports, report -1 before their rows are fetched
+    if cursor.rowcount >= 0:
+        STATEMENT_ROWS.labels(route).observe(cursor.rowcount)
+
+def failed_statement(exception_context):
+    """Record how long failed statements, such as those cancelled by the statement timeout, ran"""
+    started = getattr(exception_context.execution_context, "metrics_started", None)
+    if started is not None:
+        STATEMENT_DURATION.labels(route_label(request_scope.get())).observe(time.perf_counter() - started)
+
+# Instrumented engines by label, for the pool gauges
+engines = {}
+
+def instrument_engine(engine, name):
+    """Record the statements run on engine, and how long checking out its connections takes"""
+    if name in engines:
+        return
+    engines[name] = engine
+    event.listen(engine, "before_cursor_execute", before_statement)
+    event.listen(engine, "after_cursor_execute", after_statement)
+    event.listen(engine, "handle_error", failed_statement)
+
+    pool = engine.pool
+    connect = pool.connect
+
+    def timed_connect():
+        started = time.perf_counter()
+        try:
+            return connect()
+        finally:
+            POOL_WAIT.labels(name).observe(time.perf_counter() - started)
+
+    pool.connect = timed_connect
+
+class PoolCollector:
+    """Connection pool gauges of the instrumented engines"""
+
+    def collect(self):
+        gauges = {
+            "size": GaugeMetricFamily("api_db_pool_size", "Connections the pool keeps open", labels=["engine"]),
+            "checkedout": GaugeMetricFamily("api_db_pool_checked_out", "Connections in use", labels=["engine"]),
+            "checkedin": GaugeMetricFamily("api_db_pool_checked_in", "Idle connections in the pool", labels=["engine"]),
+            "overflow": GaugeMetricFamily(
+                "api_db_pool_overflow", "Connections open beyond the pool size (negative while below it)",
+                labels=["engine"]
+            ),
+        }
+        for name, engine in engines.items():
+            for method, gauge in gauges.items():
+                # Only queue pools keep these counts
+                if hasattr(engine.pool, method):
+                    gauge.add_metric([name], getattr(engine.pool, method)())
+        yield from gauges.values()
+
+class CacheCollector:
+    """Hit and miss counters and hit ratios of the caches, from their stats(), and the misses coalesced by the response cache"""
+
+    def __init__(self, caches):
+        self.caches = caches
+
+    def collect(self):
+        hits = CounterMetricFamily("api_cache_hits", "Cache lookups answered from the cache", labels=["cache"])
+        misses = CounterMetricFamily("api_cache_misses", "Cache lookups that computed the value", labels=["cache"])
+        ratio = GaugeMetricFamily("api_cache_hit_ratio", "Share of cache lookups answered from the cache", labels=["cache"])
+        coalesced = CounterMetricFamily(
+            "api_cache_coalesced", "Cache misses that waited for an identical computation in flight instead of running it",
+            labels=["cache"]
+        )
+        in_flight = GaugeMetricFamily("api_cache_in_flight", "Computations in flight that identical misses can wait for", labels=["cache"])
+        for name, cache in self.caches.items():
+            stats = cache.stats()
+            hits.add_metric([name], stats["hits"])
+            misses.add_metric([name], stats["misses"])
+            lookups = stats["hits"] + stats["misses"]
+            ratio.add_metric([name], stats["hits"] / lookups if lookups else 0.0)
+            if "coalesced" in stats:
+                coalesced.add_metric([name], stats["coalesced"])
+                in_flight.add_metric([name], stats["in_flight"])
+        yield from (hits, misses, ratio, coalesced, in_flight)
+
+REGISTRY.register(PoolCollector())
+
+def register_caches(caches):
+    """Report the hits and misses of the named caches"""
+    REGISTRY.register(CacheCollector(caches))
@@ -0,0 +1,194 @@
+"""In-memory index of the country and region names in the data, for search and name resolution.
+
+The index holds the distinct adm_0_name, iso_a0 and adm_1_name values, read in one
+query, and is rebuilt when the data version changes. Names are compared after folding
+case, accents and punctuation. Exact lookups are dictionary lookups. Prefix lookups
+bisect a sorted list of the folded names, of their tails from each word (so "sul"
+finds "Rio Grande do Sul") and of the ISO3 codes, each term carrying the rank of its
+name in the results. Fuzzy lookups count the trigrams each name shares with the query
+from per-trigram posting arrays, and score the names with the highest Dice coefficient
+by their similarity ratio to the query.
+"""
+import bisect
+import difflib
+import re
+import unicodedata
+from collections import namedtuple
+
+import numpy as np
+
+# Lowest similarity, from 0 to 1, of a fuzzy search result
+SEARCH_THRESHOLD = 0.6
+
+# Lowest similarity of the name a misspelled country or region is resolved to
+RESOLVE_THRESHOLD = 0.8
+
+# Names with the most trigrams in common with a query that are scored for similarity
+FUZZY_CANDIDATES = 5
+
+Entry = namedtuple("Entry", ["type", "name", "country", "iso_a0", "country_key"])
+
+def fold(text):
+    """Lowercase words of text without accents, joined by single spaces"""
+    decomposed = unicodedata.normalize("NFKD", text)
+    letters = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(re.findall(r"[^\W_]+", letters.lower()))
+
+def trigrams(folded):
+    """Set of the three-character substrings of a folded name, padded at both ends"""
+    padded = f"  {folded} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class NameIndex:
+    """Countries and regions of the data, looked up by exact name, ISO3 code, prefix or similarity"""
+
+    def __init__(self, rows):
+        """Index rows of (country_key, adm_0_name, iso_a0, adm_1_name), adm_1_name being None for country rows"""
+        self.entries = []
+        self.countries = {}  # Folded country name or ISO3 code -> position
+        self.regions = {}  # (country_key, folded region name) -> position
+        # Country rows first, so countries take the ISO3 code of their national rows
+        for country_key, country, iso, region in sorted(rows, key=lambda row: row[3] is not None):
+            if country_key is None or country is None:
+                continue
+            if fold(country) not in self.countries:
+                self.countries[fold(country)] = len(self.entries)
+                self.entries.append(Entry("country", country, country, iso, country_key))
+            if region is not None and (country_key, fold(region)) not in self.regions:
+                iso = self.entries[self.countries[fold(country)]].iso_a0
+                self.regions[(country_key, fold(region))] = len(self.entries)
+                self.entries.append(Entry("region", region, country, iso, country_key))
+        self.folded_names = [fold(entry.name) for entry in self.entries]
+
+        # Exact matches by folded name or ISO3 code, and the positions of each kind of name
+        self.exact = {}
+        for position, (entry, folded) in enumerate(zip(self.entries, self.folded_names)):
+            self.exact.setdefault(folded, []).append(position)
+            if entry.type == "country" and entry.iso_a0:
+                self.countries.setdefault(entry.iso_a0.lower(), position)
+                self.exact.setdefault(entry.iso_a0.lower(), []).append(position)
+        types = np.array([entry.type for entry in self.entries], dtype=object)
+        self.positions = {kind: np.flatnonzero(types == kind) for kind in ("country", "region")}
+        country_regions = {}
+        for position in self.positions["region"].tolist():
+            country_regions.setdefault(self.entries[position].country_key, []).append(position)
+        self.country_regions = {key: np.array(positions) for key, positions in country_regions.items()}
+
+        # Result order of the names: countries first, then shorter names, then alphabetically
+        self.by_rank = np.array(sorted(
+            range(len(self.entries)),
+            key=lambda position: (
+                self.entries[position].type != "country", len(self.folded_names[position]), self.folded_names[position]
+            )
+        ), dtype=np.int64)
+        ranks = np.empty(len(self.entries), dtype=np.int64)
+        ranks[self.by_rank] = np.arange(len(self.entries))
+
+        # Sorted prefix terms, with the rank of the name each one stands for
+        terms = []
+        for position, (entry, folded) in enumerate(zip(self.entries, self.folded_names)):
+            starts = [0] + [match.end() for match in re.finditer(" ", folded)]
+            terms.extend((folded[start:], ranks[position]) for start in starts)
+            if entry.type == "country" and entry.iso_a0:
+                terms.append((entry.iso_a0.lower(), ranks[position]))
+        terms.sort()
+        self.terms = [term for term, _ in terms]
+        self.term_ranks = np.array([rank for _, rank in terms], dtype=np.int64)
+
+        # Positions of the names containing each trigram, and the trigram count of each name
+        postings = {}
+        self.trigram_counts = np.zeros(len(self.entries))
+        for position, folded in enumerate(self.folded_names):
+            grams = trigrams(folded)
+            self.trigram_counts[position] = len(grams)
+            for gram in grams:
+                postings.setdefault(gram, []).append(position)
+        self.trigrams = {gram: np.array(positions, dtype=np.int64) for gram, positions in postings.items()}
+
+    def prefix_matches(self, folded, limit, kind=None):
+        """Positions of the first names, in result order, with a word or ISO3 code starting with a folded query"""
+        start = bisect.bisect_left(self.terms, folded)
+        end = bisect.bisect_right(self.terms, folded + "\uffff", start)
+        ranks = np.unique(self.term_ranks[start:end])
+        if kind:
+            ranks = ranks[(ranks < len(self.positions["country"])) == (kind == "country")]
+        return self.by_rank[ranks[:limit]].tolist()
+
+    def fuzzy_matches(self, folded, threshold, positions=None):
+        """Positions and similarities of the names similar to a folded query, most similar first.
+
+        positions restricts the names considered, by default all of them.
+        """
+        grams = trigrams(folded)
+        postings = [self.trigrams[gram] for gram in grams if gram in self.trigrams]
+        if not postings:
+            return []
+        shared = np.bincount(np.concatenate(postings), minlength=len(self.entries))
+        positions = np.flatnonzero(shared) if positions is None else positions[shared[positions] > 0]
+        dice = 2 * shared[positions] / (len(grams) + self.trigram_counts[positions])
+        if len(positions) > FUZZY_CANDIDATES:
+            positions = positions[np.argpartition(-dice, FUZZY_CANDIDATES)[:FUZZY_CANDIDATES]]
+
+        matcher = difflib.SequenceMatcher(None, b=folded)
+        scored = []
+        for position in positions.tolist():
+            matcher.set_seq1(self.folded_names[position])
+            score = matcher.ratio()
+            if score >= threshold:
+                scored.append((position, score))
+        scored.sort(key=lambda item: -item[1])
+        return scored
+
+    def search(self, query, limit=10, kind=None):
+        """Countries and regions matching a query exactly, then by prefix, then by similarity.
+
+        Within exact and prefix matches, countries rank before regions and shorter names
+        before longer ones. kind, "country" or "region", restricts the results.
+        """
+        folded = fold(query)
+        if not folded:
+            return []
+
+        matches = {}
+        for position in self.exact.get(folded, []):
+            if kind is None or self.entries[position].type == kind:
+                matches[position] = ("exact", 1.0)
+        for position in self.prefix_matches(folded, limit + len(matches), kind):
+            matches.setdefault(position, ("prefix", len(folded) / len(self.folded_names[position])))
+        if len(matches) < limit:
+            for position, score in self.fuzzy_matches(folded, SEARCH_THRESHOLD, self.positions.get(kind)):
+                matches.setdefault(position, ("fuzzy", score))
+
+        return [
+            {
+                "type": self.entries[position].type,
+                "name": self.entries[position].name,
+                "country": self.entries[position].country,
+                "iso_a0": self.entries[position].iso_a0,
+                "match": match,
+                "score": round(score, 3)
+            }
+            for position, (match, score) in list(matches.items())[:limit]
+        ]
+
+    def resolve_country(self, country):
+        """Canonical adm_0_name of a country name, ISO3 code or close misspelling, or None"""
+        folded = fold(country)
+        position = self.countries.get(folded)
+        if position is None:
+            similar = self.fuzzy_matches(folded, RESOLVE_THRESHOLD, self.positions["country"])
+            position = similar[0][0] if similar else None
+        return self.entries[position].name if position is not None else None
+
+    def resolve_region(self, country, region):
+        """Canonical adm_1_name of a region of a country, or of a close misspelling, or None"""
+        country_name = self.resolve_country(country)
+        if country_name is None:
+            return None
+        country_key = self.entries[self.countries[fold(country_name)]].country_key
+        folded = fold(region)
+        position = self.regions.get((country_key, folded))
+        if position is None and country_key in self.country_regions:
+            similar = self.fuzzy_matches(folded, RESOLVE_THRESHOLD, self.country_regions[country_key])
+            position = similar[0][0] if similar else None
+        return self.entries[position].name if position is not None else None
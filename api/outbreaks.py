@@ -0,0 +1,196 @@
+"""Outbreak detection over weekly and monthly dengue case series.
+
+Two methods flag periods whose case counts exceed what the series' own history predicts:
+
+- endemic channel: the cases of the same epidemiological week (or month) and its two
+  neighbours in each of the previous BASELINE_YEARS years give an expected count and
+  a standard deviation; a period is flagged above mean + ENDEMIC_K * sigma.
+- EARS C3: a CUSUM of the standardized exceedances of the last three periods over a
+  baseline of the 7 periods ending two periods earlier, as in the CDC's Early
+  Aberration Reporting System; a period is flagged when the sum passes CUSUM_THRESHOLD.
+  Its short baseline follows every seasonal upswing, so it is only used for periods
+  without enough history for an endemic channel, such as new series.
+
+Series are laid out as rows of a 2D array over consecutive periods, in chunks of
+CHUNK_SERIES rows, and both methods run on whole arrays at once. Sigma is never below
+the Poisson noise of the expected count, so quiet series are not flagged for a few cases.
+"""
+import warnings
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Periods per year of each series resolution
+SEASONS = {"Week": 52, "Month": 12}
+
+METHODS = ("endemic_channel", "ears_c3")
+
+BASELINE_YEARS = 5
+ENDEMIC_K = 2.0
+# Fewest baseline values (of 3 per year) for an endemic channel
+MIN_ENDEMIC_BASELINE = 6
+
+EARS_WINDOW = 7
+EARS_GUARD = 2
+# Fewest baseline values (of EARS_WINDOW) for an EARS statistic
+MIN_EARS_BASELINE = 5
+CUSUM_THRESHOLD = 2.0
+
+# Periods with fewer cases are never flagged
+MIN_CASES = 5
+
+CHUNK_SERIES = 64
+
+# date.toordinal() of 1970-01-01
+EPOCH_ORDINAL = 719163
+
+def period_index(starts, t_res):
+    """Consecutive period numbers of start dates: Sunday-start weeks or months since 1970"""
+    if t_res == "Week":
+        # Day 3 of the epoch, 1970-01-04, is a Sunday
+        return (starts.astype("datetime64[D]").astype(np.int64) - 3) // 7
+    return starts.astype("datetime64[M]").astype(np.int64)
+
+def period_dates(index, t_res):
+    """Start and end dates of numbered periods, as datetime64[D] arrays"""
+    if t_res == "Week":
+        starts = (index * 7 + 3).astype("datetime64[D]")
+        return starts, starts + 6
+    months = index.astype("datetime64[M]")
+    return months.astype("datetime64[D]"), (months + 1).astype("datetime64[D]") - 1
+
+def baseline_stats(baseline, min_values):
+    """Mean and noise-floored standard deviation over the last axis, NaN where too few values"""
+    counts = (~np.isnan(baseline)).sum(axis=-1)
+    with np.errstate(invalid="ignore", divide="ignore"), warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        mean = np.nanmean(baseline, axis=-1)
+        sd = np.nanstd(baseline, axis=-1, ddof=1)
+    sigma = np.maximum(np.nan_to_num(sd), np.sqrt(np.maximum(mean, 1.0)))
+    enough = counts >= min_values
+    return np.where(enough, mean, np.nan), np.where(enough, sigma, np.nan)
+
+def endemic_channel(values, season, years=BASELINE_YEARS, k=ENDEMIC_K):
+    """Expected counts, thresholds and z-scores of each period from the same periods of previous years"""
+    n, t = values.shape
+    lead = years * season + 1
+    padded = np.concatenate([np.full((n, lead), np.nan), values, np.full((n, 1), np.nan)], axis=1)
+    baseline = np.stack([
+        padded[:, lead - year * season + offset:lead - year * season + offset + t]
+        for year in range(1, years + 1) for offset in (-1, 0, 1)
+    ], axis=2)
+    mean, sigma = baseline_stats(baseline, MIN_ENDEMIC_BASELINE)
+    with np.errstate(invalid="ignore"):
+        return mean, mean + k * sigma, (values - mean) / sigma
+
+def ears_c3(values, threshold=CUSUM_THRESHOLD):
+    """Expected counts, thresholds and C3 statistics of each period from the periods just before it.
+
+    The threshold is the count at which the period would be flagged, given the
+    exceedances of the two periods before it.
+    """
+    n, t = values.shape
+    lead = EARS_WINDOW + EARS_GUARD
+    padded = np.concatenate([np.full((n, lead), np.nan), values], axis=1)
+    # Window j holds the periods j - 9 to j - 3
+    baseline = sliding_window_view(padded, EARS_WINDOW, axis=1)[:, :t]
+    mean, sigma = baseline_stats(baseline, MIN_EARS_BASELINE)
+    with np.errstate(invalid="ignore"):
+        exceedance = np.nan_to_num(np.maximum((values - mean) / sigma - 1, 0))
+    previous = np.zeros_like(exceedance)
+    previous[:, 1:] += exceedance[:, :-1]
+    previous[:, 2:] += exceedance[:, :-2]
+    return mean, mean + np.maximum(1 + threshold - previous, 1) * sigma, exceedance + previous
+
+def flag(values, expected, threshold, score, method, seasonal_expected):
+    """Mask of the flagged periods of a method's results.
+
+    EARS C3 only flags periods the endemic channel has no seasonal_expected count for.
+    """
+    with np.errstate(invalid="ignore"):
+        flagged = ~np.isnan(expected) & (values >= MIN_CASES) & (values > threshold)
+        if method == "ears_c3":
+            flagged &= (score > CUSUM_THRESHOLD) & np.isnan(seasonal_expected)
+    return flagged
+
+def series_grid(periods, rows, totals, count):
+    """Sum totals into a (count, periods) array starting at the first period, NaN where unobserved"""
+    first = int(periods.min())
+    cells = (rows, periods - first)
+    values = np.zeros((count, int(periods.max()) - first + 1))
+    np.add.at(values, cells, totals)
+    seen = np.zeros(values.shape, dtype=bool)
+    seen[cells] = True
+    return np.where(seen, values, np.nan), first
+
+def detect(rows, source, baseline_years=BASELINE_YEARS, k=ENDEMIC_K, chunk_size=CHUNK_SERIES):
+    """Alert records for every flagged period of every series, by both methods.
+
+    rows are (country_key, region_key, country, region, t_res, start, total) tuples, one
+    per series and period start; series are keyed by (country_key, region_key, t_res).
+    """
+    index = {}
+    names = {}
+    series, starts, totals = [], [], []
+    # Rows are unpacked rather than read by attribute, which is much slower on result rows
+    for country_key, region_key, country, region, t_res, start, total in rows:
+        if t_res not in SEASONS:
+            continue
+        key = (country_key, region_key, t_res)
+        series.append(index.setdefault(key, len(index)))
+        names[key] = (country, region)
+        starts.append(start)
+        totals.append(float(total))
+    if not index:
+        return []
+
+    # Number series by resolution, country and region, and sort the rows by series
+    keys = sorted(index, key=lambda key: (key[2], key[0] or "", key[1] or ""))
+    renumber = np.empty(len(keys), dtype=np.int64)
+    renumber[[index[key] for key in keys]] = np.arange(len(keys))
+    series = renumber[np.array(series)]
+    order = np.argsort(series, kind="stable")
+    series = series[order]
+    # Converting ordinals is much faster than converting date objects
+    starts = (np.array([start.toordinal() for start in starts]) - EPOCH_ORDINAL).astype("datetime64[D]")[order]
+    totals = np.array(totals)[order]
+    bounds = np.searchsorted(series, np.arange(len(keys) + 1))
+
+    records = []
+    for t_res, season in SEASONS.items():
+        members = [position for position, key in enumerate(keys) if key[2] == t_res]
+        for chunk in range(0, len(members), chunk_size):
+            lo, hi = members[chunk], members[min(chunk + chunk_size, len(members)) - 1] + 1
+            selected = slice(bounds[lo], bounds[hi])
+            values, first = series_grid(
+                period_index(starts[selected], t_res), series[selected] - lo, totals[selected], hi - lo
+            )
+            results = {
+                "endemic_channel": endemic_channel(values, season, baseline_years, k),
+                "ears_c3": ears_c3(values),
+            }
+            for method, (expected, threshold, score) in results.items():
+                flagged = flag(values, expected, threshold, score, method, results["endemic_channel"][0])
+                flagged_rows, flagged_columns = np.nonzero(flagged)
+                period_starts, period_ends = period_dates(first + flagged_columns, t_res)
+                for row, column, start, end in zip(
+                    flagged_rows.tolist(), flagged_columns.tolist(), period_starts.tolist(), period_ends.tolist()
+                ):
+                    key = keys[lo + row]
+                    country, region = names[key]
+                    records.append({
+                        "source": source,
+                        "country_key": key[0],
+                        "region_key": key[1],
+                        "adm_0_name": country,
+                        "adm_1_name": region,
+                        "t_res": t_res,
+                        "period_start": start,
+                        "period_end": end,
+                        "cases": float(values[row, column]),
+                        "expected": float(expected[row, column]),
+                        "threshold": float(threshold[row, column]),
+                        "score": float(score[row, column]),
+                        "method": method,
+                    })
+    return records
@@ -0,0 +1,30 @@
+import base64
+import json
+from datetime import date
+
+def encode_cursor(values):
+    """Encode the sort-key values of the last row of a page as an opaque token"""
+    payload = json.dumps(
+        [value.isoformat() if isinstance(value, date) else value for value in values],
+        separators=(",", ":")
+    )
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(token, types):
+    """Decode a token from encode_cursor, converting each value with the matching type.
+
+    Raises ValueError when the token is malformed.
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError("Invalid cursor")
+        return [
+            None if value is None
+            else date.fromisoformat(value) if value_type is date
+            else value_type(value)
+            for value, value_type in zip(values, types)
+        ]
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
@@ -0,0 +1,793 @@
+from collections import namedtuple
+from functools import lru_cache
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.expression import ClauseElement, Executable
+from sqlalchemy import BigInteger, Date, DateTime, Float, func, select, desc, and_, or_, tuple_, literal_column, null, union_all
+from typing import Optional
+from datetime import date
+import json
+import os
+
+import numpy as np
+
+import database
+import pagination
+import resampling
+import rollups
+import schemas
+
+# Each query returns JSON-ready data so results can be cached and shared between replicas
+
+# Cursor value types for the paginated queries
+TEMPORAL_CURSOR = (date, int)  # calendar_start_date, id
+REGIONAL_CURSOR = (float, str, str)  # total_cases, country, region
+
+# Datasets of /aggregate and the dimensions their rows can be grouped and filtered by
+AGGREGATE_DATASETS = {
+    "national": (database.national_data, ("country", "year", "s_res", "t_res")),
+    "spatial": (database.spatial_data, ("country", "region", "year", "s_res", "t_res")),
+    "temporal": (database.temporal_data, ("country", "region", "year", "s_res", "t_res")),
+}
+
+# Source column of each /aggregate dimension
+AGGREGATE_DIMENSIONS = {
+    "country": "adm_0_name",
+    "region": "adm_1_name",
+    "year": "year",
+    "s_res": "s_res",
+    "t_res": "t_res",
+}
+
+# /aggregate metrics over dengue_total; count is the number of records
+AGGREGATE_METRICS = ("sum", "count", "min", "max", "mean")
+
+# Most rows the planner may estimate any step of an /aggregate query over raw rows to read
+AGGREGATE_MAX_ROWS = int(os.getenv("AGGREGATE_MAX_ROWS", "2000000"))
+
+class QueryTooExpensive(ValueError):
+    """An /aggregate query whose estimated rows exceed AGGREGATE_MAX_ROWS"""
+
+class Explain(Executable, ClauseElement):
+    """EXPLAIN (FORMAT JSON) of a statement, executed with the statement's parameters"""
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+@compiles(Explain, "postgresql")
+def compile_explain(element, compiler, **kw):
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.statement, **kw)
+
+def page(rows, limit, cursor_values):
+    """Split a limit + 1 result into the page rows and the cursor for the next page"""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, pagination.encode_cursor(cursor_values(rows[-1]))
+
+def dataset_version(db: Session, table):
+    """Version of a source table: its highest id and the last import generation that changed it.
+
+    The id catches rows appended outside import_data.py; the generation also catches
+    incremental imports that only delete or replace rows.
+    """
+    row = db.execute(select(
+        select(func.max(table.c.id)).scalar_subquery(),
+        database.data_generation(table)
+    )).one()
+    return (row[0], row[1])
+
+def national_data_version(db: Session):
+    """Dataset version for national statistics"""
+    return dataset_version(db, database.national_data)
+
+def temporal_data_version(db: Session):
+    """Dataset version for temporal series"""
+    return dataset_version(db, database.temporal_data)
+
+def data_version(db: Session):
+    """Version of all served data, looked up in one query.
+
+    Holds the highest id and last import generation of each source table, as in
+    dataset_version, followed by the Unix time of the last import (None before any import).
+    """
+    last_import = select(
+        func.extract("epoch", func.max(database.import_log.c.imported_at).cast(DateTime(timezone=True)))
+    ).scalar_subquery()
+    row = db.execute(select(
+        *[
+            value
+            for table in (database.national_data, database.spatial_data, database.temporal_data)
+            for value in (select(func.max(table.c.id)).scalar_subquery(), database.data_generation(table))
+        ],
+        last_import
+    )).one()
+    return tuple(row[:-1]) + (float(row[-1]) if row[-1] is not None else None,)
+
+def ping(db: Session):
+    """Run a trivial query, checking that the database answers"""
+    return db.execute(select(literal_column("1"))).scalar()
+
+def resolve_country_key(db: Session, country: str) -> str:
+    """Resolve a country name or ISO3 code to its normalized country_key.
+
+    Resolutions are remembered on the session, so each request looks a country up at most once.
+    """
+    resolved = db.info.setdefault("country_keys", {})
+    if country in resolved:
+        return resolved[country]
+
+    key = database.normalize_country(country)
+    if len(key) == 3 and key.isalpha():
+        iso_key = db.execute(
+            select(database.national_data.c.country_key).where(
+                database.national_data.c.iso_a0 == key.upper()
+            ).limit(1)
+        ).scalar()
+        if iso_key is not None:
+            key = iso_key
+
+    resolved[country] = key
+    return key
+
+def name_rows(db: Session):
+    """Distinct (country_key, adm_0_name, iso_a0, adm_1_name) rows for the name index, read in one statement.
+
+    Countries and their ISO3 codes come from the national rows, regions from the
+    spatial rollup when it is fresh; adm_1_name is NULL on country rows.
+    """
+    fresh = rollups.fresh_names(db, database.national_data, database.spatial_data)
+    national = rollups.rows_for(db, database.national_data, fresh)
+    spatial = rollups.source_for(db, database.spatial_data, fresh)
+    countries = select(
+        national.c.country_key,
+        func.min(national.c.adm_0_name),
+        func.min(national.c.iso_a0),
+        null().label("adm_1_name")
+    ).group_by(national.c.country_key)
+    regions = select(
+        spatial.c.country_key,
+        func.min(spatial.c.adm_0_name),
+        null(),
+        spatial.c.adm_1_name
+    ).where(spatial.c.adm_1_name.is_not(None)).group_by(spatial.c.country_key, spatial.c.adm_1_name)
+    return db.execute(union_all(countries, regions)).all()
+
+@lru_cache(maxsize=None)
+def row_type(names):
+    """Named tuple type for rows with the given column names"""
+    return namedtuple("Row", names)
+
+def json_section(query, order_by):
+    """Aggregate the rows of query into one JSON array, so several result sets can share a statement.
+
+    order_by(columns) gives the order of the rows in the array. Returns the scalar subquery and
+    a function that turns its value back into rows with the column names and types of query.
+    """
+    rows = query.subquery()
+    columns = list(rows.c)
+    value = select(func.coalesce(
+        func.json_agg(aggregate_order_by(func.json_build_array(*columns), *order_by(rows.c))),
+        literal_column("'[]'::json")
+    )).scalar_subquery()
+
+    Row = row_type(tuple(column.name for column in columns))
+    parsers = [
+        date.fromisoformat if isinstance(column.type, Date) else float if isinstance(column.type, Float) else None
+        for column in columns
+    ]
+
+    def decode(values):
+        return [
+            Row(*(parse(value) if parse and value is not None else value for parse, value in zip(parsers, item)))
+            for item in values
+        ]
+    return value, decode
+
+def national_stats_query(source):
+    """Record count, case total, country count and year span of the national rows in source"""
+    return select(
+        func.count().label("total_records"),
+        func.sum(source.c.dengue_total).label("total_cases"),
+        func.count(source.c.adm_0_name.distinct()).label("countries_count"),
+        func.min(source.c.year).label("min_year"),
+        func.max(source.c.year).label("max_year")
+    ).select_from(
+        source
+    )
+
+def national_stats(db: Session):
+    """Overall statistics, computed in a single aggregate query"""
+    source = rollups.rows_for(db, database.national_data)
+    return stats_result(db.execute(national_stats_query(source)).one())
+
+def stats_result(row):
+    """Format a national_stats_query row as overall statistics"""
+    year_range = list(range(row.min_year, row.max_year + 1)) if row.min_year and row.max_year else []
+
+    stats = schemas.DengueStats(
+        total_records=row.total_records,
+        total_cases=row.total_cases or 0,
+        countries_count=row.countries_count,
+        year_range=year_range
+    )
+    return jsonable_encoder(stats)
+
+def top_countries_query(source, limit: int):
+    """Countries of source with the highest total dengue cases"""
+    return select(
+        source.c.adm_0_name.label("country"),
+        func.sum(source.c.dengue_total).label("total_cases")
+    ).select_from(
+        source
+    ).group_by(
+        source.c.adm_0_name
+    ).order_by(
+        desc("total_cases")
+    ).limit(limit)
+
+def top_countries(db: Session, limit: int):
+    """Top countries by total dengue cases"""
+    source = rollups.source_for(db, database.national_data)
+    return country_totals(db.execute(top_countries_query(source, limit)).all())
+
+def country_totals(rows):
+    """Format rows with country and total_cases as country totals"""
+    results = [
+        schemas.CountryTotal(country=row.country, total_cases=row.total_cases)
+        for row in rows
+    ]
+    return jsonable_encoder(results)
+
+def yearly_totals_query(source, country_key: Optional[str] = None):
+    """Yearly dengue case totals of source, optionally for one country_key"""
+    query = select(
+        source.c.year.label("year"),
+        func.sum(source.c.dengue_total).label("total_cases")
+    ).select_from(
+        source
+    )
+
+    if country_key:
+        query = query.where(
+            source.c.country_key == country_key
+        )
+
+    return query.group_by(
+        source.c.year
+    ).order_by(
+        source.c.year
+    )
+
+def yearly_totals(db: Session, country: Optional[str] = None):
+    """Yearly dengue case totals, optionally filtered by country"""
+    source = rollups.source_for(db, database.national_data)
+    country_key = resolve_country_key(db, country) if country else None
+    return yearly_results(db.execute(yearly_totals_query(source, country_key)).all())
+
+def yearly_results(rows):
+    """Format rows with year and total_cases as yearly totals"""
+    results = [
+        schemas.YearlyTotal(year=row.year, total_cases=row.total_cases)
+        for row in rows
+    ]
+    return jsonable_encoder(results)
+
+def regional_totals_query(
+    source,
+    country_key: Optional[str] = None,
+    year: Optional[int] = None,
+    limit: int = 20,
+    after: Optional[list] = None
+):
+    """limit + 1 regional totals of source, ranked by total cases, with country and region names breaking ties"""
+    total_cases = func.sum(source.c.dengue_total)
+    query = select(
+        source.c.adm_0_name.label("country"),
+        source.c.adm_1_name.label("region"),
+        total_cases.label("total_cases")
+    ).select_from(
+        source
+    ).where(
+        source.c.adm_1_name != None  # Filter out None values
+    )
+
+    # Apply optional filters
+    if country_key:
+        query = query.where(
+            source.c.country_key == country_key
+        )
+
+    if year:
+        query = query.where(
+            source.c.year == year
+        )
+
+    query = query.group_by(
+        source.c.adm_0_name,
+        source.c.adm_1_name
+    )
+
+    # Regions without any case count sort last, so every page, including theirs, can be paged past
+    if after:
+        after_total, after_country, after_region = after
+        names_after = tuple_(source.c.adm_0_name, source.c.adm_1_name) > tuple_(after_country, after_region)
+        if after_total is None:
+            query = query.having(and_(total_cases.is_(None), names_after))
+        else:
+            query = query.having(or_(
+                total_cases < after_total,
+                and_(total_cases == after_total, names_after),
+                total_cases.is_(None)
+            ))
+
+    return query.order_by(
+        desc("total_cases").nulls_last(),
+        source.c.adm_0_name,
+        source.c.adm_1_name
+    ).limit(limit + 1)
+
+def regional_totals(
+    db: Session,
+    country: Optional[str] = None,
+    year: Optional[int] = None,
+    limit: int = 20,
+    after: Optional[list] = None
+):
+    """One page of regional dengue case totals, optionally filtered by country and year.
+
+    Regions are ranked by total cases, with country and region names breaking ties;
+    after holds the decoded REGIONAL_CURSOR of the last region on the previous page.
+    """
+    source = rollups.source_for(db, database.spatial_data)
+    country_key = resolve_country_key(db, country) if country else None
+    query = regional_totals_query(source, country_key, year, limit, after)
+    return regional_page(db.execute(query).all(), limit)
+
+def regional_page(rows, limit):
+    """Format limit + 1 rows with country, region and total_cases as a page of regional totals"""
+    rows, next_cursor = page(
+        rows, limit,
+        lambda row: (row.total_cases, row.country, row.region)
+    )
+
+    # Built directly rather than through schemas.RegionalTotal, since pages can hold many rows
+    results = [
+        {
+            "country": row.country,
+            "region": row.region if row.region else "Unknown",
+            "total_cases": float(row.total_cases) if row.total_cases is not None else None
+        }
+        for row in rows
+    ]
+    return {"data": results, "next_cursor": next_cursor}
+
+def temporal_records_query(
+    source,
+    country_key: str,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    limit: int = 100,
+    after: Optional[list] = None
+):
+    """limit + 1 temporal records of one country_key in source, ordered by (calendar_start_date, id)"""
+    query = select(
+        source.c.id,
+        source.c.adm_0_name,
+        source.c.calendar_start_date,
+        source.c.calendar_end_date,
+        source.c.year,
+        source.c.dengue_total,
+        source.c.t_res
+    ).select_from(
+        source
+    ).where(
+        source.c.country_key == country_key
+    )
+
+    # Apply date filters if provided. A row's year lies between the years of its start
+    # and end dates, so the matching year bounds let PostgreSQL skip whole partitions.
+    if start_date:
+        query = query.where(
+            source.c.calendar_start_date >= start_date,
+            source.c.year >= start_date.year
+        )
+
+    if end_date:
+        query = query.where(
+            source.c.calendar_end_date <= end_date,
+            source.c.year <= end_date.year
+        )
+
+    if after:
+        query = query.where(
+            tuple_(source.c.calendar_start_date, source.c.id) > tuple_(*after)
+        )
+
+    return query.order_by(
+        source.c.calendar_start_date,
+        source.c.id
+    ).limit(limit + 1)
+
+def temporal_records(
+    db: Session,
+    country: str,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    limit: int = 100,
+    after: Optional[list] = None
+):
+    """One page of temporal dengue case records for a specific country.
+
+    Records are ordered by (calendar_start_date, id); after holds the decoded
+    TEMPORAL_CURSOR of the last record on the previous page, so each page is an index seek.
+    """
+    source = rollups.rows_for(db, database.temporal_data)
+    query = temporal_records_query(source, resolve_country_key(db, country), start_date, end_date, limit, after)
+    return temporal_page(db.execute(query).all(), limit)
+
+def temporal_series_query(
+    source,
+    country_key: str,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None
+):
+    """National temporal rows of one country_key in source overlapping the date range, for resampling"""
+    query = select(
+        source.c.adm_0_name,
+        source.c.calendar_start_date,
+        source.c.calendar_end_date,
+        source.c.dengue_total,
+        source.c.t_res
+    ).select_from(
+        source
+    ).where(
+        source.c.country_key == country_key,
+        source.c.s_res == "Admin0",
+        source.c.dengue_total != None
+    )
+
+    # Rows crossing the range bounds are prorated, so rows are matched by overlap; year
+    # bounds one year wider still let PostgreSQL skip whole partitions
+    if start_date:
+        query = query.where(
+            source.c.calendar_end_date >= start_date,
+            source.c.year >= start_date.year - 1
+        )
+
+    if end_date:
+        query = query.where(
+            source.c.calendar_start_date <= end_date,
+            source.c.year <= end_date.year + 1
+        )
+
+    return query
+
+def series_page(rows, resolution, start_date=None, end_date=None, max_points=None):
+    """Resample national temporal rows onto a calendar grid, as a page without a next cursor"""
+    records = resampling.series_records(
+        rows[0].adm_0_name if rows else None,
+        np.array([row.calendar_start_date for row in rows], dtype="datetime64[D]"),
+        np.array([row.calendar_end_date for row in rows], dtype="datetime64[D]"),
+        np.array([row.dengue_total for row in rows], dtype=float),
+        np.array([row.t_res for row in rows], dtype=object),
+        resolution, start_date, end_date, max_points
+    )
+    return {"data": records, "next_cursor": None}
+
+def temporal_series(
+    db: Session,
+    country: str,
+    resolution: str,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    max_points: Optional[int] = None
+):
+    """National dengue cases of a country per week, month or year, optionally downsampled to max_points"""
+    source = rollups.rows_for(db, database.temporal_data)
+    query = temporal_series_query(source, resolve_country_key(db, country), start_date, end_date)
+    return series_page(db.execute(query).all(), resolution, start_date, end_date, max_points)
+
+def temporal_page(rows, limit):
+    """Format limit + 1 temporal_data rows as a page of temporal records.
+
+    Dates are left as date objects; the orjson encoder writes them in ISO format.
+    """
+    rows, next_cursor = page(
+        rows, limit,
+        lambda row: (row.calendar_start_date, row.id)
+    )
+
+    results = [
+        {
+            "country": row.adm_0_name,
+            "start_date": row.calendar_start_date,
+            "end_date": row.calendar_end_date,
+            "year": row.year,
+            "dengue_cases": row.dengue_total,
+            "time_resolution": row.t_res
+        }
+        for row in rows
+    ]
+    return {"data": results, "next_cursor": next_cursor}
+
+def global_dashboard(db: Session, limit: int = 10):
+    """Overall statistics, top countries and yearly totals, computed in one statement"""
+    fresh = rollups.fresh_names(db, database.national_data)
+    rows = rollups.rows_for(db, database.national_data, fresh)
+    source = rollups.source_for(db, database.national_data, fresh)
+    stats = national_stats_query(rows).subquery()
+    countries, decode_countries = json_section(
+        top_countries_query(source, limit),
+        lambda c: (c.total_cases.desc(),)
+    )
+    yearly, decode_yearly = json_section(
+        yearly_totals_query(source),
+        lambda c: (c.year,)
+    )
+
+    row = db.execute(select(stats, countries.label("countries"), yearly.label("yearly"))).one()
+    return {
+        "stats": stats_result(row),
+        "countries": country_totals(decode_countries(row.countries)),
+        "yearly": yearly_results(decode_yearly(row.yearly))
+    }
+
+def country_dashboard(
+    db: Session,
+    country: str,
+    regions_limit: int = 20,
+    temporal_limit: int = 100,
+    series_resolution: Optional[str] = None,
+    series_max_points: Optional[int] = None
+):
+    """Yearly totals and the first pages of regional totals and temporal records of one country, computed in one statement.
+
+    With series_resolution, the resampled series of temporal_series is added in the same statement.
+    """
+    country_key = resolve_country_key(db, country)
+    fresh = rollups.fresh_names(db, database.national_data, database.spatial_data, database.temporal_data)
+    yearly, decode_yearly = json_section(
+        yearly_totals_query(rollups.source_for(db, database.national_data, fresh), country_key),
+        lambda c: (c.year,)
+    )
+    regions, decode_regions = json_section(
+        regional_totals_query(rollups.source_for(db, database.spatial_data, fresh), country_key, limit=regions_limit),
+        lambda c: (c.total_cases.desc().nulls_last(), c.country, c.region)
+    )
+    temporal_source = rollups.rows_for(db, database.temporal_data, fresh)
+    temporal, decode_temporal = json_section(
+        temporal_records_query(temporal_source, country_key, limit=temporal_limit),
+        lambda c: (c.calendar_start_date, c.id)
+    )
+    sections = [yearly.label("yearly"), regions.label("regions"), temporal.label("temporal")]
+    if series_resolution:
+        series, decode_series = json_section(
+            temporal_series_query(temporal_source, country_key),
+            lambda c: (c.calendar_start_date,)
+        )
+        sections.append(series.label("series"))
+
+    row = db.execute(select(*sections)).one()
+    results = {
+        "yearly": yearly_results(decode_yearly(row.yearly)),
+        "regions": regional_page(decode_regions(row.regions), regions_limit),
+        "temporal": temporal_page(decode_temporal(row.temporal), temporal_limit)
+    }
+    if series_resolution:
+        results["series"] = series_page(decode_series(row.series), series_resolution, max_points=series_max_points)["data"]
+    return results
+
+def forecast_metrics(db: Session, country: str, region: Optional[str] = None):
+    """Backtest accuracy and selection of each forecasting model for one series"""
+    table = database.forecast_models
+    region_key = region.strip().lower() if region else None
+    query = select(
+        table.c.adm_0_name,
+        table.c.adm_1_name,
+        table.c.model,
+        table.c.selected,
+        table.c.mae,
+        table.c.mape,
+        table.c.coverage,
+        table.c.points,
+        table.c.horizon,
+        table.c.folds,
+        table.c.history_end,
+        table.c.trained_at
+    ).where(
+        table.c.country_key == resolve_country_key(db, country),
+        table.c.region_key.is_not_distinct_from(region_key)
+    ).order_by(
+        table.c.mae.asc().nulls_last()
+    )
+
+    results = [
+        {
+            "country": row.adm_0_name,
+            "region": row.adm_1_name,
+            "model": row.model,
+            "selected": row.selected,
+            "mae": row.mae,
+            "mape": row.mape,
+            "coverage": row.coverage,
+            "points": row.points,
+            "horizon": row.horizon,
+            "folds": row.folds,
+            "history_end": row.history_end.isoformat() if row.history_end else None,
+            "trained_at": row.trained_at.isoformat() if row.trained_at else None
+        }
+        for row in db.execute(query).all()
+    ]
+    return results
+
+def forecast_parameters(db: Session, country: str, region: Optional[str] = None):
+    """Stored model records of one series, [] if it was not trained, or None if no model has been trained yet"""
+    table = database.forecast_models
+    region_key = region.strip().lower() if region else None
+    query = select(
+        table.c.country_key,
+        table.c.region_key,
+        table.c.adm_0_name,
+        table.c.adm_1_name,
+        table.c.model,
+        table.c.selected,
+        table.c.parameters,
+        table.c.history_end
+    ).where(
+        table.c.country_key == resolve_country_key(db, country),
+        table.c.region_key.is_not_distinct_from(region_key)
+    )
+
+    records = [dict(row._mapping) for row in db.execute(query).all()]
+    if records:
+        return records
+    return [] if db.execute(select(table.c.id).limit(1)).first() is not None else None
+
+def outbreak_alerts(db: Session, country: Optional[str] = None, region: Optional[str] = None,
+                    method: Optional[str] = None, since: Optional[date] = None, limit: int = 100):
+    """Flagged outbreak periods stored by detect_outbreaks.py, most recent first"""
+    table = database.outbreak_alerts
+    query = select(
+        table.c.adm_0_name,
+        table.c.adm_1_name,
+        table.c.source,
+        table.c.t_res,
+        table.c.period_start,
+        table.c.period_end,
+        table.c.cases,
+        table.c.expected,
+        table.c.threshold,
+        table.c.score,
+        table.c.method,
+        table.c.detected_at
+    )
+    if country:
+        query = query.where(table.c.country_key == resolve_country_key(db, country))
+    if region:
+        query = query.where(table.c.region_key == region.strip().lower())
+    if method:
+        query = query.where(table.c.method == method)
+    if since:
+        query = query.where(table.c.period_start >= since)
+    query = query.order_by(table.c.period_start.desc(), table.c.score.desc()).limit(limit)
+
+    return [
+        {
+            "country": row.adm_0_name,
+            "region": row.adm_1_name,
+            "source": row.source,
+            "time_resolution": row.t_res,
+            "start_date": row.period_start.isoformat(),
+            "end_date": row.period_end.isoformat(),
+            "cases": round(row.cases, 2),
+            "expected": round(row.expected, 2),
+            "threshold": round(row.threshold, 2),
+            "score": round(row.score, 2),
+            "method": row.method,
+            "detected_at": row.detected_at.isoformat() if row.detected_at else None
+        }
+        for row in db.execute(query).all()
+    ]
+
+def estimated_rows(db: Session, query):
+    """Largest row estimate of any step of the planner's plan for a query, without running it"""
+    plan = db.execute(Explain(query)).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    nodes = [plan[0]["Plan"]]
+    largest = 0
+    while nodes:
+        node = nodes.pop()
+        largest = max(largest, node.get("Plan Rows", 0))
+        nodes.extend(node.get("Plans", []))
+    return int(largest)
+
+def aggregate_metric(source, metric, rollup):
+    """Aggregate expression of a metric over the raw rows or the rows of a rollup"""
+    if rollup:
+        return {
+            "sum": func.sum(source.c.dengue_total),
+            "count": func.coalesce(func.sum(source.c.record_count), 0).cast(BigInteger),
+            "min": func.min(source.c.min_total),
+            "max": func.max(source.c.max_total),
+            "mean": func.sum(source.c.dengue_total) / func.nullif(func.sum(source.c.value_count), 0),
+        }[metric]
+    return {
+        "sum": func.sum(source.c.dengue_total),
+        "count": func.count(),
+        "min": func.min(source.c.dengue_total),
+        "max": func.max(source.c.dengue_total),
+        "mean": func.avg(source.c.dengue_total),
+    }[metric]
+
+def aggregate(
+    db: Session,
+    dataset: str,
+    group_by: list,
+    metrics: list,
+    country: Optional[str] = None,
+    region: Optional[str] = None,
+    start_year: Optional[int] = None,
+    end_year: Optional[int] = None,
+    s_res: Optional[str] = None,
+    t_res: Optional[str] = None,
+    limit: int = 1000
+):
+    """Metrics of dengue_total per combination of the group_by dimensions, from the smallest source able to answer.
+
+    The smallest fresh rollup keeping every grouped and filtered dimension is used; only
+    when there is none are the deduplicated rows read, after checking with EXPLAIN that
+    the query is estimated to read at most AGGREGATE_MAX_ROWS rows.
+    """
+    table = AGGREGATE_DATASETS[dataset][0]
+    filtered = {
+        "country": country,
+        "region": region,
+        "year": start_year is not None or end_year is not None,
+        "s_res": s_res,
+        "t_res": t_res,
+    }
+    dimensions = set(group_by) | {dimension for dimension, value in filtered.items() if value}
+    fresh = rollups.fresh_names(db, table)
+    rollup = rollups.plan_aggregate(db, table, dimensions, fresh)
+    source = rollup if rollup is not None else rollups.rows_for(db, table, fresh)
+
+    groups = [source.c[AGGREGATE_DIMENSIONS[dimension]].label(dimension) for dimension in group_by]
+    query = select(*groups, *[
+        aggregate_metric(source, metric, rollup is not None).label(metric) for metric in metrics
+    ])
+    if country:
+        query = query.where(source.c.country_key == resolve_country_key(db, country))
+    if region:
+        query = query.where(source.c.adm_1_name == region)
+    if start_year is not None:
+        query = query.where(source.c.year >= start_year)
+    if end_year is not None:
+        query = query.where(source.c.year <= end_year)
+    if s_res:
+        query = query.where(source.c.s_res == s_res)
+    if t_res:
+        query = query.where(source.c.t_res == t_res)
+    if groups:
+        query = query.group_by(*groups).order_by(*groups)
+    query = query.limit(limit)
+
+    estimate = None
+    if rollup is None:
+        estimate = estimated_rows(db, query)
+        if estimate > AGGREGATE_MAX_ROWS:
+            raise QueryTooExpensive(
+                f"Query is estimated to read {estimate:,} rows, more than the limit of {AGGREGATE_MAX_ROWS:,}; "
+                "add filters or group by dimensions a rollup keeps"
+            )
+
+    return {
+        "source": source.name,
+        "estimated_rows": estimate,
+        # Read by key, since count and index are also tuple methods of result rows
+        "groups": [dict(row._mapping) for row in db.execute(query).all()]
+    }
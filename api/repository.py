@@ -0,0 +1,118 @@
+"""Data access for the API endpoints, independent of where the data is stored.
+
+DATA_BACKEND selects the implementation: "postgres" (the default) runs the SQL in
+queries.py against the database, "columnar" answers the same calls from the
+memory-mapped .npy column arrays written by columnar.py, without a database. Every function takes the handle
+yielded by get_db(), a session or the columnar store, as its first argument, so it
+can be passed to database.run_sync.
+"""
+import os
+
+import columnar
+import database
+import export
+import forecasting
+import queries
+import rollups
+
+DATA_BACKEND = os.getenv("DATA_BACKEND", "postgres")  # postgres or columnar
+
+def backend():
+    """Module implementing the queries for the configured backend"""
+    return columnar if DATA_BACKEND == "columnar" else queries
+
+def get_db():
+    """Session generator of the configured backend"""
+    if DATA_BACKEND == "columnar":
+        return columnar.get_db()
+    return database.get_db()
+
+def ping(db):
+    """Check that the backend answers queries"""
+    return backend().ping(db)
+
+def national_data_version(db):
+    """Dataset version for national statistics"""
+    return backend().national_data_version(db)
+
+def temporal_data_version(db):
+    """Dataset version for temporal series"""
+    return backend().temporal_data_version(db)
+
+def data_version(db):
+    """Version of all served data, ending with the Unix time of the last import"""
+    return backend().data_version(db)
+
+def resolve_country_key(db, country):
+    """Resolve a country name or ISO3 code to its normalized country_key"""
+    return backend().resolve_country_key(db, country)
+
+def name_rows(db):
+    """Distinct country names, ISO3 codes and region names, for the name index"""
+    return backend().name_rows(db)
+
+def national_stats(db):
+    """Overall statistics"""
+    return backend().national_stats(db)
+
+def top_countries(db, limit):
+    """Top countries by total dengue cases"""
+    return backend().top_countries(db, limit)
+
+def yearly_totals(db, country=None):
+    """Yearly dengue case totals, optionally filtered by country"""
+    return backend().yearly_totals(db, country)
+
+def regional_totals(db, country=None, year=None, limit=20, after=None):
+    """One page of regional dengue case totals"""
+    return backend().regional_totals(db, country, year, limit, after)
+
+def temporal_records(db, country, start_date=None, end_date=None, limit=100, after=None):
+    """One page of temporal dengue case records for a specific country"""
+    return backend().temporal_records(db, country, start_date, end_date, limit, after)
+
+def temporal_series(db, country, resolution, start_date=None, end_date=None, max_points=None):
+    """National dengue cases of a country per week, month or year, optionally downsampled"""
+    return backend().temporal_series(db, country, resolution, start_date, end_date, max_points)
+
+def global_dashboard(db, limit=10):
+    """Sections of the global dashboard: overall statistics, top countries and yearly totals"""
+    return backend().global_dashboard(db, limit)
+
+def country_dashboard(db, country, regions_limit=20, temporal_limit=100, series_resolution=None, series_max_points=None):
+    """Sections of a country dashboard: yearly totals, the first regional and temporal pages and optionally a resampled series"""
+    return backend().country_dashboard(db, country, regions_limit, temporal_limit, series_resolution, series_max_points)
+
+def forecast_metrics(db, country, region=None):
+    """Backtest accuracy and selection of each forecasting model for one series"""
+    return backend().forecast_metrics(db, country, region)
+
+def forecast_parameters(db, country, region=None):
+    """Stored forecasting model records of one series, None if no models have been trained"""
+    return backend().forecast_parameters(db, country, region)
+
+def outbreak_alerts(db, country=None, region=None, method=None, since=None, limit=100):
+    """Flagged outbreak periods, most recent first, optionally for one country, region or method"""
+    return backend().outbreak_alerts(db, country, region, method, since, limit)
+
+def aggregate(db, dataset, group_by, metrics, country=None, region=None, start_year=None, end_year=None,
+              s_res=None, t_res=None, limit=1000):
+    """Metrics of dengue_total per combination of the group_by dimensions of a dataset"""
+    return backend().aggregate(db, dataset, group_by, metrics, country, region, start_year, end_year, s_res, t_res, limit)
+
+def fit_forecasts(db):
+    """Load every monthly series and fit all forecasting models"""
+    load_series = columnar.load_series if DATA_BACKEND == "columnar" else forecasting.load_series
+    return forecasting.fit_panel(load_series(db))
+
+async def export_batches(db, dataset, country=None, start_date=None, end_date=None, year=None, batch_size=5000):
+    """Batches of source-column tuples for the matching rows of an export dataset"""
+    if DATA_BACKEND == "columnar":
+        country_key = columnar.resolve_country_key(db, country) if country else None
+        rows = columnar.export_rows(db, dataset, country_key, start_date, end_date, year)
+        return columnar.iter_batches(rows, batch_size)
+
+    country_key = await database.run_sync(db, queries.resolve_country_key, country) if country else None
+    source = await database.run_sync(db, rollups.rows_for, export.EXPORT_TABLES[dataset])
+    query = export.build_export_query(source, country_key, start_date, end_date, year)
+    return export.iter_batches(query, batch_size)
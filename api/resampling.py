@@ -0,0 +1,125 @@
+"""Resampling of temporal records onto a uniform calendar grid, and downsampling for charts.
+
+Temporal records mix weekly, monthly and yearly rows, often for overlapping periods.
+resample() spreads each row's cases evenly over the days it covers and sums them into
+weeks (starting on Sunday, like the epidemiological weeks of the extracts), months or
+years, so rows crossing a period boundary are prorated. Each source resolution is
+summed separately, and every period takes the resolution covering the most of its
+days, the finest on ties, so overlapping rows are never counted twice. lttb() then
+reduces a long series to a given number of points while keeping its peaks.
+"""
+import numpy as np
+
+# Values of the resolution parameter and their t_res labels
+RESOLUTIONS = {"week": "Week", "month": "Month", "year": "Year"}
+
+# Resolutions of the source rows, finest first
+SOURCE_RESOLUTIONS = ("Week", "Month", "Year")
+
+def period_bounds(resolution, first_day, last_day):
+    """Starts of the periods of a resolution covering first_day to last_day, followed by the end of the last one"""
+    if resolution == "week":
+        # Day 3 of the epoch, 1970-01-04, is a Sunday
+        first = first_day - (first_day.astype(int) - 3) % 7
+        return np.arange(first, last_day + 8, 7)
+    unit = "M" if resolution == "month" else "Y"
+    return np.arange(first_day.astype(f"datetime64[{unit}]"), last_day.astype(f"datetime64[{unit}]") + 2).astype("datetime64[D]")
+
+def resample(starts, ends, totals, t_res, resolution, first_day=None, last_day=None):
+    """Case totals of the periods of a resolution, from rows with start and end dates (inclusive).
+
+    starts and ends are datetime64[D] arrays, totals floats and t_res the rows' resolutions.
+    The grid spans first_day to last_day, by default the days the rows cover. Returns the
+    start dates, end dates and totals of the periods with data.
+    """
+    empty = np.array([], dtype="datetime64[D]")
+    valid = ~np.isnan(totals) & ~np.isnat(starts) & ~np.isnat(ends) & (ends >= starts)
+    starts, ends, totals, t_res = starts[valid], ends[valid], totals[valid], np.asarray(t_res)[valid]
+    if not len(starts):
+        return empty, empty, np.array([])
+
+    first_day = starts.min() if first_day is None else first_day
+    last_day = ends.max() if last_day is None else last_day
+    bounds = period_bounds(resolution, first_day, last_day)
+    days = (bounds - bounds[0]).astype(int)
+    span = days[-1]
+
+    # Cases per day and covered days of each source resolution, accumulated from the
+    # differences at each row's first and past-the-end day, clipped to the grid
+    first = np.clip((starts - bounds[0]).astype(int), 0, span)
+    past = np.clip((ends - bounds[0]).astype(int) + 1, 0, span)
+    rate = totals / ((ends - starts).astype(int) + 1)
+    sums = np.zeros((len(SOURCE_RESOLUTIONS), len(days) - 1))
+    coverage = np.zeros_like(sums)
+    for level, source_resolution in enumerate(SOURCE_RESOLUTIONS):
+        rows = t_res == source_resolution
+        if not rows.any():
+            continue
+        daily_rate = np.zeros(span + 1)
+        np.add.at(daily_rate, first[rows], rate[rows])
+        np.add.at(daily_rate, past[rows], -rate[rows])
+        daily_rows = np.zeros(span + 1)
+        np.add.at(daily_rows, first[rows], 1)
+        np.add.at(daily_rows, past[rows], -1)
+
+        cumulative_cases = np.concatenate(([0.0], np.cumsum(np.cumsum(daily_rate)[:-1])))
+        cumulative_days = np.concatenate(([0], np.cumsum(np.cumsum(daily_rows)[:-1] > 0)))
+        sums[level] = np.diff(cumulative_cases[days])
+        coverage[level] = np.diff(cumulative_days[days]) / np.diff(days)
+
+    # argmax picks the first, finest, resolution among equal coverages
+    best = coverage.argmax(axis=0)
+    columns = np.arange(len(best))
+    keep = coverage[best, columns] > 0
+    return bounds[:-1][keep], (bounds[1:] - 1)[keep], sums[best, columns][keep]
+
+def lttb(x, y, max_points):
+    """Indices of at most max_points points of a series chosen by Largest-Triangle-Three-Buckets.
+
+    The first and last points are kept, and the points in between are split into equal
+    buckets; each bucket keeps the point forming the largest triangle with the point kept
+    in the previous bucket and the mean of the next bucket, which keeps peaks and troughs.
+    """
+    count = len(x)
+    if max_points >= count or max_points < 3:
+        return np.arange(count)
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    edges = (np.arange(max_points - 1) * (count - 2) / (max_points - 2)).astype(int) + 1
+    edges[-1] = count - 1
+    selected = [0]
+    for bucket in range(max_points - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        next_end = edges[bucket + 2] if bucket + 2 < len(edges) else count
+        next_x, next_y = x[edges[bucket + 1]:next_end].mean(), y[edges[bucket + 1]:next_end].mean()
+        previous = selected[-1]
+        areas = np.abs(
+            (x[previous] - next_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (next_y - y[previous])
+        )
+        selected.append(start + int(areas.argmax()))
+    selected.append(count - 1)
+    return np.array(selected)
+
+def series_records(country, starts, ends, totals, t_res, resolution, start_date=None, end_date=None, max_points=None):
+    """Resampled, optionally downsampled, case totals as records shaped like temporal_page's"""
+    first_day = np.datetime64(start_date, "D") if start_date else None
+    last_day = np.datetime64(end_date, "D") if end_date else None
+    period_starts, period_ends, values = resample(starts, ends, totals, t_res, resolution, first_day, last_day)
+    if max_points:
+        keep = lttb(period_starts.astype(int), values, max_points)
+        period_starts, period_ends, values = period_starts[keep], period_ends[keep], values[keep]
+
+    label = RESOLUTIONS[resolution]
+    return [
+        {
+            "country": country,
+            "start_date": start,
+            "end_date": end,
+            "year": start.year,
+            "dengue_cases": round(value, 2),
+            "time_resolution": label
+        }
+        for start, end, value in zip(period_starts.tolist(), period_ends.tolist(), values.tolist())
+    ]
@@ -0,0 +1,132 @@
+from sqlalchemy import and_, func, select, union_all
+from sqlalchemy.exc import SQLAlchemyError
+
+import database
+import metrics
+
+# Raw table -> rollup table that can answer the same GROUP BY queries over its deduplicated rows.
+# Rollups keep the raw column names, with dengue_total holding the per-group sum.
+ROLLUPS = {
+    database.national_data.name: database.national_year_rollup,
+    database.spatial_data.name: database.spatial_region_year_rollup,
+}
+
+# Raw table -> rollups the /aggregate planner can answer from, smallest first, with the
+# dimensions each one keeps. Besides dengue_total and record_count they hold value_count,
+# min_total and max_total, so means, minima and maxima can be merged across their rows.
+AGGREGATE_ROLLUPS = {
+    database.national_data.name: [
+        (database.national_year_rollup, {"country", "year"}),
+    ],
+    database.spatial_data.name: [
+        (database.spatial_region_year_rollup, {"country", "region", "year"}),
+    ],
+    database.temporal_data.name: [
+        (database.temporal_region_year_rollup, {"country", "region", "year", "s_res", "t_res"}),
+    ],
+}
+
+# Raw table -> materialized view holding its deduplicated rows
+DEDUPLICATED = {
+    database.national_data.name: database.national_data_unique,
+    database.spatial_data.name: database.spatial_data_unique,
+    database.temporal_data.name: database.temporal_data_unique,
+}
+
+def derived_tables(table):
+    """Rollups and deduplicated view built from a raw table, refreshed together by refresh_table_rollups()"""
+    derived = [ROLLUPS.get(table.name), DEDUPLICATED.get(table.name)]
+    derived += [rollup for rollup, _ in AGGREGATE_ROLLUPS.get(table.name, [])]
+    return sorted({table for table in derived if table is not None}, key=lambda table: table.name)
+
+def built_from_current_rows(source):
+    """Condition on rollup_status that a rollup or view was built from the current rows of source"""
+    return and_(
+        database.rollup_status.c.source_max_id.is_not_distinct_from(
+            select(func.max(source.c.id)).scalar_subquery()
+        ),
+        database.rollup_status.c.source_generation.is_not_distinct_from(
+            database.data_generation(source)
+        )
+    )
+
+def is_fresh(db, rollup, source):
+    """Check that a rollup or view exists and was built from the current rows of its source table"""
+    query = select(built_from_current_rows(source)).where(
+        database.rollup_status.c.rollup_name == rollup.name
+    )
+
+    try:
+        return bool(db.execute(query).scalar())
+    except SQLAlchemyError:
+        # Rollup tables have not been created yet; clear the failed transaction
+        db.rollback()
+        return False
+
+def fresh_names(db, *tables):
+    """Names of the fresh rollups and views of the given raw tables, checked in a single query.
+
+    Pass the result as fresh to rows_for and source_for so they skip their own checks.
+    """
+    checks = []
+    for table in tables:
+        names = [derived.name for derived in derived_tables(table)]
+        if names:
+            checks.append(select(database.rollup_status.c.rollup_name).where(
+                database.rollup_status.c.rollup_name.in_(names),
+                built_from_current_rows(table)
+            ))
+    if not database.DB_READ_DEDUPLICATED or not checks:
+        return set()
+
+    try:
+        return set(db.execute(union_all(*checks)).scalars())
+    except SQLAlchemyError:
+        # Rollup tables have not been created yet; clear the failed transaction
+        db.rollback()
+        return set()
+
+def check_fresh(db, derived, table, fresh=None):
+    """is_fresh, answered from a fresh_names result when one is given"""
+    if fresh is not None:
+        return derived.name in fresh
+    return is_fresh(db, derived, table)
+
+def rows_for(db, table, fresh=None):
+    """Return the deduplicated rows of a raw table.
+
+    This is its materialized *_unique view when fresh; if the view has not been refreshed
+    since the last import, the same rows are selected from the raw table with DISTINCT ON,
+    and the fallback is counted in the api_deduplicated_fallbacks metric. With
+    DB_READ_DEDUPLICATED disabled the raw table is returned.
+    """
+    unique = DEDUPLICATED.get(table.name)
+    if not database.DB_READ_DEDUPLICATED or unique is None:
+        return table
+    if check_fresh(db, unique, table, fresh):
+        return unique
+    metrics.STALE_FALLBACKS.labels(table.name).inc()
+    return database.deduplicate(table)
+
+def source_for(db, table, fresh=None):
+    """Return the rollup for a raw table when it is fresh, otherwise its deduplicated rows.
+
+    Rollups are built from the deduplicated views, so they are only used when reading
+    deduplicated data.
+    """
+    rollup = ROLLUPS.get(table.name)
+    if database.DB_READ_DEDUPLICATED and rollup is not None and check_fresh(db, rollup, table, fresh):
+        return rollup
+    return rows_for(db, table, fresh)
+
+def plan_aggregate(db, table, dimensions, fresh=None):
+    """The smallest fresh rollup of a raw table keeping all the given dimensions, or None.
+
+    Rollups are built from the deduplicated views, so none is used when reading raw rows.
+    """
+    if not database.DB_READ_DEDUPLICATED:
+        return None
+    for rollup, kept in AGGREGATE_ROLLUPS.get(table.name, []):
+        if set(dimensions) <= kept and check_fresh(db, rollup, table, fresh):
+            return rollup
+    return None
@@ -55,4 +55,5 @@ class FilterParams(BaseModel):
 class ApiResponse(BaseModel):
     status: str
     data: Any
-    message: Optional[str] = None
\ No newline at end of file
+    message: Optional[str] = None
+    next_cursor: Optional[str] = None
\ No newline at end of file
@@ -0,0 +1,26 @@
+"""Fast JSON responses for the read endpoints.
+
+Endpoint results are already JSON-ready, so they are encoded with orjson in one pass
+instead of being validated against schemas.ApiResponse and re-encoded by FastAPI's
+generic encoder. List results can also be sent column-oriented, one array per field,
+which repeats no field names and is smaller to send and to parse.
+"""
+from fastapi.responses import ORJSONResponse
+
+# Layouts of list results: a list of records, or one list per field
+LAYOUTS = ("rows", "columns")
+
+def to_columns(rows):
+    """Turn a list of records into one list of values per field, in the order of the first record's fields"""
+    if not rows:
+        return {}
+    return {name: [row[name] for row in rows] for name in rows[0]}
+
+def api_response(data, next_cursor=None, layout="rows", headers=None):
+    """Successful response with the fields of schemas.ApiResponse, encoded with orjson"""
+    if layout == "columns":
+        data = to_columns(data)
+    return ORJSONResponse(
+        {"status": "success", "data": data, "message": None, "next_cursor": next_cursor},
+        headers=headers
+    )
@@ -0,0 +1,158 @@
+"""Generate synthetic OpenDengue extracts at any scale, for benchmarks.
+
+The three extracts are written in the format of the real releases (same columns,
+quoting and NA fields), so they load with import_data.py into PostgreSQL or with
+columnar.py into the embedded backend exactly like a release. Each table holds
+--rows rows: series of weekly, monthly and yearly case counts with seasonal peaks,
+per country for the national and temporal tables and per region for the spatial
+table, covering random spans of years. Countries are added until the row count is
+reached, so larger scales also mean more countries and regions. A fraction of rows
+is repeated later in the file with revised counts, like corrections in a release,
+which the deduplicated views and the columnar conversion drop again.
+
+Generation is deterministic for a given --seed.
+
+Usage: python synthetic_data.py --out-dir ../synthetic [--rows 31032] [--load postgres|columnar]
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+import columnar
+import import_data
+
+HEADER = (
+    '"adm_0_name","adm_1_name","adm_2_name","full_name","ISO_A0","FAO_GAUL_code","RNE_iso_code","IBGE_code",'
+    '"calendar_start_date","calendar_end_date","Year","dengue_total","case_definition_standardised",'
+    '"S_res","T_res","UUID"'
+)
+
+# Probability that a country (or region) reports a series of each resolution
+ADMIN0_RESOLUTIONS = (("Week", 0.9), ("Month", 0.3), ("Year", 0.6))
+ADMIN1_RESOLUTIONS = (("Week", 0.7), ("Month", 0.4), ("Year", 0.3))
+
+CASE_DEFINITIONS = ("Total", "Suspected", "Confirmed", "Probable and confirmed")
+
+def country_code(index):
+    """Three-letter code of the index-th synthetic country: AAA, AAB, ..."""
+    letters = []
+    for _ in range(3):
+        index, letter = divmod(index, 26)
+        letters.append(chr(ord("A") + letter))
+    return "".join(reversed(letters))
+
+def periods(resolution, first_year, last_year):
+    """Start and end dates of every period of a resolution between two years, as datetime64[D] arrays"""
+    if resolution == "Week":
+        # 52 weeks a year, starting on the first Sunday of the year
+        starts = []
+        for year in range(first_year, last_year + 1):
+            january = np.datetime64(f"{year}-01-01")
+            first_sunday = january + (3 - january.astype(int)) % 7
+            starts.append(first_sunday + 7 * np.arange(52))
+        starts = np.concatenate(starts)
+        return starts, starts + 6
+    if resolution == "Month":
+        starts = np.arange(f"{first_year}-01", f"{last_year + 1}-01", dtype="datetime64[M]")
+    else:
+        starts = np.arange(f"{first_year}", f"{last_year + 1}", dtype="datetime64[Y]")
+    return starts.astype("datetime64[D]"), (starts + 1).astype("datetime64[D]") - 1
+
+def case_counts(rng, starts, ends, scale, phase):
+    """Seasonal case counts for the periods, with a few missing (NaN) values"""
+    days = (ends - starts).astype(int) + 1
+    month = starts.astype("datetime64[M]").astype(int) % 12
+    rate = scale * days / 7 * (1 + 0.9 * np.sin(2 * np.pi * (month - phase) / 12))
+    cases = rng.poisson(np.maximum(rate, 0)).astype(float)
+    cases[rng.random(len(cases)) < 0.01] = np.nan
+    return cases
+
+def series_lines(rng, country, region, resolution, first_year, last_year):
+    """CSV lines of one series of case counts over a random span of years"""
+    start_year = int(rng.integers(first_year, last_year + 1))
+    end_year = int(rng.integers(start_year, last_year + 1))
+    starts, ends = periods(resolution, start_year, end_year)
+    cases = case_counts(rng, starts, ends, scale=rng.lognormal(4, 1.5), phase=rng.integers(12))
+
+    name = f"COUNTRY {country:05d}"
+    code = country_code(country)
+    adm_1 = f'"REGION {region:04d}"' if region is not None else "NA"
+    full_name = f"{name}, REGION {region:04d}" if region is not None else name
+    s_res = "Admin1" if region is not None else "Admin0"
+    definition = CASE_DEFINITIONS[country % len(CASE_DEFINITIONS)]
+    prefix = f'"{name}",{adm_1},NA,"{full_name}","{code}",NA,"{code}",NA,'
+    suffix = f',"{definition}","{s_res}","{resolution}","SYN-{code}-{region or 0}-{resolution}"'
+
+    start_text = np.datetime_as_string(starts)
+    end_text = np.datetime_as_string(ends)
+    return [
+        f'{prefix}"{start}","{end}",{start[:4]},{"NA" if total != total else int(total)}{suffix}'
+        for start, end, total in zip(start_text, end_text, cases)
+    ]
+
+def table_lines(rng, regions, first_year, last_year):
+    """Lines of the series of successive synthetic countries, one list per series, without end"""
+    resolutions = ADMIN1_RESOLUTIONS if regions else ADMIN0_RESOLUTIONS
+    country = 0
+    while True:
+        for region in (range(regions) if regions else [None]):
+            for resolution, probability in resolutions:
+                if rng.random() < probability:
+                    yield series_lines(rng, country, region, resolution, first_year, last_year)
+        country += 1
+
+def revise(line):
+    """The line with its case count revised, as a later release would correct it"""
+    head, total, *tail = line.rsplit(",", 5)
+    return ",".join([head, "NA" if total == "NA" else str(int(total) + 1)] + tail)
+
+def write_extract(path, rows, regions=0, first_year=2000, last_year=2023, duplicates=0.01, seed=0):
+    """Write a synthetic extract of rows lines, each series followed by the revisions of some of its lines"""
+    rng = np.random.default_rng(seed)
+    written = 0
+    with open(path, "w") as out:
+        out.write(HEADER + "\n")
+        for lines in table_lines(rng, regions, first_year, last_year):
+            revised = [revise(line) for line in lines if rng.random() < duplicates]
+            chunk = (lines + revised)[:rows - written]
+            out.write("\n".join(chunk) + "\n")
+            written += len(chunk)
+            if written >= rows:
+                return
+
+def generate(out_dir, rows, regions=20, first_year=2000, last_year=2023, duplicates=0.01, seed=0, report=print):
+    """Write the three synthetic extracts into out_dir"""
+    os.makedirs(out_dir, exist_ok=True)
+    tables = (("national_data", 0), ("spatial_data", regions), ("temporal_data", 0))
+    for offset, (table, table_regions) in enumerate(tables):
+        started = time.monotonic()
+        path = os.path.join(out_dir, import_data.EXTRACTS[table])
+        write_extract(path, rows, table_regions, first_year, last_year, duplicates, seed + offset)
+        report(f"{table}: wrote {rows:,} rows to {path} in {time.monotonic() - started:.1f}s")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic OpenDengue extracts for benchmarks")
+    parser.add_argument("--out-dir", required=True, help="Directory to write the extracts to")
+    parser.add_argument("--rows", type=int, default=31032,
+                        help="Rows per table, from the 31,032 of the national extract up to tens of millions")
+    parser.add_argument("--regions", type=int, default=20, help="Regions per country in the spatial table")
+    parser.add_argument("--first-year", type=int, default=2000)
+    parser.add_argument("--last-year", type=int, default=2023)
+    parser.add_argument("--duplicates", type=float, default=0.01,
+                        help="Fraction of rows repeated with revised counts")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--load", choices=("postgres", "columnar"),
+                        help="Load the extracts afterwards with import_data.py or columnar.py")
+    args = parser.parse_args(argv)
+
+    report = lambda message: print(message, flush=True)
+    generate(args.out_dir, args.rows, args.regions, args.first_year, args.last_year, args.duplicates, args.seed, report)
+    if args.load == "postgres":
+        import_data.main(["--data-dir", args.out_dir])
+    elif args.load == "columnar":
+        columnar.convert(args.out_dir, columnar.COLUMNAR_DATA_DIR, report=report)
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,11 @@
 import pytest
 from fastapi.testclient import TestClient
-from main import app
+from main import app, stats_cache, forecast_cache, response_cache, data_version_cache, name_index_cache
+from name_index import NameIndex
 import json
 from unittest import mock
+from sqlalchemy import Table
+from sqlalchemy.sql.util import find_tables
 
 # Create test client
 client = TestClient(app)
@@ -13,6 +16,39 @@ def mock_db_dependency():
     with mock.patch("main.database.get_db") as _fixture:
         yield _fixture
 
+def queried_tables(mock_execute):
+    """Names of the tables each statement passed to a mocked execute reads, in call order"""
+    return [
+        {table.name for table in find_tables(call.args[0], include_aliases=True) if isinstance(table, Table)}
+        for call in mock_execute.call_args_list
+    ]
+
+# Reset process-level caches so each test sees its own mocked data
+@pytest.fixture(autouse=True)
+def clear_caches():
+    stats_cache.clear()
+    forecast_cache.clear()
+    response_cache.clear()
+    data_version_cache.clear()
+    yield
+    stats_cache.clear()
+    forecast_cache.clear()
+    response_cache.clear()
+    data_version_cache.clear()
+
+# Serve an empty name index unless a test sets one, so country parameters reach the mocked queries unchanged
+@pytest.fixture(autouse=True)
+def name_index():
+    with mock.patch.object(name_index_cache, "get_or_compute", return_value=NameIndex([])) as _fixture:
+        yield _fixture
+
+NAME_ROWS = [
+    ("brazil", "BRAZIL", "BRA", None),
+    ("brazil", "BRAZIL", None, "SAO PAULO"),
+    ("brazil", "BRAZIL", None, "RIO GRANDE DO SUL"),
+    ("peru", "PERU", "PER", None),
+]
+
 def test_root_endpoint():
     """Test the root endpoint returns correct information"""
     response = client.get("/")
@@ -27,14 +63,85 @@ def test_health_endpoint(mock_db_dependency):
     # Mock the database query execution
     mock_db = mock.MagicMock()
     mock_db_dependency.return_value.__next__.return_value = mock_db
-    mock_db.execute().scalar.return_value = 100
+    mock_db.execute.return_value.scalar.return_value = 1
     
     response = client.get("/health")
     assert response.status_code == 200
     data = response.json()
     assert data["status"] == "healthy"
     assert data["database_connection"] == "ok"
-    assert data["records_count"] == 100
+    # A liveness probe only needs the database to answer, not a table scan
+    assert str(mock_db.execute.call_args[0][0]) == "SELECT 1"
+
+def test_ready_endpoint(mock_db_dependency):
+    """Test the readiness endpoint fails with 503 when the data cannot be queried"""
+    mock_db = mock.MagicMock()
+    mock_db_dependency.return_value.__next__.return_value = mock_db
+    mock_db.execute.return_value.one.return_value = (1, 1, 1, 1, 1, 1, None)
+    
+    response = client.get("/ready")
+    assert response.status_code == 200
+    assert response.json()["status"] == "ready"
+    
+    mock_db.execute.side_effect = Exception("relation \"import_log\" does not exist")
+    response = client.get("/ready")
+    assert response.status_code == 503
+
+def test_metrics_endpoint(mock_db_dependency):
+    """Test request latency, statement and cache metrics are exposed for Prometheus"""
+    mock_db = mock.MagicMock()
+    mock_db_dependency.return_value.__next__.return_value = mock_db
+    mock_db.execute.return_value.scalar.return_value = 1
+    client.get("/health")
+    
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'api_request_duration_seconds_count{method="GET",route="/health",status="200"}' in response.text
+    assert 'api_cache_hit_ratio{cache="stats"}' in response.text
+    assert 'api_cache_coalesced_total{cache="response"}' in response.text
+    assert "api_db_pool_checked_out" in response.text
+
+def test_failed_statements_are_timed():
+    """Failed statements are recorded and leave no timing state behind on the connection"""
+    import metrics
+    from sqlalchemy import create_engine, event, text
+    from sqlalchemy.exc import OperationalError
+
+    engine = create_engine("sqlite://")
+    event.listen(engine, "before_cursor_execute", metrics.before_statement)
+    event.listen(engine, "after_cursor_execute", metrics.after_statement)
+    event.listen(engine, "handle_error", metrics.failed_statement)
+    observed = lambda: metrics.REGISTRY.get_sample_value(
+        "api_db_statement_duration_seconds_count", {"route": metrics.NO_ROUTE}
+    ) or 0
+
+    before = observed()
+    with engine.connect() as connection:
+        with pytest.raises(OperationalError):
+            connection.execute(text("SELECT * FROM missing_table"))
+        assert connection.execute(text("SELECT 1")).scalar() == 1
+        assert "metrics_started" not in connection.info
+    assert observed() == before + 2
+
+def test_health_endpoint_with_async_session(mock_db_dependency):
+    """Test endpoints accept the async session generator used when DB_ASYNC is enabled"""
+    mock_db = mock.MagicMock()
+    mock_db.execute().scalar.return_value = 1
+    closed = []
+    
+    async def sessions():
+        try:
+            yield mock_db
+        finally:
+            closed.append(True)
+    
+    mock_db_dependency.side_effect = sessions
+    
+    response = client.get("/health")
+    assert response.status_code == 200
+    assert response.json()["status"] == "healthy"
+    assert closed == [True]
 
 def test_national_stats_endpoint(mock_db_dependency):
     """Test the national stats endpoint with mocked database"""
@@ -42,9 +149,14 @@ def test_national_stats_endpoint(mock_db_dependency):
     mock_db = mock.MagicMock()
     mock_db_dependency.return_value.__next__.return_value = mock_db
     
-    # Set up return values for different queries
     mock_execute = mock_db.execute
-    mock_execute.return_value.scalar.side_effect = [10000, 1000000, 50, 1990, 2023]
+    mock_execute.return_value.one.return_value = mock.MagicMock(
+        total_records=10000,
+        total_cases=1000000,
+        countries_count=50,
+        min_year=1990,
+        max_year=2023
+    )
     
     response = client.get("/national/stats")
     assert response.status_code == 200
@@ -54,6 +166,37 @@ def test_national_stats_endpoint(mock_db_dependency):
     assert data["data"]["total_cases"] == 1000000
     assert data["data"]["countries_count"] == 50
     assert len(data["data"]["year_range"]) == 34  # 2023-1990+1
+    # Every statistic comes from one aggregate over the deduplicated table
+    reads = [tables for tables in queried_tables(mock_execute) if "national_data_unique" in tables]
+    assert reads == [{"national_data_unique"}]
+
+def test_national_stats_uses_snapshot_cache(mock_db_dependency):
+    """Test repeat stats calls are served from the snapshot cache"""
+    mock_db = mock.MagicMock()
+    mock_db_dependency.return_value.__next__.return_value = mock_db
+    
+    mock_execute = mock_db.execute
+    mock_execute.return_value.one.return_value = mock.MagicMock(
+        total_records=10000,
+        total_cases=1000000,
+        countries_count=50,
+        min_year=1990,
+        max_year=2023
+    )
+    
+    client.get("/national/stats")
+    mock_execute.reset_mock()
+    response_cache.clear()
+    before = stats_cache.stats()
+    
+    response = client.get("/national/stats")
+    assert response.status_code == 200
+    assert response.json()["data"]["total_records"] == 10000
+    mock_execute.assert_not_called()
+    
+    health = client.get("/health").json()
+    assert health["stats_cache"]["hits"] == before["hits"] + 1
+    assert health["stats_cache"]["misses"] == before["misses"]
 
 def test_national_countries_endpoint(mock_db_dependency):
     """Test the national countries endpoint with mocked database"""
@@ -77,6 +220,123 @@ def test_national_countries_endpoint(mock_db_dependency):
     assert data["data"][0]["country"] == "Brazil"
     assert data["data"][0]["total_cases"] == 1000000
 
+def test_national_countries_uses_response_cache(mock_db_dependency):
+    """Test repeat calls with the same parameters are served from the response cache"""
+    mock_db = mock.MagicMock()
+    mock_db_dependency.return_value.__next__.return_value = mock_db
+    mock_db.execute.return_value.all.return_value = [
+        mock.MagicMock(country="Brazil", total_cases=1000000),
+    ]
+    
+    client.get("/national/countries?limit=1")
+    mock_db.execute.reset_mock()
+    
+    response = client.get("/national/countries?limit=1")
+    assert response.status_code == 200
+    assert response.json()["data"][0]["country"] == "Brazil"
+    mock_db.execute.assert_not_called()
+    
+    # A different limit is a different query
+    client.get("/national/countries?limit=2")
+    mock_db.execute.assert_called()
+
+def test_conditional_get_skips_queries(mock_db_dependency):
+    """Test a request with a current ETag is answered with 304 without querying the data"""
+    mock_db = mock.MagicMock()
+    mock_db_dependency.return_value.__next__.return_value = mock_db
+    mock_db.execute.return_value.one.return_value = (10, 2, 20, 2, 30, 2, 1700000000.0)
+    mock_db.execute.return_value.all.return_value = [
+        mock.MagicMock(country="Brazil", total_cases=1000000),
+    ]
+    
+    response = client.get("/national/countries?limit=1")
+    assert response.status_code == 200
+    assert response.headers["cache-control"].startswith("public, max-age=")
+    assert response.headers["last-modified"] == "Tue, 14 Nov 2023 22:13:20 GMT"
+    etag = response.headers["etag"]
+    mock_db.execute.reset_mock()
+    response_cache.clear()
+    
+    response = client.get("/national/countries?limit=1", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    assert response.content == b""
+    mock_db.execute.assert_not_called()
+    
+    # Other parameters have other ETags
+    response = client.get("/national/countries?limit=2", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert client.get("/health").headers["cache-control"] == "no-store"
+
+def test_cached_response_computes_on_its_own_session(mock_db_dependency):
+    """The computation shared by coalesced requests keeps its own session when the request that started it goes away"""
+    import asyncio
+    import threading
+    import main
+
+    opened, closed = [], []
+
+    def sessions():
+        db = mock.MagicMock()
+        opened.append(db)
+        try:
+            yield db
+        finally:
+            closed.append(db)
+
+    mock_db_dependency.side_effect = sessions
+    request_db = mock.MagicMock()
+    release = threading.Event()
+
+    def compute(session):
+        release.wait(5)
+        return {"own_session": session is not request_db, "open": session not in closed}
+
+    async def scenario():
+        first = asyncio.ensure_future(main.cached_response(request_db, "national/yearly", {}, compute))
+        await asyncio.sleep(0.05)
+        second = asyncio.ensure_future(main.cached_response(request_db, "national/yearly", {}, compute))
+        await asyncio.sleep(0.05)
+        first.cancel()
+        release.set()
+        return await second
+
+    assert asyncio.run(scenario()) == {"own_session": True, "open": True}
+    assert len(opened) == 1 and closed == opened
+
+def test_cached_response_releases_request_connection_before_computing():
+    """A miss gives the request's connection back to the pool before its computation takes one"""
+    import asyncio
+    import main
+    from sqlalchemy import create_engine, text
+    from sqlalchemy.orm import Session
+
+    request_db = Session(create_engine("sqlite://", connect_args={"check_same_thread": False}))
+    request_db.execute(text("SELECT 1"))
+
+    def compute(session):
+        return request_db.in_transaction()
+
+    with mock.patch.object(data_version_cache, "current_version", return_value=1):
+        assert asyncio.run(main.cached_response(request_db, "national/yearly", {}, compute)) is False
+
+def test_import_invalidates_cached_responses(mock_db_dependency):
+    """Test a new data version changes both the ETag and the body, never pairing the old body with the new ETag"""
+    mock_db = mock.MagicMock()
+    mock_db_dependency.return_value.__next__.return_value = mock_db
+    
+    with mock.patch.object(data_version_cache, "current_version", return_value=(10, 2, 20, 2, 30, 2, 1700000000.0)), \
+            mock.patch("repository.yearly_totals", return_value=[{"year": 2020, "total_cases": 100.0}]):
+        before = client.get("/national/yearly?country=Brazil")
+    with mock.patch.object(data_version_cache, "current_version", return_value=(11, 3, 20, 2, 30, 2, 1700000600.0)), \
+            mock.patch("repository.yearly_totals", return_value=[{"year": 2020, "total_cases": 150.0}]):
+        after = client.get("/national/yearly?country=Brazil")
+    
+    assert after.headers["etag"] != before.headers["etag"]
+    assert before.json()["data"] == [{"year": 2020, "total_cases": 100.0}]
+    assert after.json()["data"] == [{"year": 2020, "total_cases": 150.0}]
+
 def test_national_yearly_endpoint(mock_db_dependency):
     """Test the national yearly endpoint with mocked database"""
     # Mock data for yearly totals
@@ -163,4 +423,322 @@ def test_temporal_data_endpoint(mock_db_dependency):
     assert len(data["data"]) == 2
     assert data["data"][0]["country"] == "Brazil"
     assert data["data"][0]["year"] == 2022
-    assert data["data"][0]["dengue_cases"] == 5000
\ No newline at end of file
+    assert data["data"][0]["dengue_cases"] == 5000
+
+def test_country_dashboard_endpoint(mock_db_dependency):
+    """Test the country dashboard decodes every section from one combined query"""
+    mock_db = mock.MagicMock()
+    mock_db.info = {}
+    mock_db_dependency.return_value.__next__.return_value = mock_db
+    mock_db.execute.return_value.scalars.return_value = ["national_year_rollup", "spatial_region_year_rollup"]
+    mock_db.execute.return_value.one.return_value = mock.MagicMock(
+        yearly=[[2021, 150], [2022, 120.5]],
+        regions=[["Brazil", "Sao Paulo", 500000], ["Brazil", "Bahia", 300000]],
+        temporal=[[1, "Brazil", "2022-01-01", "2022-01-07", 2022, 5000, "Week"]]
+    )
+    
+    response = client.get("/dashboard/country/Brazil?regions_limit=1")
+    assert response.status_code == 200
+    data = response.json()["data"]
+    assert data["yearly"] == [{"year": 2021, "total_cases": 150.0}, {"year": 2022, "total_cases": 120.5}]
+    assert data["regions"]["data"] == [{"country": "Brazil", "region": "Sao Paulo", "total_cases": 500000.0}]
+    assert data["regions"]["next_cursor"] is not None
+    assert data["temporal"]["data"][0]["start_date"] == "2022-01-01"
+    assert data["temporal"]["next_cursor"] is None
+    # All sections come from one statement over the fresh rollups, not the raw tables
+    reads = [tables for tables in queried_tables(mock_db.execute) if "national_year_rollup" in tables]
+    assert len(reads) == 1
+    assert {"spatial_region_year_rollup", "temporal_data"} <= reads[0]
+    assert not reads[0] & {"national_data", "spatial_data"}
+
+def make_export_rows():
+    """Two source rows in database.SOURCE_COLUMNS order"""
+    from datetime import date
+    return [
+        ("Brazil", None, None, "BRAZIL", "BRA", 37, "BRA", None, date(2022, 1, 1), date(2022, 1, 7),
+         2022, 5000.0, "Suspected", "Admin0", "Week", "uuid-1"),
+        ("Brazil", None, None, "BRAZIL", "BRA", 37, "BRA", None, date(2022, 1, 8), date(2022, 1, 14),
+         2022, 6000.0, "Suspected", "Admin0", "Week", "uuid-2"),
+    ]
+
+def test_temporal_data_columns_layout(mock_db_dependency):
+    """Test list results can be returned as one list per field"""
+    from datetime import date
+    
+    mock_db = mock.MagicMock()
+    mock_db_dependency.return_value.__next__.return_value = mock_db
+    mock_db.execute.return_value.all.return_value = [
+        mock.MagicMock(id=index, adm_0_name="Brazil", calendar_start_date=date(2022, 1, index),
+                       calendar_end_date=date(2022, 1, index), year=2022, dengue_total=1000.0 * index, t_res="Day")
+        for index in (1, 2)
+    ]
+    
+    response = client.get("/temporal/data?country=Brazil&layout=columns")
+    assert response.status_code == 200
+    data = response.json()["data"]
+    assert data["start_date"] == ["2022-01-01", "2022-01-02"]
+    assert data["dengue_cases"] == [1000.0, 2000.0]
+    assert client.get("/temporal/data?country=Brazil&layout=table").status_code == 422
+
+def test_temporal_data_resolution(mock_db_dependency):
+    """Test temporal records are resampled into calendar periods and max_points needs a resolution"""
+    from datetime import date
+    
+    mock_db = mock.MagicMock()
+    mock_db_dependency.return_value.__next__.return_value = mock_db
+    mock_db.execute.return_value.all.return_value = [
+        mock.MagicMock(adm_0_name="Brazil", calendar_start_date=date(2022, 1, 30),
+                       calendar_end_date=date(2022, 2, 5), dengue_total=700.0, t_res="Week"),
+        mock.MagicMock(adm_0_name="Brazil", calendar_start_date=date(2022, 3, 1),
+                       calendar_end_date=date(2022, 3, 31), dengue_total=310.0, t_res="Month"),
+    ]
+    
+    response = client.get("/temporal/data?country=Brazil&resolution=month&max_points=10")
+    assert response.status_code == 200
+    data = response.json()["data"]
+    assert [row["start_date"] for row in data] == ["2022-01-01", "2022-02-01", "2022-03-01"]
+    assert [row["dengue_cases"] for row in data] == [200.0, 500.0, 310.0]
+    assert data[0]["time_resolution"] == "Month"
+    assert response.json()["next_cursor"] is None
+    
+    assert client.get("/temporal/data?country=Brazil&max_points=10").status_code == 400
+    assert client.get("/temporal/data?country=Brazil&resolution=day").status_code == 422
+
+def test_export_csv_streams_batches(mock_db_dependency):
+    """Test the export endpoint streams every batch from the cursor as CSV"""
+    rows = make_export_rows()
+    mock_db = mock.MagicMock()
+    mock_db_dependency.return_value.__next__.return_value = mock_db
+    mock_db.execute.return_value.partitions.return_value = [rows[:1], rows[1:]]
+    
+    response = client.get("/export/temporal?format=csv&batch_size=100")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    lines = response.text.strip().splitlines()
+    assert lines[0].startswith("adm_0_name,adm_1_name")
+    assert len(lines) == 3
+    assert lines[2].endswith("2022-01-08,2022-01-14,2022,6000.0,Suspected,Admin0,Week,uuid-2")
+
+def test_export_ndjson(mock_db_dependency):
+    """Test the export endpoint writes one JSON object per row"""
+    mock_db = mock.MagicMock()
+    mock_db_dependency.return_value.__next__.return_value = mock_db
+    mock_db.execute.return_value.partitions.return_value = [make_export_rows()]
+    
+    response = client.get("/export/spatial?format=ndjson")
+    assert response.status_code == 200
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert len(records) == 2
+    assert records[0]["calendar_start_date"] == "2022-01-01"
+    assert records[1]["dengue_total"] == 6000.0
+
+def test_export_rejects_unknown_dataset_and_format():
+    """Test the export endpoint validates its dataset and format"""
+    assert client.get("/export/national").status_code == 404
+    assert client.get("/export/temporal?format=xml").status_code == 400
+
+def test_temporal_data_next_cursor(mock_db_dependency):
+    """Test a full temporal page returns a cursor that resumes after its last record"""
+    from datetime import date
+    import pagination
+    
+    mock_rows = [
+        mock.MagicMock(
+            id=index,
+            adm_0_name="Brazil",
+            calendar_start_date=date(2022, 1, index),
+            calendar_end_date=date(2022, 1, index),
+            year=2022,
+            dengue_total=1000 * index,
+            t_res="Day"
+        )
+        for index in range(1, 4)
+    ]
+    
+    mock_db = mock.MagicMock()
+    mock_db_dependency.return_value.__next__.return_value = mock_db
+    mock_db.execute.return_value.all.return_value = mock_rows
+    
+    response = client.get("/temporal/data?country=Brazil&limit=2")
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data["data"]) == 2
+    assert pagination.decode_cursor(data["next_cursor"], [date, int]) == [date(2022, 1, 2), 2]
+    
+    mock_db.execute.return_value.all.return_value = mock_rows[2:]
+    response = client.get(f"/temporal/data?country=Brazil&limit=2&cursor={data['next_cursor']}")
+    assert response.json()["data"][0]["dengue_cases"] == 3000
+    assert response.json()["next_cursor"] is None
+
+def test_spatial_regions_next_cursor(mock_db_dependency):
+    """Test regional rankings page on (total_cases, country, region)"""
+    import pagination
+    
+    mock_regions = [
+        mock.MagicMock(country="Brazil", region="Sao Paulo", total_cases=500000.0),
+        mock.MagicMock(country="Brazil", region="Rio de Janeiro", total_cases=300000.0),
+    ]
+    
+    mock_db = mock.MagicMock()
+    mock_db_dependency.return_value.__next__.return_value = mock_db
+    mock_db.execute.return_value.all.return_value = mock_regions
+    
+    response = client.get("/spatial/regions?country=Brazil&limit=1")
+    cursor = response.json()["next_cursor"]
+    assert pagination.decode_cursor(cursor, [float, str, str]) == [500000.0, "Brazil", "Sao Paulo"]
+
+def test_invalid_cursor_rejected():
+    """Test malformed cursors are rejected before querying"""
+    assert client.get("/temporal/data?country=Brazil&cursor=not-a-cursor").status_code == 400
+    assert client.get("/spatial/regions?cursor=WzFd").status_code == 400
+
+def test_predict_endpoint(mock_db_dependency):
+    """Test the predict endpoint fits the series in-process until models have been trained"""
+    from tests.test_forecasting import make_rows
+    
+    mock_db = mock.MagicMock()
+    mock_db.info = {}
+    mock_db_dependency.return_value.__next__.return_value = mock_db
+    mock_db.execute.return_value.one.return_value = (36, 1)
+    mock_db.execute.return_value.all.return_value = make_rows()
+    
+    with mock.patch("main.repository.forecast_parameters", return_value=None):
+        response = client.get("/predict?country=Brazil&horizon=6&model=seasonal_naive")
+    assert response.status_code == 200
+    data = response.json()["data"]
+    assert data["country"] == "BRAZIL"
+    assert data["model"] == "seasonal_naive"
+    assert [f["forecast"] for f in data["forecasts"]] == [10, 12, 20, 40, 80, 120]
+
+def test_predict_endpoint_serves_stored_models(mock_db_dependency):
+    """Test the predict endpoint forecasts from the stored parameters without fitting"""
+    import train_models
+    from tests.test_forecasting import make_rows
+    import forecasting
+    
+    mock_db = mock.MagicMock()
+    mock_db.info = {}
+    mock_db_dependency.return_value.__next__.return_value = mock_db
+    records = train_models.train_chunk(forecasting.build_panel(make_rows()), horizon=6, folds=2, step=3)
+    
+    with mock.patch("main.repository.forecast_parameters", return_value=records), \
+            mock.patch("main.repository.fit_forecasts") as fit_forecasts:
+        response = client.get("/predict?country=Brazil&horizon=6&model=seasonal_naive")
+    assert response.status_code == 200
+    assert [f["forecast"] for f in response.json()["data"]["forecasts"]] == [10, 12, 20, 40, 80, 120]
+    fit_forecasts.assert_not_called()
+
+def test_predict_endpoint_validation(mock_db_dependency):
+    """Test the predict endpoint rejects unknown models and series"""
+    mock_db = mock.MagicMock()
+    mock_db.info = {}
+    mock_db_dependency.return_value.__next__.return_value = mock_db
+    mock_db.execute.return_value.all.return_value = []
+    
+    assert client.get("/predict?country=Brazil&model=arima").status_code == 400
+    assert client.get("/predict?country=Brazil&horizon=100").status_code == 422
+    assert client.get("/predict?country=Atlantis").status_code == 404
+
+def test_forecast_metrics_endpoint(mock_db_dependency):
+    """Test the forecast metrics endpoint returns stored backtest results"""
+    from datetime import date, datetime
+    
+    mock_db = mock.MagicMock()
+    mock_db.info = {}
+    mock_db_dependency.return_value.__next__.return_value = mock_db
+    mock_row = mock.MagicMock(
+        adm_0_name="BRAZIL", adm_1_name=None, model="seasonal_regression", selected=True,
+        mae=79131.1, mape=44.6, coverage=1.0, points=24, horizon=6, folds=4,
+        history_end=date(2022, 12, 1), trained_at=datetime(2025, 1, 1, 12, 0)
+    )
+    mock_db.execute.return_value.all.return_value = [mock_row]
+    
+    response = client.get("/predict/metrics?country=Brazil")
+    assert response.status_code == 200
+    data = response.json()["data"]
+    assert data[0]["model"] == "seasonal_regression"
+    assert data[0]["selected"] is True
+    assert data[0]["history_end"] == "2022-12-01"
+    
+    mock_db.execute.return_value.all.return_value = []
+    assert client.get("/predict/metrics?country=Peru").status_code == 404
+
+def test_alerts_endpoint(mock_db_dependency):
+    """Test the alerts endpoint returns stored outbreak alerts"""
+    from datetime import date, datetime
+    
+    mock_db = mock.MagicMock()
+    mock_db.info = {}
+    mock_db_dependency.return_value.__next__.return_value = mock_db
+    mock_row = mock.MagicMock(
+        adm_0_name="BRAZIL", adm_1_name=None, source="temporal", t_res="Week",
+        period_start=date(2024, 3, 3), period_end=date(2024, 3, 9), cases=250000.0,
+        expected=90000.0, threshold=150000.0, score=5.3333, method="endemic_channel",
+        detected_at=datetime(2025, 1, 1, 12, 0)
+    )
+    mock_db.execute.return_value.all.return_value = [mock_row]
+    
+    response = client.get("/alerts?country=Brazil&since=2024-01-01")
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == "no-cache"
+    data = response.json()["data"]
+    assert data[0]["start_date"] == "2024-03-03"
+    assert data[0]["score"] == 5.33
+    assert data[0]["method"] == "endemic_channel"
+    
+    assert client.get("/alerts?method=cusum").status_code == 422
+
+def test_aggregate_endpoint(mock_db_dependency):
+    """Test the aggregate endpoint validates dimensions and metrics and refuses expensive queries"""
+    import queries
+    
+    mock_db = mock.MagicMock()
+    mock_db.info = {}
+    mock_db_dependency.return_value.__next__.return_value = mock_db
+    result = {"source": "spatial_region_year_rollup", "estimated_rows": None, "groups": [{"region": "ACRE", "year": 2020, "sum": 40.0}]}
+    
+    with mock.patch("repository.aggregate", return_value=result) as aggregate:
+        response = client.get("/aggregate?dataset=spatial&group_by=region,year&metrics=sum&country=Brazil")
+        assert response.status_code == 200
+        assert response.json()["data"] == result
+        assert aggregate.call_args.args[1:] == ("spatial", ["region", "year"], ["sum"], "Brazil", None, None, None, None, None, 1000)
+        
+        assert client.get("/aggregate?group_by=region").status_code == 400
+        assert client.get("/aggregate?metrics=median").status_code == 400
+    
+    with mock.patch("repository.aggregate", side_effect=queries.QueryTooExpensive("too many rows")):
+        response = client.get("/aggregate?dataset=spatial&group_by=t_res")
+        assert response.status_code == 400
+        assert response.json()["detail"] == "too many rows"
+
+def test_search_endpoint(name_index):
+    """Test the search endpoint matches names exactly, by prefix and by similarity"""
+    name_index.return_value = NameIndex(NAME_ROWS)
+    
+    data = client.get("/search?q=bra").json()["data"]
+    assert data[0] == {
+        "type": "country", "name": "BRAZIL", "country": "BRAZIL", "iso_a0": "BRA", "match": "exact", "score": 1.0
+    }
+    
+    data = client.get("/search?q=sul&type=region").json()["data"]
+    assert [(match["name"], match["match"]) for match in data] == [("RIO GRANDE DO SUL", "prefix")]
+    
+    data = client.get("/search?q=Sao%20Pualo").json()["data"]
+    assert data[0]["name"] == "SAO PAULO" and data[0]["match"] == "fuzzy"
+    
+    assert client.get("/search?q=").status_code == 422
+    assert client.get("/search?q=bra&type=city").status_code == 422
+
+def test_country_parameters_resolved_through_name_index(mock_db_dependency, name_index):
+    """Test ISO3 codes and misspelled names are resolved to the canonical country before querying"""
+    name_index.return_value = NameIndex(NAME_ROWS)
+    mock_db = mock.MagicMock()
+    mock_db.info = {}
+    mock_db_dependency.return_value.__next__.return_value = mock_db
+    mock_db.execute.return_value.all.return_value = []
+    
+    for country in ("Brazl", "bra"):
+        response_cache.clear()
+        assert client.get(f"/national/yearly?country={country}").status_code == 200
+        query = mock_db.execute.call_args[0][0]
+        assert "brazil" in query.compile().params.values()
@@ -0,0 +1,58 @@
+import asyncio
+from unittest import mock
+
+import httpx
+import pytest
+
+import benchmark
+import columnar
+import main
+import synthetic_data
+
+@pytest.fixture
+def store(tmp_path):
+    """A columnar store of a small synthetic release"""
+    synthetic_data.generate(str(tmp_path), 2000, regions=2, report=lambda message: None)
+    columnar.convert(str(tmp_path), str(tmp_path / "columnar"), report=lambda message: None)
+    return columnar.ColumnarStore(str(tmp_path / "columnar"))
+
+def test_summarize_reports_percentiles():
+    """Percentiles are in milliseconds and statement time is averaged per request"""
+    result = benchmark.summarize([i / 1000 for i in range(1, 101)], elapsed=2.0, db_seconds=0.5)
+    assert result["requests"] == 100
+    assert result["p50_ms"] == pytest.approx(50.5)
+    assert result["p99_ms"] == pytest.approx(99.01)
+    assert result["throughput"] == 50.0
+    assert result["db_ms"] == 5.0
+    assert benchmark.summarize([], elapsed=1.0)["p95_ms"] is None
+
+def test_compare_flags_regressions_beyond_tolerance():
+    """Small or sub-millisecond slowdowns pass, larger ones and new errors are reported"""
+    baseline = {"stats": benchmark.summarize([0.010] * 10, 1.0), "tiny": benchmark.summarize([0.0001] * 10, 1.0)}
+    assert benchmark.compare({"stats": benchmark.summarize([0.011] * 10, 1.0)}, baseline) == []
+    assert benchmark.compare({"tiny": benchmark.summarize([0.0005] * 10, 1.0)}, baseline) == []
+
+    regressions = benchmark.compare({"stats": benchmark.summarize([0.020] * 10, 1.0, errors=1)}, baseline)
+    assert regressions == [
+        "stats: p50_ms 10.0 -> 20.0", "stats: p95_ms 10.0 -> 20.0", "stats: p99_ms 10.0 -> 20.0",
+        "stats: errors 0 -> 1",
+    ]
+
+def test_micro_and_load_run_on_columnar_backend(store):
+    """Every micro benchmark and load profile request succeeds against a synthetic release"""
+    main.stats_cache.clear()
+    main.response_cache.clear()
+    with mock.patch("repository.DATA_BACKEND", "columnar"), \
+            mock.patch("columnar.get_store", return_value=store):
+        micro = benchmark.run_micro(iterations=2, warmup=0)
+
+        async def replay():
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://api") as client:
+                return await benchmark.run_load(client, "endpoints", ["COUNTRY 00000"], concurrency=2, max_requests=20)
+        load = asyncio.run(replay())
+    main.stats_cache.clear()
+    main.response_cache.clear()
+
+    assert set(micro) == set(benchmark.MICRO_BENCHMARKS)
+    assert all(result["errors"] == 0 and result["db_ms"] is None for result in micro.values())
+    assert load["all"]["requests"] == 20 and load["all"]["errors"] == 0
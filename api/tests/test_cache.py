@@ -0,0 +1,175 @@
+import asyncio
+from datetime import date
+
+import pytest
+
+import cache
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def test_cache_key_normalizes_parameters():
+    """Keys ignore parameter order, unset values and country case"""
+    key = cache.cache_key("spatial/regions", {"limit": 20, "country": " Brazil ", "year": None})
+    assert key == cache.cache_key("spatial/regions", {"country": "BRAZIL", "limit": 20})
+    assert key == "spatial/regions?country=brazil&limit=20"
+    assert cache.cache_key("temporal/data", {"start_date": date(2020, 1, 1)}) == "temporal/data?start_date=2020-01-01"
+
+def test_cache_key_changes_with_data_version():
+    """Results cached at one data version are not found at another"""
+    key = cache.cache_key("national/yearly", {"country": "Brazil"}, (10, 2, 1700000000.0))
+    assert key == cache.cache_key("national/yearly", {"country": "brazil"}, (10, 2, 1700000000.0))
+    assert key != cache.cache_key("national/yearly", {"country": "brazil"}, (11, 3, 1700000600.0))
+    assert key.startswith("national/yearly@") and key.endswith("?country=brazil")
+
+def test_lru_backend_evicts_least_recently_used():
+    """The LRU backend keeps at most max_entries, dropping the least recently read"""
+    backend = cache.LRUCacheBackend(max_entries=2, ttl_seconds=60)
+    backend.set("a", 1)
+    backend.set("b", 2)
+    assert backend.get("a") == 1
+    backend.set("c", 3)
+
+    assert backend.get("b") is cache.MISSING
+    assert backend.get("a") == 1
+    assert backend.get("c") == 3
+    assert len(backend) == 2
+
+def test_lru_backend_expires_entries():
+    """Entries older than the TTL are treated as misses"""
+    clock = FakeClock()
+    backend = cache.LRUCacheBackend(max_entries=10, ttl_seconds=30, clock=clock)
+    backend.set("a", [1, 2])
+    clock.now = 29
+    assert backend.get("a") == [1, 2]
+    clock.now = 30
+    assert backend.get("a") is cache.MISSING
+
+def test_empty_and_none_results_are_cached():
+    """Empty and None results are stored like any other, not recomputed on every request"""
+    computed = []
+    for backend in (cache.LRUCacheBackend(), cache.SharedCacheBackend(cache.InProcessStore())):
+        response_cache = cache.ResponseCache(backend)
+        for value in (None, []):
+            for _ in range(2):
+                assert response_cache.get_or_compute("national/yearly", {"value": repr(value)},
+                                                     lambda: computed.append(value) or value) == value
+    assert computed == [None, [], None, []]
+    with pytest.raises(TypeError):
+        cache.CacheBackend()
+
+def test_shared_backend_is_called_off_the_event_loop():
+    """Blocking shared-store calls run in a worker thread on the async path"""
+    import threading
+
+    threads = []
+
+    class RecordingStore(cache.InProcessStore):
+        def get(self, key):
+            threads.append(threading.current_thread())
+            return super().get(key)
+
+        def set(self, key, value, ex=None):
+            threads.append(threading.current_thread())
+            super().set(key, value, ex)
+
+    response_cache = cache.ResponseCache(cache.SharedCacheBackend(RecordingStore()))
+
+    async def compute():
+        return []
+
+    assert asyncio.run(response_cache.get_or_compute_async("national/yearly", {}, compute)) == []
+    assert len(threads) == 2 and threading.main_thread() not in threads
+
+def test_shared_backend_with_in_process_store():
+    """Two caches on the same shared store see each other's entries"""
+    clock = FakeClock()
+    store = cache.InProcessStore(clock=clock)
+    first = cache.ResponseCache(cache.SharedCacheBackend(store, ttl_seconds=10))
+    second = cache.ResponseCache(cache.SharedCacheBackend(store, ttl_seconds=10))
+
+    assert first.get_or_compute("national/yearly", {"country": "Brazil"}, lambda: [{"year": 2020}]) == [{"year": 2020}]
+    assert second.get_or_compute("national/yearly", {"country": "brazil"}, lambda: []) == [{"year": 2020}]
+    assert first.stats()["misses"] == 1
+    assert second.stats()["hits"] == 1
+
+    clock.now = 10
+    assert second.get_or_compute("national/yearly", {"country": "brazil"}, lambda: []) == []
+
+    second.clear()
+    assert store.scan_iter(match="dengue-api:*") == []
+
+def test_concurrent_misses_share_one_computation():
+    """Identical requests arriving together run one query; other parameters run their own"""
+    response_cache = cache.ResponseCache(cache.NullCacheBackend())
+    calls = []
+
+    async def main():
+        release = asyncio.Event()
+
+        async def compute(country):
+            calls.append(country)
+            await release.wait()
+            return [{"country": country}]
+
+        requests = [
+            asyncio.ensure_future(response_cache.get_or_compute_async(
+                "national/yearly", {"country": country}, lambda country=country: compute(country)
+            ))
+            for country in ("Brazil", "brazil", "BRAZIL", "Peru")
+        ]
+        await asyncio.sleep(0)
+        assert response_cache.stats()["in_flight"] == 2
+        release.set()
+        return await asyncio.gather(*requests)
+
+    results = asyncio.run(main())
+    assert calls == ["Brazil", "Peru"]
+    assert results[0] is results[1] is results[2]
+    assert results[3] == [{"country": "Peru"}]
+    assert response_cache.stats()["coalesced"] == 2
+    assert response_cache.stats()["in_flight"] == 0
+
+def test_coalesced_requests_share_errors_and_survive_cancellation():
+    """A failed computation fails every waiting request, and one request going away does not cancel it for the others"""
+    response_cache = cache.ResponseCache(cache.NullCacheBackend())
+
+    async def main():
+        release = asyncio.Event()
+
+        async def compute():
+            await release.wait()
+            raise RuntimeError("statement timeout")
+
+        first = asyncio.ensure_future(response_cache.get_or_compute_async("national/stats", {}, compute))
+        second = asyncio.ensure_future(response_cache.get_or_compute_async("national/stats", {}, compute))
+        await asyncio.sleep(0)
+        first.cancel()
+        release.set()
+        with pytest.raises(RuntimeError, match="statement timeout"):
+            await second
+        assert first.cancelled()
+
+    asyncio.run(main())
+    assert response_cache.stats()["in_flight"] == 0
+
+def test_snapshot_cache_reloads_on_new_version():
+    """Snapshots are recomputed only after the dataset version changes"""
+    versions = [1]
+    snapshots = cache.SnapshotCache(lambda db: versions[-1], version_check_seconds=0)
+    computed = []
+
+    def compute(db):
+        computed.append(versions[-1])
+        return {"version": versions[-1]}
+
+    assert snapshots.get_or_compute("stats", None, compute) == {"version": 1}
+    assert snapshots.get_or_compute("stats", None, compute) == {"version": 1}
+    versions.append(2)
+    assert snapshots.get_or_compute("stats", None, compute) == {"version": 2}
+    assert computed == [1, 2]
+    assert snapshots.stats()["hits"] == 1
@@ -0,0 +1,200 @@
+from datetime import date
+from unittest import mock
+
+import pytest
+from fastapi.testclient import TestClient
+
+import columnar
+import main
+import pagination
+import queries
+
+HEADER = ",".join(columnar.database.SOURCE_COLUMNS)
+
+def extract_row(country, iso, region, start, end, year, total, t_res="Week", s_res="Admin0"):
+    """One CSV line of an OpenDengue extract"""
+    return (
+        f'"{country}",{region or "NA"},NA,"{country}",{iso},NA,{iso},NA,'
+        f'{start},{end},{year},{total},Suspected,{s_res},{t_res},"{iso}-{start}"'
+    )
+
+@pytest.fixture
+def store(tmp_path):
+    """A store converted from small extracts"""
+    national = [
+        extract_row("PANAMA", "PAN", None, "2020-01-01", "2020-12-31", 2020, 30, "Year"),
+        extract_row("PANAMA", "PAN", None, "2021-01-01", "2021-12-31", 2021, 20, "Year"),
+        extract_row("BRAZIL", "BRA", None, "2020-01-01", "2020-12-31", 2020, 100, "Year"),
+        # A later release of the same BRAZIL 2020 row replaces it
+        extract_row("BRAZIL", "BRA", None, "2020-01-01", "2020-12-31", 2020, 150, "Year"),
+        extract_row("CHILE", "CHL", None, "2021-01-01", "2021-12-31", 2021, 5, "Year"),
+        extract_row("CHILE", "CHL", None, "2022-01-01", "2022-12-31", 2022, "NA", "Year"),
+    ]
+    spatial = [
+        extract_row("BRAZIL", "BRA", "ACRE", "2020-01-01", "2020-12-31", 2020, 40, "Year", "Admin1"),
+        extract_row("BRAZIL", "BRA", "BAHIA", "2020-01-01", "2020-12-31", 2020, 40, "Year", "Admin1"),
+        extract_row("BRAZIL", "BRA", "CEARA", "2020-01-01", "2020-12-31", 2020, 70, "Year", "Admin1"),
+        extract_row("BRAZIL", "BRA", "CEARA", "2021-01-01", "2021-12-31", 2021, 5, "Year", "Admin1"),
+        extract_row("PANAMA", "PAN", None, "2020-01-01", "2020-12-31", 2020, 30, "Year"),
+    ]
+    temporal = [
+        extract_row("BRAZIL", "BRA", None, f"2020-{month:02d}-01", f"2020-{month:02d}-28", 2020, month * 10, "Month")
+        for month in range(1, 13)
+    ] + [
+        extract_row("BRAZIL", "BRA", None, "2021-01-03", "2021-01-09", 2021, 7),
+        extract_row("BRAZIL", "BRA", None, "2021-01-10", "2021-01-16", 2021, 8),
+    ]
+    for filename, rows in zip(
+        ("National_extract_V1_2_2.csv", "Spatial_extract_V1_2_2.csv", "Temporal_extract_V1_2_2.csv"),
+        (national, spatial, temporal)
+    ):
+        (tmp_path / filename).write_text("\n".join([HEADER] + rows) + "\n")
+
+    columnar.convert(str(tmp_path), str(tmp_path / "columnar"), report=lambda message: None)
+    return columnar.ColumnarStore(str(tmp_path / "columnar"))
+
+def test_convert_deduplicates_and_keeps_quoted_names(store):
+    """Later rows replace earlier ones with the same key, and quoted names containing NA survive"""
+    national = store.tables["national_data"]
+    assert national.num_rows == 5
+    assert national.values("adm_0_name") == ["PANAMA", "PANAMA", "BRAZIL", "CHILE", "CHILE"]
+    assert national.values("id") == [1, 2, 4, 5, 6]
+    assert national.values("dengue_total") == [30.0, 20.0, 150.0, 5.0, None]
+    assert national.values("fao_gaul_code") == [None] * 5
+    assert national.values("calendar_start_date")[0] == date(2020, 1, 1)
+
+def test_national_queries(store):
+    """Aggregates skip NULL case counts like SQL"""
+    assert columnar.national_stats(store) == {
+        "total_records": 5, "total_cases": 205.0, "countries_count": 3, "year_range": [2020, 2021, 2022]
+    }
+    assert columnar.top_countries(store, 2) == [
+        {"country": "BRAZIL", "total_cases": 150.0},
+        {"country": "PANAMA", "total_cases": 50.0},
+    ]
+    assert columnar.yearly_totals(store, "pan") == [
+        {"year": 2020, "total_cases": 30.0},
+        {"year": 2021, "total_cases": 20.0},
+    ]
+    assert columnar.resolve_country_key(store, " Brazil ") == "brazil"
+
+def test_regional_totals_pages_with_cursor(store):
+    """Regions are ranked by total then name, and the cursor continues after ties"""
+    first = columnar.regional_totals(store, "Brazil", None, 2)
+    assert [row["region"] for row in first["data"]] == ["CEARA", "ACRE"]
+
+    after = pagination.decode_cursor(first["next_cursor"], queries.REGIONAL_CURSOR)
+    second = columnar.regional_totals(store, "Brazil", None, 2, after)
+    assert second == {"data": [{"country": "BRAZIL", "region": "BAHIA", "total_cases": 40.0}], "next_cursor": None}
+    assert columnar.regional_totals(store, None, 2021)["data"] == [
+        {"country": "BRAZIL", "region": "CEARA", "total_cases": 5.0}
+    ]
+
+def test_temporal_records_filter_and_page(store):
+    """Records are filtered by dates and paged by (start date, id)"""
+    page = columnar.temporal_records(store, "BRA", date(2020, 11, 1), None, 2)
+    assert [row["start_date"] for row in page["data"]] == [date(2020, 11, 1), date(2020, 12, 1)]
+
+    after = pagination.decode_cursor(page["next_cursor"], queries.TEMPORAL_CURSOR)
+    rest = columnar.temporal_records(store, "BRA", date(2020, 11, 1), None, 5, after)
+    assert [row["dengue_cases"] for row in rest["data"]] == [7.0, 8.0]
+    assert rest["next_cursor"] is None
+
+def test_temporal_series_resamples_records(store):
+    """Monthly rows are summed into years, and weekly rows prorated into months"""
+    yearly = columnar.temporal_series(store, "BRA", "year")["data"]
+    assert [(row["year"], row["dengue_cases"]) for row in yearly] == [(2020, 780.0), (2021, 15.0)]
+
+    monthly = columnar.temporal_series(store, "BRA", "month", start_date=date(2021, 1, 1))["data"]
+    assert [(row["start_date"], row["dengue_cases"]) for row in monthly] == [(date(2021, 1, 1), 15.0)]
+
+def test_name_rows_list_countries_and_regions(store):
+    """Countries with their ISO3 codes and the regions of the spatial table, for the name index"""
+    rows = columnar.name_rows(store)
+    assert sorted(row for row in rows if row[3] is None) == [
+        ("brazil", "BRAZIL", "BRA", None), ("chile", "CHILE", "CHL", None), ("panama", "PANAMA", "PAN", None)
+    ]
+    assert sorted(row[3] for row in rows if row[3] is not None) == ["ACRE", "BAHIA", "CEARA"]
+
+def test_aggregate_groups_like_sql(store):
+    """Groups are ordered by their dimensions with NULL last, and metrics skip NULL totals"""
+    result = columnar.aggregate(store, "national", ["country"], ["sum", "count", "min", "max", "mean"])
+    assert result["groups"] == [
+        {"country": "BRAZIL", "sum": 150.0, "count": 1, "min": 150.0, "max": 150.0, "mean": 150.0},
+        {"country": "CHILE", "sum": 5.0, "count": 2, "min": 5.0, "max": 5.0, "mean": 5.0},
+        {"country": "PANAMA", "sum": 50.0, "count": 2, "min": 20.0, "max": 30.0, "mean": 25.0},
+    ]
+    regions = columnar.aggregate(store, "spatial", ["region", "year"], ["sum"], country="BRA", start_year=2021)
+    assert regions["groups"] == [{"region": "CEARA", "year": 2021, "sum": 5.0}]
+    assert columnar.aggregate(store, "spatial", ["region"], ["count"], limit=2)["groups"] == [
+        {"region": "ACRE", "count": 1}, {"region": "BAHIA", "count": 1}
+    ]
+    assert columnar.aggregate(store, "temporal", [], ["sum"], t_res="Week")["groups"] == [{"sum": 15.0}]
+    assert columnar.aggregate(store, "national", ["year"], ["sum"], country="Chile", start_year=2022)["groups"] == [
+        {"year": 2022, "sum": None}
+    ]
+
+def test_load_series_builds_forecasting_panel(store):
+    """Monthly series are grouped by the resolution each series reports most"""
+    panel = columnar.load_series(store)
+    assert panel.keys == [("brazil", None)]
+    assert panel.names == {("brazil", None): ("BRAZIL", None)}
+    assert panel.values[0, -1] == 120.0
+
+def test_api_serves_columnar_backend(store):
+    """The endpoints run unchanged on the columnar backend"""
+    client = TestClient(main.app)
+    main.stats_cache.clear()
+    main.response_cache.clear()
+    main.name_index_cache.clear()
+    with mock.patch("repository.DATA_BACKEND", "columnar"), \
+            mock.patch("columnar.get_store", return_value=store):
+        assert client.get("/ready").json()["status"] == "ready"
+        assert client.get("/search?q=cea").json()["data"][0]["name"] == "CEARA"
+        assert client.get("/national/yearly?country=Panamaa").json()["data"] == [
+            {"year": 2020, "total_cases": 30.0}, {"year": 2021, "total_cases": 20.0}
+        ]
+        assert client.get("/national/stats").json()["data"]["total_cases"] == 205.0
+        assert client.get("/aggregate?group_by=year&metrics=sum,count").json()["data"]["groups"][-1] == {
+            "year": 2022, "sum": None, "count": 1
+        }
+        assert client.get("/national/countries?limit=1").json()["data"] == [{"country": "BRAZIL", "total_cases": 150.0}]
+        dashboard = client.get("/dashboard/country/PAN").json()["data"]
+        export = client.get("/export/temporal?country=BRA&start_date=2021-01-01")
+    main.stats_cache.clear()
+    main.response_cache.clear()
+    main.name_index_cache.clear()
+
+    assert dashboard["yearly"] == [{"year": 2020, "total_cases": 30.0}, {"year": 2021, "total_cases": 20.0}]
+    assert dashboard["regions"] == {"data": [], "next_cursor": None}
+    assert export.status_code == 200
+    lines = export.text.splitlines()
+    assert lines[0].startswith("adm_0_name,adm_1_name")
+    assert len(lines) == 3 and ",2021-01-03,2021-01-09,2021,7.0," in lines[1]
+
+def test_regional_totals_page_past_regions_without_totals(tmp_path):
+    """Regions without any case count sort last and are reached by the cursor, as in PostgreSQL"""
+    spatial = [
+        extract_row("BRAZIL", "BRA", "ACRE", "2020-01-01", "2020-12-31", 2020, 40, "Year", "Admin1"),
+        extract_row("BRAZIL", "BRA", "AMAPA", "2020-01-01", "2020-12-31", 2020, "NA", "Year", "Admin1"),
+        extract_row("BRAZIL", "BRA", "BAHIA", "2020-01-01", "2020-12-31", 2020, 70, "Year", "Admin1"),
+        extract_row("BRAZIL", "BRA", "CEARA", "2020-01-01", "2020-12-31", 2020, "NA", "Year", "Admin1"),
+    ]
+    national = [extract_row("BRAZIL", "BRA", None, "2020-01-01", "2020-12-31", 2020, 110, "Year")]
+    for filename, rows in zip(
+        ("National_extract_V1_2_2.csv", "Spatial_extract_V1_2_2.csv", "Temporal_extract_V1_2_2.csv"),
+        (national, spatial, national)
+    ):
+        (tmp_path / filename).write_text("\n".join([HEADER] + rows) + "\n")
+    columnar.convert(str(tmp_path), str(tmp_path / "columnar"), report=lambda message: None)
+    store = columnar.ColumnarStore(str(tmp_path / "columnar"))
+
+    regions, after = [], None
+    while True:
+        result = columnar.regional_totals(store, "Brazil", None, 1, after)
+        regions += [(row["region"], row["total_cases"]) for row in result["data"]]
+        if result["next_cursor"] is None:
+            break
+        after = pagination.decode_cursor(result["next_cursor"], queries.REGIONAL_CURSOR)
+
+    assert regions == [("BAHIA", 70.0), ("ACRE", 40.0), ("AMAPA", None), ("CEARA", None)]
@@ -0,0 +1,57 @@
+import gzip
+from unittest import mock
+
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+import compression
+
+app = FastAPI()
+app.add_middleware(compression.CompressionMiddleware, minimum_size=100)
+
+@app.get("/small")
+def small():
+    return PlainTextResponse("x" * 50)
+
+@app.get("/large")
+def large():
+    return PlainTextResponse("x" * 5000)
+
+@app.get("/stream")
+def stream():
+    return StreamingResponse(iter([b"a" * 300, b"b" * 300]), media_type="text/plain")
+
+client = TestClient(app)
+
+def test_choose_encoding_respects_quality_values():
+    """Brotli is preferred when available, and encodings with q=0 are refused"""
+    with mock.patch.dict(compression.COMPRESSORS, {"br": object}):
+        assert compression.choose_encoding("gzip, deflate, br") == "br"
+        assert compression.choose_encoding("br;q=0, gzip") == "gzip"
+        assert compression.choose_encoding("*") == "br"
+    with mock.patch.dict(compression.COMPRESSORS, {"gzip": compression.GzipCompressor}, clear=True):
+        assert compression.choose_encoding("gzip, br") == "gzip"
+    assert compression.choose_encoding("identity") is None
+    assert compression.choose_encoding("gzip;q=0") is None
+
+def test_compresses_responses_above_minimum_size():
+    """Small responses are sent as they are, larger ones compressed with a matching Content-Length"""
+    response = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+
+    response = client.get("/large", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert int(response.headers["content-length"]) < 5000
+    assert response.text == "x" * 5000
+
+    assert "content-encoding" not in client.get("/large", headers={"Accept-Encoding": "identity"}).headers
+
+def test_compresses_streams_chunk_by_chunk():
+    """Streamed responses are compressed without a Content-Length, each chunk decodable as it arrives"""
+    with client.stream("GET", "/stream", headers={"Accept-Encoding": "gzip"}) as response:
+        assert response.headers["content-encoding"] == "gzip"
+        assert "content-length" not in response.headers
+        raw = b"".join(response.iter_raw())
+    assert gzip.decompress(raw) == b"a" * 300 + b"b" * 300
@@ -0,0 +1,43 @@
+from types import SimpleNamespace
+from unittest import mock
+
+import detect_outbreaks
+
+def test_changed_series_rescans_everything_after_deletions():
+    """The first run, and runs after imports that deleted rows, rescan every series"""
+    mock_db = mock.MagicMock()
+    assert detect_outbreaks.changed_series(mock_db, "temporal", None, (100, 2)) is None
+
+    status = SimpleNamespace(source_max_id=80, source_generation=1)
+    mock_db.execute.return_value.scalar.return_value = 5
+    assert detect_outbreaks.changed_series(mock_db, "temporal", status, (100, 2)) is None
+
+def test_changed_series_lists_series_of_appended_rows():
+    """Imports that only appended rows rescan the series of the new rows"""
+    mock_db = mock.MagicMock()
+    mock_db.execute.return_value.scalar.return_value = 0
+    mock_db.execute.return_value.all.return_value = [("brazil", None), ("peru", "lima")]
+    status = SimpleNamespace(source_max_id=80, source_generation=1)
+
+    keys = detect_outbreaks.changed_series(mock_db, "spatial", status, (100, 2))
+    assert keys == [("brazil", None), ("peru", "lima")]
+
+def test_write_alerts_replaces_alerts_and_status():
+    """Stale alerts are deleted, new ones inserted and the source version recorded in one transaction"""
+    mock_db = mock.MagicMock()
+    records = [{"country_key": "brazil", "method": "endemic_channel"}]
+
+    detect_outbreaks.write_alerts(mock_db, "temporal", records, [("brazil", None)], (31032, 4))
+    assert mock_db.execute.call_count == 4
+    assert records[0]["detected_at"] is not None
+    mock_db.commit.assert_called_once()
+
+def test_detect_source_skips_up_to_date_tables():
+    """Nothing is read or written when the source version matches the last run"""
+    mock_db = mock.MagicMock()
+    with mock.patch("queries.dataset_version", return_value=(100, 2)):
+        mock_db.execute.return_value.first.return_value = SimpleNamespace(source_max_id=100, source_generation=2)
+        messages = []
+        assert detect_outbreaks.detect_source(mock_db, "temporal", report=messages.append) == 0
+    assert messages == ["temporal: alerts are up to date"]
+    mock_db.commit.assert_not_called()
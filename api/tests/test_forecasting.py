@@ -0,0 +1,105 @@
+from collections import namedtuple
+from datetime import date
+
+import numpy as np
+
+import forecasting
+
+Row = namedtuple("Row", "country_key region_key country region t_res month total")
+
+SEASONAL_PATTERN = [10, 12, 20, 40, 80, 120, 90, 50, 30, 20, 15, 10]
+
+def make_rows(country="Brazil", region=None, years=(2019, 2020, 2021), t_res="Month", scale=1.0):
+    region_key = region.lower() if region else None
+    return [
+        Row(country.lower(), region_key, country.upper(), region, t_res,
+            date(year, month, 1), scale * SEASONAL_PATTERN[month - 1])
+        for year in years
+        for month in range(1, 13)
+    ]
+
+def test_build_panel_right_aligns_series():
+    """Each series ends in the last column, with earlier unobserved months left as NaN"""
+    rows = make_rows() + make_rows("Peru", years=(2020,))
+    panel = forecasting.build_panel(rows)
+
+    assert panel.keys == [("brazil", None), ("peru", None)]
+    assert panel.values.shape == (2, forecasting.MAX_HISTORY_MONTHS)
+    assert panel.values[0, -1] == 10
+    assert np.isnan(panel.values[1, :-12]).all()
+    assert str(panel.last_month[1]) == "2020-12"
+
+def test_build_panel_keeps_most_frequent_resolution():
+    """Rows at a series' less frequent resolution are dropped rather than double counted"""
+    rows = make_rows() + make_rows(years=(2021,), t_res="Week", scale=100)
+    panel = forecasting.build_panel(rows)
+
+    assert len(panel.keys) == 1
+    assert np.nanmax(panel.values) == 120
+
+def test_seasonal_naive_repeats_last_season():
+    """The seasonal naive forecast repeats the last observed year"""
+    fitted = forecasting.fit_panel(forecasting.build_panel(make_rows()))
+    point, lower, upper = forecasting.forecast_panel(fitted, 12, "seasonal_naive")
+
+    assert point[0].tolist() == SEASONAL_PATTERN
+    assert (lower <= point).all() and (point <= upper).all()
+
+def test_regression_recovers_seasonality():
+    """The seasonal regression follows a stable seasonal pattern"""
+    fitted = forecasting.fit_panel(forecasting.build_panel(make_rows()))
+    point, _, _ = forecasting.forecast_panel(fitted, 12, "seasonal_regression")
+
+    np.testing.assert_allclose(point[0], SEASONAL_PATTERN, rtol=0.01)
+
+def test_predict_formats_periods_and_handles_unknown_series():
+    """Forecasts are labelled by month and unknown series return None"""
+    rows = make_rows() + make_rows(region="Acre", scale=0.1)
+    fitted = forecasting.fit_panel(forecasting.build_panel(rows))
+
+    prediction = forecasting.predict(fitted, ("brazil", "acre"), 3)
+    assert prediction["region"] == "Acre"
+    assert prediction["model"] in forecasting.MODELS
+    assert prediction["history_end"] == "2021-12"
+    assert [f["period"] for f in prediction["forecasts"]] == ["2022-01", "2022-02", "2022-03"]
+    assert forecasting.predict(fitted, ("chile", None), 3) is None
+
+def test_stored_models_forecast_like_the_fitted_panel():
+    """Forecasts from the stored parameters of a series match those of the fitted panel"""
+    import train_models
+
+    panel = forecasting.build_panel(make_rows() + make_rows(region="Acre", scale=0.1))
+    fitted = forecasting.fit_panel(panel)
+    records = train_models.train_chunk(panel, horizon=6, folds=2, step=3)
+    stored = forecasting.stored_models([record for record in records if record["region_key"] == "acre"])
+
+    for model in forecasting.MODELS + ("auto",):
+        expected = forecasting.predict(fitted, ("brazil", "acre"), 6, model)
+        actual = forecasting.predict(stored, ("brazil", "acre"), 6, model)
+        if model == "auto":
+            # The stored choice is the backtest winner rather than the in-sample one
+            assert actual["model"] in forecasting.MODELS
+            continue
+        assert actual["history_end"] == expected["history_end"] == "2021-12"
+        np.testing.assert_allclose(
+            [f["forecast"] for f in actual["forecasts"]], [f["forecast"] for f in expected["forecasts"]]
+        )
+
+def test_backtest_scores_each_model():
+    """Rolling-origin backtests score every fold and find seasonal models accurate on seasonal data"""
+    panel = forecasting.build_panel(make_rows(years=(2017, 2018, 2019, 2020, 2021)))
+    metrics = forecasting.backtest_panel(panel, horizon=6, folds=3, step=2)
+
+    assert set(metrics) == set(forecasting.MODELS)
+    assert metrics["seasonal_naive"]["points"][0] == 18
+    assert metrics["seasonal_naive"]["mae"][0] == 0
+    assert metrics["seasonal_naive"]["coverage"][0] == 1
+    assert metrics["exponential_smoothing"]["mape"][0] > metrics["seasonal_regression"]["mape"][0]
+
+def test_backtest_skips_short_series():
+    """Series without a season of history at the backtest origin are not scored"""
+    panel = forecasting.build_panel(make_rows("Peru", years=(2021,)))
+    metrics = forecasting.backtest_panel(panel, horizon=6, folds=2, step=3)
+
+    assert metrics["seasonal_naive"]["points"][0] == 0
+    assert np.isnan(metrics["seasonal_naive"]["mae"][0])
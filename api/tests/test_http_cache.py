@@ -0,0 +1,34 @@
+import http_cache
+
+VERSION = (31032, 4, 93096, 4, 31032, 4, 1700000000.0)
+
+def test_validators_depend_on_version_and_normalized_parameters():
+    """ETags ignore parameter order and country case, and change with the data version"""
+    headers = http_cache.validators(VERSION, "/spatial/regions", {"country": "Brazil", "limit": "20"})
+    assert headers == http_cache.validators(VERSION, "/spatial/regions", {"limit": "20", "country": " BRAZIL"})
+    assert headers["ETag"].startswith('W/"')
+    assert headers["Last-Modified"] == "Tue, 14 Nov 2023 22:13:20 GMT"
+    assert headers["Cache-Control"] == http_cache.DEFAULT_CACHE_CONTROL
+
+    reimported = VERSION[:1] + (5,) + VERSION[2:]
+    assert http_cache.validators(reimported, "/spatial/regions", {"country": "Brazil", "limit": "20"}) != headers
+    assert "Last-Modified" not in http_cache.validators(VERSION[:-1] + (None,), "/spatial/regions", {})
+
+def test_is_not_modified_prefers_if_none_match():
+    """If-None-Match is compared weakly and overrides If-Modified-Since"""
+    headers = http_cache.validators(VERSION, "/national/stats", {})
+    etag = headers["ETag"]
+    assert http_cache.is_not_modified({"if-none-match": etag}, headers)
+    assert http_cache.is_not_modified({"if-none-match": f'"other", {etag[2:]}'}, headers)
+    assert http_cache.is_not_modified({"if-none-match": "*"}, headers)
+    assert not http_cache.is_not_modified(
+        {"if-none-match": '"other"', "if-modified-since": headers["Last-Modified"]}, headers
+    )
+
+def test_is_not_modified_since():
+    """If-Modified-Since matches copies as new as the last import, and ignores malformed dates"""
+    headers = http_cache.validators(VERSION, "/national/stats", {})
+    assert http_cache.is_not_modified({"if-modified-since": "Wed, 15 Nov 2023 00:00:00 GMT"}, headers)
+    assert not http_cache.is_not_modified({"if-modified-since": "Mon, 13 Nov 2023 00:00:00 GMT"}, headers)
+    assert not http_cache.is_not_modified({"if-modified-since": "yesterday"}, headers)
+    assert not http_cache.is_not_modified({}, headers)
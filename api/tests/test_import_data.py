@@ -0,0 +1,211 @@
+import argparse
+import io
+import zipfile
+from unittest import mock
+
+import pytest
+
+import import_data
+
+def test_copy_sql_maps_unquoted_na_to_null():
+    """COPY treats only unquoted NA fields as NULL, leaving names like PANAMA intact"""
+    sql = import_data.copy_sql("temporal_data")
+
+    assert sql.startswith("COPY temporal_data (adm_0_name, adm_1_name,")
+    assert "FROM STDIN WITH (FORMAT csv, HEADER true, NULL 'NA')" in sql
+
+def test_copy_sql_filters_years():
+    """Year reloads COPY only the rows of the requested years"""
+    sql = import_data.copy_sql("spatial_data", [2019, 2020])
+
+    assert sql.endswith("NULL 'NA') WHERE year IN (2019, 2020)")
+    assert import_data.parse_years("2020, 2019,2020") == [2019, 2020]
+    with pytest.raises(argparse.ArgumentTypeError):
+        import_data.parse_years("2019,twenty")
+
+def test_secondary_indexes_recreate_on_every_partition():
+    """Partitioned index definitions are rebuilt on the partitions as well as the parent"""
+    cursor = mock.MagicMock()
+    cursor.fetchall.return_value = [
+        ("public.spatial_data_row_hash_idx", "CREATE INDEX spatial_data_row_hash_idx ON ONLY public.spatial_data USING btree (row_hash)")
+    ]
+
+    assert import_data.secondary_indexes(cursor, "spatial_data") == [
+        ("public.spatial_data_row_hash_idx", "CREATE INDEX spatial_data_row_hash_idx ON public.spatial_data USING btree (row_hash)")
+    ]
+
+def test_find_extract_prefers_csv_over_zip(tmp_path):
+    """The plain CSV is used when present, otherwise its zip archive"""
+    (tmp_path / "National_extract_V1_2_2.csv.zip").write_bytes(b"")
+    assert import_data.find_extract(str(tmp_path), "National_extract_V1_2_2.csv").endswith(".zip")
+
+    (tmp_path / "National_extract_V1_2_2.csv").write_bytes(b"")
+    assert import_data.find_extract(str(tmp_path), "National_extract_V1_2_2.csv").endswith(".csv")
+    assert import_data.find_extract(str(tmp_path), "Spatial_extract_V1_2_2.csv") is None
+
+def test_open_extract_reads_csv_inside_zip(tmp_path):
+    """Zip archives are read in place, ignoring macOS metadata entries"""
+    path = tmp_path / "National_extract_V1_2_2.csv.zip"
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("National_extract_V1_2_2.csv", 'adm_0_name\n"PANAMA"\n')
+        archive.writestr("__MACOSX/._National_extract_V1_2_2.csv", "metadata")
+
+    with import_data.open_extract(str(path)) as extract:
+        assert extract.read() == b'adm_0_name\n"PANAMA"\n'
+
+def test_progress_reader_reports_rows_per_second():
+    """Rows read are counted, excluding the header, and reported once per interval"""
+    clock = mock.Mock(side_effect=[0.0, 1.0, 3.0])
+    messages = []
+    reader = import_data.ProgressReader(
+        io.BytesIO(b"header\n1\n2\n3\n4\n"), "temporal_data", messages.append, clock, interval=2
+    )
+
+    assert reader.read(4) == b"head"
+    assert reader.read(100) == b"er\n1\n2\n3\n4\n"
+    assert messages == ["temporal_data: 4 rows (1 rows/s)"]
+
+def test_load_table_rebuilds_indexes_after_copy(tmp_path):
+    """Secondary indexes are dropped before COPY and recreated before the commit"""
+    path = tmp_path / "Temporal_extract_V1_2_2.csv"
+    path.write_bytes(b"header\nrow\n")
+    connection = mock.MagicMock()
+    cursor = connection.cursor.return_value
+    cursor.fetchall.return_value = [
+        ("public.temporal_data_t_res_idx", "CREATE INDEX temporal_data_t_res_idx ON public.temporal_data USING btree (t_res)")
+    ]
+    cursor.rowcount = 1
+
+    with mock.patch("import_data.database.engine") as engine:
+        engine.raw_connection.return_value = connection
+        assert import_data.load_table("temporal_data", str(path), 7, "full", report=lambda message: None) == (1, 0)
+
+    statements = [call.args[0] for call in cursor.execute.call_args_list]
+    drop = statements.index("DROP INDEX public.temporal_data_t_res_idx")
+    create = statements.index("CREATE INDEX temporal_data_t_res_idx ON public.temporal_data USING btree (t_res)")
+    assert drop < create
+    cursor.copy_expert.assert_called_once()
+    assert cursor.execute.call_args_list[-2].args[1] == (7, "temporal_data", "full", 1, 0)
+    connection.commit.assert_called_once()
+
+def test_load_table_synchronizes_non_empty_tables(tmp_path):
+    """Tables holding data are synchronized through a staging table by row hash"""
+    path = tmp_path / "National_extract_V1_2_2.csv"
+    path.write_bytes(b"header\nrow\n")
+    connection = mock.MagicMock()
+    cursor = connection.cursor.return_value
+    cursor.fetchone.return_value = (True,)
+    cursor.rowcount = 3
+
+    with mock.patch("import_data.database.engine") as engine:
+        engine.raw_connection.return_value = connection
+        assert import_data.load_table("national_data", str(path), 8, report=lambda message: None) == (3, 3)
+
+    statements = [call.args[0] for call in cursor.execute.call_args_list]
+    assert not any(statement.startswith("DROP INDEX") for statement in statements)
+    assert "CREATE TEMP TABLE national_data_stage (LIKE national_data INCLUDING DEFAULTS INCLUDING CONSTRAINTS" in statements[3]
+    assert cursor.copy_expert.call_args.args[0].startswith("COPY national_data_stage (")
+    delete = next(i for i, statement in enumerate(statements) if statement.startswith("DELETE FROM national_data "))
+    insert = next(i for i, statement in enumerate(statements) if statement.startswith("INSERT INTO national_data "))
+    assert delete < insert
+    assert "row_hash" in statements[delete] and "row_hash" in statements[insert]
+    assert cursor.execute.call_args_list[-2].args[1] == (8, "national_data", "incremental", 3, 3)
+    connection.commit.assert_called_once()
+
+def test_load_table_reloads_year_partitions(tmp_path):
+    """Year reloads create missing partitions, truncate the years' partitions and COPY only their rows"""
+    path = tmp_path / "Spatial_extract_V1_2_2.csv"
+    path.write_bytes(b"header\nrow\n")
+    connection = mock.MagicMock()
+    cursor = connection.cursor.return_value
+    cursor.fetchone.side_effect = [(True,), (1,)]
+    cursor.fetchall.return_value = [(4,), (6,)]
+    cursor.rowcount = 9
+
+    with mock.patch("import_data.database.engine") as engine:
+        engine.raw_connection.return_value = connection
+        result = import_data.load_table(
+            "spatial_data", str(path), 9, "incremental", report=lambda message: None, years=[2019, 2020]
+        )
+
+    assert result == (9, 10)
+    statements = [call.args[0] for call in cursor.execute.call_args_list]
+    create = statements.index("SELECT create_year_partitions(%s, ARRAY(SELECT unnest(%s::int[])))")
+    truncate = statements.index("TRUNCATE spatial_data_y2019, spatial_data_y2020")
+    assert create < truncate
+    assert cursor.copy_expert.call_args.args[0].endswith("WHERE year IN (2019, 2020)")
+    assert cursor.execute.call_args_list[-2].args[1] == (9, "spatial_data", "years", 9, 10)
+    connection.commit.assert_called_once()
+
+def test_report_year_mismatches_lists_rows_outside_their_dates():
+    """Rows whose year is outside their calendar dates are counted and sampled, limited to reloaded years"""
+    messages = []
+    with mock.patch("import_data.run_sql", return_value=(2, [17, 40])) as run_sql:
+        assert import_data.report_year_mismatches("temporal_data", messages.append, years=[2019]) == 2
+
+    sql, params = run_sql.call_args.args
+    assert "year NOT BETWEEN EXTRACT(YEAR FROM calendar_start_date)" in sql and "year = ANY(%s)" in sql
+    assert params == (5, [2019])
+    assert messages == ["temporal_data: 2 rows have a year outside their calendar dates (ids 17, 40)"]
+
+    with mock.patch("import_data.run_sql", return_value=(0, None)):
+        assert import_data.report_year_mismatches("temporal_data", messages.append) == 0
+    assert len(messages) == 1
+
+def test_extract_years_reads_the_year_column(tmp_path):
+    """The pre-scan finds the distinct years of an extract, skipping NA years"""
+    path = tmp_path / "Spatial_extract_V1_2_2.csv"
+    path.write_bytes(b'"adm_0_name","Year"\n"PANAMA",2020\n"PANAMA",2019\n"BRAZIL",NA\n"BRAZIL",2020\n')
+
+    assert import_data.extract_years(str(path)) == [2019, 2020]
+    path.write_bytes(b"header\nrow\n")
+    assert import_data.extract_years(str(path)) == []
+
+def test_full_load_creates_year_partitions_before_copy(tmp_path):
+    """Full loads of partitioned tables create the extract's year partitions before the COPY"""
+    path = tmp_path / "Spatial_extract_V1_2_2.csv"
+    path.write_bytes(b'"adm_0_name","Year"\n"PANAMA",2020\n"PANAMA",2019\n')
+    cursor = mock.MagicMock()
+    cursor.fetchall.return_value = []
+    cursor.fetchone.side_effect = [(True,), (2,), (0,)]
+    cursor.rowcount = 2
+
+    assert import_data.full_load(cursor, "spatial_data", str(path), False, lambda message: None) == (2, 0)
+
+    calls = [(name, args) for name, args, _ in cursor.mock_calls if name in ("execute", "copy_expert")]
+    create = calls.index(
+        ("execute", ("SELECT create_year_partitions(%s, ARRAY(SELECT unnest(%s::int[])))", ("spatial_data", [2019, 2020])))
+    )
+    copy = next(i for i, (name, _) in enumerate(calls) if name == "copy_expert")
+    split = calls.index(("execute", ("SELECT split_default_partition(%s)", ("spatial_data",))))
+    assert create < copy < split
+
+def test_stale_rollups_lists_derived_tables_not_rebuilt():
+    """Every rollup and deduplicated view of the loaded tables is checked after the refresh"""
+    stale = {"spatial_region_year_rollup"}
+    with mock.patch("import_data.database.SessionLocal"), \
+            mock.patch("import_data.rollups.is_fresh", side_effect=lambda db, derived, table: derived.name not in stale):
+        assert import_data.stale_rollups([import_data.database.spatial_data]) == ["spatial_region_year_rollup"]
+        assert import_data.stale_rollups([import_data.database.national_data]) == []
+
+def test_main_refreshes_only_the_rollups_of_changed_tables(tmp_path):
+    """Tables an import left unchanged keep their views and rollups unless an earlier run left them stale"""
+    for filename in import_data.EXTRACTS.values():
+        (tmp_path / filename).write_bytes(b"header\n")
+    changes = {"national_data": (0, 0), "spatial_data": (0, 0), "temporal_data": (2, 1)}
+    left_stale = {"spatial_data"}
+    refreshed = []
+
+    def run_sql(sql, params=None):
+        if sql.startswith("SELECT refresh_table_rollups"):
+            refreshed.append(params[0])
+        return (0, [])
+
+    with mock.patch("import_data.run_sql", side_effect=run_sql), \
+            mock.patch("import_data.load_table", side_effect=lambda table, *args: changes[table]), \
+            mock.patch("import_data.stale_rollups",
+                       side_effect=lambda tables: [t.name for t in tables if t.name in left_stale and t.name not in refreshed]), \
+            mock.patch("import_data.detect_outbreaks.run"):
+        import_data.main(["--data-dir", str(tmp_path), "--schema", str(tmp_path / "National_extract_V1_2_2.csv")])
+
+    assert refreshed == ["spatial_data", "temporal_data"]
@@ -0,0 +1,61 @@
+from datetime import date, timedelta
+
+import numpy as np
+
+import outbreaks
+
+def weekly_rows(country, weeks, cases, region=None):
+    """Rows of a weekly series starting on Sunday 2015-01-04, with cases(week) cases"""
+    first = date(2015, 1, 4)
+    return [
+        (country.lower(), region.lower() if region else None, country, region, "Week",
+         first + timedelta(weeks=week), cases(week))
+        for week in range(weeks)
+    ]
+
+def seasonal(week):
+    """Cases of a steady seasonal series peaking every 52 weeks"""
+    return 100 + 50 * np.sin(2 * np.pi * week / 52)
+
+def test_period_dates_round_trip():
+    """Period numbers of week and month starts map back to the same start dates"""
+    weeks = np.array(["2019-12-29", "2020-01-05"], dtype="datetime64[D]")
+    starts, ends = outbreaks.period_dates(outbreaks.period_index(weeks, "Week"), "Week")
+    assert starts.tolist() == weeks.tolist()
+    assert str(ends[0]) == "2020-01-04"
+
+    months = np.array(["2020-02-01"], dtype="datetime64[D]")
+    starts, ends = outbreaks.period_dates(outbreaks.period_index(months, "Month"), "Month")
+    assert str(starts[0]) == "2020-02-01" and str(ends[0]) == "2020-02-29"
+
+def test_endemic_channel_flags_a_spike_above_previous_seasons():
+    """A week far above the same weeks of earlier years is flagged, the steady seasons are not"""
+    spike = 6 * 52 + 10
+    rows = weekly_rows("Brazil", 7 * 52, lambda week: seasonal(week) * (4 if week == spike else 1))
+    records = outbreaks.detect(rows, "temporal")
+    endemic = [record for record in records if record["method"] == "endemic_channel"]
+    # EARS C3 only scores the first two years, before there is an endemic channel
+    channel_start = date(2015, 1, 4) + timedelta(weeks=2 * 52 + 2)
+    assert all(record["period_start"] < channel_start for record in records if record["method"] == "ears_c3")
+
+    assert len(endemic) == 1
+    record = endemic[0]
+    assert record["period_start"] == date(2015, 1, 4) + timedelta(weeks=spike)
+    assert record["period_end"] == record["period_start"] + timedelta(days=6)
+    assert record["cases"] > record["threshold"] > record["expected"]
+    assert record["adm_0_name"] == "Brazil" and record["region_key"] is None
+
+def test_ears_c3_covers_series_without_seasonal_history():
+    """A jump in a new series is flagged by EARS C3, which the endemic channel cannot score"""
+    rows = weekly_rows("Peru", 20, lambda week: 200.0 if week >= 15 else 20.0 + week % 3, region="Lima")
+    records = outbreaks.detect(rows, "spatial")
+
+    assert {record["method"] for record in records} == {"ears_c3"}
+    assert records[0]["period_start"] == date(2015, 1, 4) + timedelta(weeks=15)
+    assert records[0]["region_key"] == "lima"
+
+def test_detect_ignores_yearly_rows_and_quiet_series():
+    """Yearly rows are not scanned, and periods below MIN_CASES are never flagged"""
+    yearly = [("chile", None, "Chile", None, "Year", date(2015 + year, 1, 1), 1000.0 * year) for year in range(10)]
+    quiet = weekly_rows("Chile", 7 * 52, lambda week: 4.0 if week == 6 * 52 else 0.0)
+    assert outbreaks.detect(yearly + quiet, "temporal") == []
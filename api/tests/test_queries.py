@@ -0,0 +1,146 @@
+from unittest import mock
+
+import queries
+
+def make_session():
+    mock_db = mock.MagicMock()
+    mock_db.info = {}
+    return mock_db
+
+def test_resolve_country_key_normalizes_names():
+    """Country names are trimmed and lower-cased without a database lookup"""
+    mock_db = make_session()
+
+    assert queries.resolve_country_key(mock_db, " Brazil ") == "brazil"
+    mock_db.execute.assert_not_called()
+
+def test_resolve_country_key_maps_iso_codes():
+    """ISO3 codes resolve to the country_key of the matching country"""
+    mock_db = make_session()
+    mock_db.execute.return_value.scalar.return_value = "viet nam"
+
+    assert queries.resolve_country_key(mock_db, "vnm") == "viet nam"
+    assert queries.resolve_country_key(mock_db, "vnm") == "viet nam"
+    assert mock_db.execute.call_count == 1
+
+def test_resolve_country_key_unknown_iso_code():
+    """Three-letter inputs that are not ISO codes are treated as names"""
+    mock_db = make_session()
+    mock_db.execute.return_value.scalar.return_value = None
+
+    assert queries.resolve_country_key(mock_db, "Foo") == "foo"
+
+def test_dataset_version_combines_max_id_and_generation():
+    """Dataset versions change with appended rows and with import generations"""
+    import database
+    mock_db = make_session()
+    mock_db.execute.return_value.one.return_value = (31032, 4)
+
+    assert queries.dataset_version(mock_db, database.national_data) == (31032, 4)
+    sql = str(mock_db.execute.call_args.args[0])
+    assert "max(national_data.id)" in sql
+    assert "import_log" in sql
+
+def test_global_dashboard_combines_sections_in_one_statement():
+    """Stats, top countries and yearly totals come from one statement with ordered JSON sections"""
+    from sqlalchemy.dialects import postgresql
+    mock_db = make_session()
+    mock_db.execute.return_value.scalars.return_value = ["national_data_unique", "national_year_rollup"]
+    mock_db.execute.return_value.one.return_value = mock.MagicMock(
+        total_records=3, total_cases=None, countries_count=1, min_year=2020, max_year=2021,
+        countries=[["BRAZIL", 30]], yearly=[[2020, 10], [2021, 20]]
+    )
+
+    dashboard = queries.global_dashboard(mock_db, 5)
+    assert dashboard == {
+        "stats": {"total_records": 3, "total_cases": 0, "countries_count": 1, "year_range": [2020, 2021]},
+        "countries": [{"country": "BRAZIL", "total_cases": 30.0}],
+        "yearly": [{"year": 2020, "total_cases": 10.0}, {"year": 2021, "total_cases": 20.0}]
+    }
+    assert mock_db.execute.call_count == 2
+    sql = str(mock_db.execute.call_args.args[0].compile(dialect=postgresql.dialect()))
+    assert "FROM national_data_unique" in sql
+    assert "json_build_array(anon_3.year, anon_3.total_cases) ORDER BY anon_3.year" in sql
+
+def test_name_rows_reads_countries_and_regions_in_one_statement():
+    """The name index reads national countries and rollup regions with one UNION ALL"""
+    from sqlalchemy.dialects import postgresql
+    mock_db = make_session()
+    mock_db.execute.return_value.scalars.return_value = ["national_data_unique", "spatial_region_year_rollup"]
+    mock_db.execute.return_value.all.return_value = [("brazil", "BRAZIL", "BRA", None)]
+
+    assert queries.name_rows(mock_db) == [("brazil", "BRAZIL", "BRA", None)]
+    assert mock_db.execute.call_count == 2
+    sql = str(mock_db.execute.call_args.args[0].compile(dialect=postgresql.dialect()))
+    assert "UNION ALL" in sql
+    assert "FROM national_data_unique GROUP BY national_data_unique.country_key" in sql
+    assert "FROM spatial_region_year_rollup" in sql
+
+def test_aggregate_reads_rollup_and_merges_metrics():
+    """Groups covered by a rollup are read from it, with means from its sums and value counts"""
+    from sqlalchemy.dialects import postgresql
+    mock_db = make_session()
+    mock_db.execute.return_value.scalars.return_value = ["temporal_region_year_rollup"]
+    mock_db.execute.return_value.all.return_value = [
+        mock.MagicMock(_mapping={"t_res": "Week", "country": "BRAZIL", "count": 52, "mean": 10.0})
+    ]
+
+    result = queries.aggregate(mock_db, "temporal", ["t_res", "country"], ["count", "mean"], country="Brazil")
+    assert result == {
+        "source": "temporal_region_year_rollup",
+        "estimated_rows": None,
+        "groups": [{"t_res": "Week", "country": "BRAZIL", "count": 52, "mean": 10.0}]
+    }
+    sql = str(mock_db.execute.call_args.args[0].compile(dialect=postgresql.dialect()))
+    assert "FROM temporal_region_year_rollup" in sql
+    assert "sum(temporal_region_year_rollup.record_count)" in sql
+    assert "nullif(sum(temporal_region_year_rollup.value_count)" in sql
+    assert "GROUP BY temporal_region_year_rollup.t_res, temporal_region_year_rollup.adm_0_name" in sql
+
+def test_aggregate_guards_raw_reads_with_explain():
+    """Queries no rollup can answer are estimated with EXPLAIN and refused above the row limit"""
+    from sqlalchemy.dialects import postgresql
+    import pytest
+    mock_db = make_session()
+    mock_db.execute.return_value.scalars.return_value = ["spatial_data_unique"]
+    plan = [{"Plan": {"Node Type": "Aggregate", "Plan Rows": 3, "Plans": [{"Node Type": "Seq Scan", "Plan Rows": 93075}]}}]
+    mock_db.execute.return_value.scalar.return_value = plan
+
+    with mock.patch("queries.AGGREGATE_MAX_ROWS", 1000), pytest.raises(queries.QueryTooExpensive, match="93,075 rows"):
+        queries.aggregate(mock_db, "spatial", ["t_res"], ["sum"])
+    explain = mock_db.execute.call_args.args[0]
+    assert str(explain.compile(dialect=postgresql.dialect())).startswith("EXPLAIN (FORMAT JSON) SELECT spatial_data_unique.t_res")
+
+    mock_db.execute.return_value.all.return_value = []
+    assert queries.aggregate(mock_db, "spatial", ["t_res"], ["sum"])["estimated_rows"] == 93075
+
+def test_regional_totals_page_past_regions_without_totals():
+    """Regions whose rows all lack a case count sort last and are reached by the cursor"""
+    from sqlalchemy import Column, Float, MetaData, String, Table, create_engine
+    import pagination
+
+    source = Table(
+        "spatial_data", MetaData(),
+        Column("adm_0_name", String), Column("adm_1_name", String), Column("dengue_total", Float)
+    )
+    engine = create_engine("sqlite://")
+    source.create(engine)
+    with engine.begin() as connection:
+        connection.execute(source.insert(), [
+            {"adm_0_name": "BRAZIL", "adm_1_name": "ACRE", "dengue_total": 40},
+            {"adm_0_name": "BRAZIL", "adm_1_name": "AMAPA", "dengue_total": None},
+            {"adm_0_name": "BRAZIL", "adm_1_name": "BAHIA", "dengue_total": 70},
+            {"adm_0_name": "BRAZIL", "adm_1_name": "CEARA", "dengue_total": None},
+            {"adm_0_name": "BRAZIL", "adm_1_name": "GOIAS", "dengue_total": 40},
+        ])
+
+        regions, after = [], None
+        while True:
+            rows = connection.execute(queries.regional_totals_query(source, limit=1, after=after)).all()
+            result = queries.regional_page(rows, 1)
+            regions += [(row["region"], row["total_cases"]) for row in result["data"]]
+            if result["next_cursor"] is None:
+                break
+            after = pagination.decode_cursor(result["next_cursor"], queries.REGIONAL_CURSOR)
+
+    assert regions == [("BAHIA", 70.0), ("ACRE", 40.0), ("GOIAS", 40.0), ("AMAPA", None), ("CEARA", None)]
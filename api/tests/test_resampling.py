@@ -0,0 +1,43 @@
+import numpy as np
+
+import resampling
+
+def days(*values):
+    return np.array(values, dtype="datetime64[D]")
+
+def test_resample_prorates_rows_across_periods():
+    """A row spanning two months is split by its days in each"""
+    starts, ends, totals = resampling.resample(
+        days("2020-01-25"), days("2020-02-03"), np.array([100.0]), np.array(["Week"]), "month"
+    )
+    assert [str(day) for day in starts] == ["2020-01-01", "2020-02-01"]
+    assert [str(day) for day in ends] == ["2020-01-31", "2020-02-29"]
+    assert totals.tolist() == [70.0, 30.0]
+
+def test_resample_prefers_the_finest_complete_resolution():
+    """Overlapping rows are not double counted: each period uses the resolution covering most of it"""
+    weeks = np.arange(np.datetime64("2020-01-05"), np.datetime64("2020-02-02"), 7)
+    starts = np.concatenate([days("2020-01-01", "2020-02-01"), weeks])
+    ends = np.concatenate([days("2020-01-31", "2020-02-29"), weeks + 6])
+    totals = np.array([310.0, 290.0, 7.0, 7.0, 7.0, 7.0])
+    t_res = np.array(["Month", "Month", "Week", "Week", "Week", "Week"])
+
+    _, _, monthly = resampling.resample(starts, ends, totals, t_res, "month")
+    # January has monthly rows covering all of it, weekly rows covering 28 of its days
+    assert monthly.tolist() == [310.0, 290.0]
+
+    week_starts, _, weekly = resampling.resample(starts, ends, totals, t_res, "week")
+    assert str(week_starts[0]) == "2019-12-29"
+    assert weekly[1:5].tolist() == [7.0] * 4
+    assert weekly[0] == 40.0  # Four January days of the monthly row
+
+def test_lttb_keeps_endpoints_and_peaks():
+    """Downsampling keeps the first and last points and a lone spike"""
+    y = np.zeros(1000)
+    y[437] = 50.0
+    keep = resampling.lttb(np.arange(1000), y, 20)
+    assert len(keep) == 20
+    assert keep[0] == 0 and keep[-1] == 999
+    assert 437 in keep
+    assert (np.diff(keep) > 0).all()
+    assert resampling.lttb(np.arange(5), np.ones(5), 10).tolist() == [0, 1, 2, 3, 4]
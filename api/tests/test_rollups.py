@@ -0,0 +1,86 @@
+from unittest import mock
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import ProgrammingError
+
+import database
+import metrics
+import rollups
+
+def test_source_for_uses_fresh_rollup():
+    """A rollup built from the current source rows replaces the raw table"""
+    mock_db = mock.MagicMock()
+    mock_db.execute.return_value.scalar.return_value = True
+
+    assert rollups.source_for(mock_db, database.national_data) is database.national_year_rollup
+    assert rollups.source_for(mock_db, database.spatial_data) is database.spatial_region_year_rollup
+
+def test_source_for_falls_back_when_stale():
+    """A stale or never-built rollup falls back to deduplicating the raw table"""
+    mock_db = mock.MagicMock()
+    mock_db.execute.return_value.scalar.return_value = None
+
+    source = rollups.source_for(mock_db, database.national_data)
+    assert source.name == "national_data_deduplicated"
+    assert "DISTINCT ON (national_data.iso_a0" in str(source.select().compile(dialect=postgresql.dialect()))
+
+def test_stale_view_fallbacks_are_counted():
+    """Each read that deduplicates a raw table because its view is stale is counted by table"""
+    counted = lambda: metrics.REGISTRY.get_sample_value(
+        "api_deduplicated_fallbacks_total", {"table": "temporal_data"}
+    ) or 0
+    before = counted()
+
+    rollups.rows_for(mock.MagicMock(), database.temporal_data, fresh={"temporal_data_unique"})
+    assert counted() == before
+    rollups.rows_for(mock.MagicMock(), database.temporal_data, fresh=set())
+    assert counted() == before + 1
+
+def test_source_for_falls_back_when_missing():
+    """Missing rollup tables fall back to the raw rows and reset the transaction"""
+    mock_db = mock.MagicMock()
+    mock_db.execute.side_effect = ProgrammingError("SELECT", {}, Exception("relation does not exist"))
+
+    assert rollups.source_for(mock_db, database.spatial_data).name == "spatial_data_deduplicated"
+    assert mock_db.rollback.call_count == 2
+
+def test_rows_for_uses_fresh_unique_view():
+    """Tables without a rollup read their deduplicated view when it is fresh"""
+    mock_db = mock.MagicMock()
+    mock_db.execute.return_value.scalar.return_value = True
+
+    assert rollups.source_for(mock_db, database.temporal_data) is database.temporal_data_unique
+    assert rollups.rows_for(mock_db, database.national_data) is database.national_data_unique
+
+def test_raw_reads_skip_rollups_and_views():
+    """With deduplicated reads disabled the raw table is returned without querying"""
+    mock_db = mock.MagicMock()
+
+    with mock.patch("rollups.database.DB_READ_DEDUPLICATED", False):
+        assert rollups.source_for(mock_db, database.national_data) is database.national_data
+        assert rollups.rows_for(mock_db, database.temporal_data) is database.temporal_data
+    mock_db.execute.assert_not_called()
+
+def test_fresh_names_checks_all_tables_at_once():
+    """One query finds the fresh rollups and views, which then skip their own checks"""
+    mock_db = mock.MagicMock()
+    mock_db.execute.return_value.scalars.return_value = ["spatial_data_unique", "temporal_data_unique"]
+
+    fresh = rollups.fresh_names(mock_db, database.spatial_data, database.temporal_data)
+    assert fresh == {"spatial_data_unique", "temporal_data_unique"}
+    assert "UNION ALL" in str(mock_db.execute.call_args.args[0])
+    mock_db.execute.reset_mock()
+
+    assert rollups.source_for(mock_db, database.spatial_data, fresh) is database.spatial_data_unique
+    assert rollups.rows_for(mock_db, database.temporal_data, fresh) is database.temporal_data_unique
+    mock_db.execute.assert_not_called()
+
+def test_plan_aggregate_picks_rollup_keeping_dimensions():
+    """The planner answers from a fresh rollup keeping every dimension, and otherwise from none"""
+    mock_db = mock.MagicMock()
+    fresh = {"temporal_region_year_rollup", "spatial_region_year_rollup"}
+
+    assert rollups.plan_aggregate(mock_db, database.temporal_data, {"country", "t_res"}, fresh) is database.temporal_region_year_rollup
+    assert rollups.plan_aggregate(mock_db, database.spatial_data, {"region", "year"}, fresh) is database.spatial_region_year_rollup
+    assert rollups.plan_aggregate(mock_db, database.spatial_data, {"t_res"}, fresh) is None
+    assert rollups.plan_aggregate(mock_db, database.national_data, {"year"}, fresh) is None
+    mock_db.execute.assert_not_called()
@@ -0,0 +1,32 @@
+import numpy as np
+
+import columnar
+import synthetic_data
+
+def test_periods_cover_the_years():
+    """Weeks start on Sundays, months and years end on their last day"""
+    starts, ends = synthetic_data.periods("Week", 2020, 2021)
+    assert len(starts) == 104
+    assert str(starts[0]) == "2020-01-05" and ((ends - starts).astype(int) == 6).all()
+
+    starts, ends = synthetic_data.periods("Month", 2020, 2020)
+    assert [str(day) for day in (starts[1], ends[1], ends[-1])] == ["2020-02-01", "2020-02-29", "2020-12-31"]
+    starts, ends = synthetic_data.periods("Year", 2020, 2021)
+    assert [str(day) for day in ends] == ["2020-12-31", "2021-12-31"]
+
+def test_extracts_load_like_a_release(tmp_path):
+    """Extracts have the requested rows, are reproducible, and revised rows deduplicate away"""
+    synthetic_data.generate(str(tmp_path), 3000, regions=3, duplicates=0.05, report=lambda message: None)
+    national = (tmp_path / "National_extract_V1_2_2.csv").read_text().splitlines()
+    assert national[0] == synthetic_data.HEADER
+    assert len(national) == 3001
+
+    synthetic_data.write_extract(str(tmp_path / "again.csv"), 3000, duplicates=0.05, seed=0)
+    assert (tmp_path / "again.csv").read_text().splitlines() == national
+
+    columnar.convert(str(tmp_path), str(tmp_path / "columnar"), report=lambda message: None)
+    store = columnar.ColumnarStore(str(tmp_path / "columnar"))
+    revised = len(national) - 1 - len({line.rsplit(",", 5)[0] for line in national[1:]})
+    assert revised > 0
+    assert store.tables["national_data"].num_rows == 3000 - revised
+    assert store.tables["spatial_data"].values("s_res", np.arange(1))[0] == "Admin1"
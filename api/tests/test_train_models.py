@@ -0,0 +1,65 @@
+from unittest import mock
+
+import forecasting
+import train_models
+from tests.test_forecasting import make_rows
+
+def make_panel():
+    rows = make_rows(years=(2018, 2019, 2020, 2021))
+    rows += make_rows("Peru", years=(2019, 2020, 2021), scale=2)
+    rows += make_rows("Chile", years=(2021,))
+    return forecasting.build_panel(rows)
+
+def test_split_panel_covers_every_series():
+    """Chunks hold consecutive series with their names and rows"""
+    panel = make_panel()
+    chunks = train_models.split_panel(panel, 2)
+
+    assert [key for chunk in chunks for key in chunk.keys] == panel.keys
+    assert all(chunk.values.shape[0] == len(chunk.keys) for chunk in chunks)
+    assert chunks[-1].names[chunks[-1].keys[-1]] == panel.names[panel.keys[-1]]
+
+def test_train_chunk_selects_one_model_per_series():
+    """Each series gets a record per model, exactly one of them selected"""
+    records = train_models.train_chunk(make_panel(), horizon=6, folds=2, step=3)
+
+    assert len(records) == 3 * len(forecasting.MODELS)
+    for country_key in ("brazil", "peru", "chile"):
+        series = [record for record in records if record["country_key"] == country_key]
+        assert sum(record["selected"] for record in series) == 1
+    chile = [record for record in records if record["country_key"] == "chile"]
+    assert all(record["mae"] is None and record["points"] == 0 for record in chile)
+    assert records[0]["history_end"].isoformat() == "2021-12-01"
+
+def test_train_all_matches_serial_run():
+    """Training in worker processes gives the same records as a serial run"""
+    panel = make_panel()
+
+    serial = train_models.train_all(panel, 1, horizon=6, folds=2, step=3)
+    parallel = train_models.train_all(panel, 2, horizon=6, folds=2, step=3)
+    assert parallel == serial
+
+def test_write_results_replaces_table():
+    """Results are written in one transaction stamped with the source version"""
+    mock_db = mock.MagicMock()
+    records = [{"country_key": "brazil", "model": "seasonal_naive"}]
+
+    train_models.write_results(mock_db, records, (31032, 4))
+    assert mock_db.execute.call_count == 2
+    assert records[0]["source_max_id"] == 31032
+    assert records[0]["source_generation"] == 4
+    mock_db.commit.assert_called_once()
+
+def test_run_reports_each_stage():
+    """Progress goes to the report callable, one message per stage"""
+    messages = []
+    with mock.patch("train_models.database.SessionLocal") as sessions, \
+            mock.patch("train_models.queries.temporal_data_version", return_value=(31032, 4)), \
+            mock.patch("train_models.forecasting.load_series", return_value=make_panel()):
+        train_models.run(1, horizon=6, folds=2, step=3, report=messages.append)
+
+    assert [message.split(" in ")[0] for message in messages] == [
+        "Loaded 3 series", "Trained 3 series with 1 workers", "Wrote 9 model records"
+    ]
+    sessions.return_value.commit.assert_called_once()
+    sessions.return_value.close.assert_called_once()
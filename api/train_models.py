@@ -0,0 +1,135 @@
+"""Backtest and fit forecasting models for every series, outside the API.
+
+All series are read in one query, split into chunks and processed across a pool of
+worker processes. Each chunk is backtested with rolling-origin cross-validation and
+refitted on its full history; the resulting model parameters and accuracy metrics
+replace the contents of the forecast_models table.
+
+Usage: python train_models.py [--workers N] [--horizon 6] [--folds 4] [--step 3]
+"""
+import argparse
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import delete, insert
+
+import database
+import forecasting
+import queries
+
+def split_panel(panel: forecasting.SeriesPanel, parts: int):
+    """Split a panel into up to parts panels of consecutive series"""
+    size = max(1, math.ceil(len(panel.keys) / max(1, parts)))
+    chunks = []
+    for start in range(0, len(panel.keys), size):
+        keys = panel.keys[start:start + size]
+        chunks.append(forecasting.SeriesPanel(
+            keys,
+            {key: panel.names[key] for key in keys},
+            panel.values[start:start + size],
+            panel.last_month[start:start + size]
+        ))
+    return chunks
+
+def metric(value):
+    """Convert a NumPy metric to a float, or None where it could not be computed"""
+    return None if np.isnan(value) else float(value)
+
+def train_chunk(panel: forecasting.SeriesPanel, horizon: int, folds: int, step: int):
+    """Backtest and fit one chunk of series, returning one record per series and model"""
+    metrics = forecasting.backtest_panel(panel, horizon, folds, step)
+    fitted = forecasting.fit_panel(panel)
+
+    # Select the model with the lowest backtest MAE, or the in-sample choice if none was scored
+    mae = np.stack([metrics[model]["mae"] for model in forecasting.MODELS], axis=1)
+    selected = np.where(
+        np.isnan(mae).all(axis=1),
+        fitted.best_model,
+        np.argmin(np.where(np.isnan(mae), np.inf, mae), axis=1)
+    )
+
+    records = []
+    for row, key in enumerate(panel.keys):
+        country, region = panel.names[key]
+        for model_index, model in enumerate(forecasting.MODELS):
+            records.append({
+                "country_key": key[0],
+                "region_key": key[1],
+                "adm_0_name": country,
+                "adm_1_name": region,
+                "model": model,
+                "selected": bool(selected[row] == model_index),
+                "parameters": forecasting.model_parameters(fitted, row, model),
+                "history_end": panel.last_month[row].astype("datetime64[D]").item(),
+                "mae": metric(metrics[model]["mae"][row]),
+                "mape": metric(metrics[model]["mape"][row]),
+                "coverage": metric(metrics[model]["coverage"][row]),
+                "points": int(metrics[model]["points"][row]),
+                "horizon": horizon,
+                "folds": folds,
+            })
+    return records
+
+def train_all(panel: forecasting.SeriesPanel, workers: int, horizon: int, folds: int, step: int):
+    """Train every series, spreading chunks of the panel over a process pool"""
+    # Several chunks per worker keep all processes busy when chunks take uneven time
+    chunks = split_panel(panel, workers * 4)
+    if workers <= 1:
+        return [record for chunk in chunks for record in train_chunk(chunk, horizon, folds, step)]
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(
+            train_chunk, chunks,
+            [horizon] * len(chunks), [folds] * len(chunks), [step] * len(chunks)
+        )
+        return [record for chunk_records in results for record in chunk_records]
+
+def write_results(db, records, source_version):
+    """Replace the contents of forecast_models with records in one transaction"""
+    trained_at = datetime.utcnow()
+    source_max_id, source_generation = source_version
+    for record in records:
+        record["source_max_id"] = source_max_id
+        record["source_generation"] = source_generation
+        record["trained_at"] = trained_at
+
+    db.execute(delete(database.forecast_models))
+    if records:
+        db.execute(insert(database.forecast_models), records)
+    db.commit()
+
+def run(workers, horizon=6, folds=4, step=3, report=print):
+    """Train every series and replace the stored models, reporting the time of each stage"""
+    started = time.perf_counter()
+    db = database.SessionLocal()
+    try:
+        source_version = queries.temporal_data_version(db)
+        panel = forecasting.load_series(db)
+        loaded = time.perf_counter()
+        report(f"Loaded {len(panel.keys)} series in {loaded - started:.2f}s")
+
+        records = train_all(panel, workers, horizon, folds, step)
+        trained = time.perf_counter()
+        report(f"Trained {len(panel.keys)} series with {workers} workers in {trained - loaded:.2f}s")
+
+        write_results(db, records, source_version)
+        report(f"Wrote {len(records)} model records in {time.perf_counter() - trained:.2f}s")
+    finally:
+        db.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backtest and fit dengue forecasting models")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes (default: CPU count)")
+    parser.add_argument("--horizon", type=int, default=6, help="Months forecast from each backtest origin")
+    parser.add_argument("--folds", type=int, default=4, help="Number of rolling backtest origins")
+    parser.add_argument("--step", type=int, default=3, help="Months between backtest origins")
+    args = parser.parse_args(argv)
+
+    run(args.workers, args.horizon, args.folds, args.step, report=lambda message: print(message, flush=True))
+
+if __name__ == "__main__":
+    main()
@@ -33,6 +33,7 @@ echo "Cleaning up any leftover resources..."
 oc delete all -l app.kubernetes.io/instance=dengue-app --namespace "$PROJECT_NAME" || true
 oc delete pvc -l app.kubernetes.io/instance=dengue-app --namespace "$PROJECT_NAME" || true
 oc delete cm -l app.kubernetes.io/instance=dengue-app --namespace "$PROJECT_NAME" || true
+oc delete configmap db-schema --namespace "$PROJECT_NAME" || true
 oc delete secret -l app.kubernetes.io/instance=dengue-app --namespace "$PROJECT_NAME" || true
 
 echo "Cleanup complete!"
\ No newline at end of file
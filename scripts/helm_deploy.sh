@@ -38,6 +38,17 @@ fi
 echo "Updating Helm repositories..."
 helm repo update
 
+# The API deployment and the data import job run the image built from api/
+echo "Building API image..."
+if ! oc get buildconfig dengue-api &> /dev/null; then
+    oc new-build --name=dengue-api --binary=true --strategy=docker
+fi
+oc start-build dengue-api --from-dir="$ROOT_DIR/api" --follow
+
+# The import job applies sql/load_data.sql, mounted from this ConfigMap
+echo "Creating SQL schema ConfigMap..."
+oc create configmap db-schema --from-file="$ROOT_DIR/sql/load_data.sql" --dry-run=client -o yaml | oc apply -f -
+
 echo "Installing/Upgrading dengue-app Helm chart..."
 helm upgrade --install dengue-app "$HELM_DIR" \
   --namespace "$PROJECT_NAME" \
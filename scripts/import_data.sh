@@ -10,25 +10,11 @@ DB_PASSWORD=${DB_PASSWORD:-I1A37SHxlTjB6ulf}
 
 echo "Starting data import process..."
 
-# Create database schema
-echo "Creating database schema..."
-PGPASSWORD=$DB_PASSWORD psql -h $DB_HOST -p $DB_PORT -U $DB_USER -d $DB_NAME -f load_data.sql
-
-# Process CSV files to handle nulls
-echo "Processing CSV files..."
-sed 's/NA//g' National_extract_V1_2_2.csv > /tmp/national_data.csv
-sed 's/NA//g' Spatial_extract_V1_2_2.csv > /tmp/spatial_data.csv
-sed 's/NA//g' Temporal_extract_V1_2_2.csv > /tmp/temporal_data.csv
-
-# Import data in chunks to avoid disk space issues
-echo "Importing National data..."
-PGPASSWORD=$DB_PASSWORD psql -h $DB_HOST -p $DB_PORT -U $DB_USER -d $DB_NAME -c "\COPY national_data(adm_0_name, adm_1_name, adm_2_name, full_name, iso_a0, fao_gaul_code, rne_iso_code, ibge_code, calendar_start_date, calendar_end_date, year, dengue_total, case_definition_standardised, s_res, t_res, uuid) FROM '/tmp/national_data.csv' CSV HEADER"
-
-echo "Importing Spatial data..."
-PGPASSWORD=$DB_PASSWORD psql -h $DB_HOST -p $DB_PORT -U $DB_USER -d $DB_NAME -c "\COPY spatial_data(adm_0_name, adm_1_name, adm_2_name, full_name, iso_a0, fao_gaul_code, rne_iso_code, ibge_code, calendar_start_date, calendar_end_date, year, dengue_total, case_definition_standardised, s_res, t_res, uuid) FROM '/tmp/spatial_data.csv' CSV HEADER"
-
-echo "Importing Temporal data..."
-PGPASSWORD=$DB_PASSWORD psql -h $DB_HOST -p $DB_PORT -U $DB_USER -d $DB_NAME -c "\COPY temporal_data(adm_0_name, adm_1_name, adm_2_name, full_name, iso_a0, fao_gaul_code, rne_iso_code, ibge_code, calendar_start_date, calendar_end_date, year, dengue_total, case_definition_standardised, s_res, t_res, uuid) FROM '/tmp/temporal_data.csv' CSV HEADER"
+# Create the schema, stream the CSV extracts (or their .zip archives) into PostgreSQL
+# with COPY, rebuild indexes and refresh the rollup tables
+echo "Importing data..."
+export DB_HOST DB_PORT DB_NAME DB_USER DB_PASSWORD
+python "$(dirname "$0")/../api/import_data.py" --data-dir . --schema load_data.sql
 
 # Verify data loaded successfully
 echo "Verifying data loaded successfully..."
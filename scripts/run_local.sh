@@ -77,6 +77,12 @@ VALUES
 ('BRAZIL', NULL, NULL, 'BRAZIL', 'BRA', 123, 'BRA', '2020-02-19', '2020-02-25', 2020, 8000, 'Suspected', 'Admin0', 'Week', 'BR-2020-W08'),
 ('BRAZIL', NULL, NULL, 'BRAZIL', 'BRA', 123, 'BRA', '2020-02-26', '2020-03-03', 2020, 7500, 'Suspected', 'Admin0', 'Week', 'BR-2020-W09'),
 ('BRAZIL', NULL, NULL, 'BRAZIL', 'BRA', 123, 'BRA', '2020-03-04', '2020-03-10', 2020, 7000, 'Suspected', 'Admin0', 'Week', 'BR-2020-W10');
+
+-- Move the rows out of the default partitions into yearly partitions
+SELECT split_default_partition('spatial_data'), split_default_partition('temporal_data');
+
+-- Build the deduplicated views and rollup tables used by the API
+SELECT refresh_rollups();
 EOF
 
 docker cp /tmp/sample_data.sql dengue-postgres:/tmp/
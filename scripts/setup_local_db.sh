@@ -12,25 +12,11 @@ DB_PASSWORD="postgres"
 echo "Creating database if it doesn't exist..."
 psql -h $DB_HOST -p $DB_PORT -U $DB_USER -c "CREATE DATABASE $DB_NAME;" || true
 
-# Create schema and import data
+# Create the schema, stream the CSV extracts (or their .zip archives) into PostgreSQL
+# with COPY, rebuild indexes and refresh the rollup tables
 echo "Creating schema and importing data..."
-psql -h $DB_HOST -p $DB_PORT -U $DB_USER -d $DB_NAME -f ../sql/load_data.sql
-
-# Process CSV files to handle nulls
-echo "Processing CSV files..."
-sed 's/NA//g' ../National_extract_V1_2_2.csv > /tmp/national_data.csv
-sed 's/NA//g' ../Spatial_extract_V1_2_2.csv > /tmp/spatial_data.csv
-sed 's/NA//g' ../Temporal_extract_V1_2_2.csv > /tmp/temporal_data.csv
-
-# Import data
-echo "Importing National data..."
-psql -h $DB_HOST -p $DB_PORT -U $DB_USER -d $DB_NAME -c "\COPY national_data(adm_0_name, adm_1_name, adm_2_name, full_name, iso_a0, fao_gaul_code, rne_iso_code, ibge_code, calendar_start_date, calendar_end_date, year, dengue_total, case_definition_standardised, s_res, t_res, uuid) FROM '/tmp/national_data.csv' CSV HEADER"
-
-echo "Importing Spatial data..."
-psql -h $DB_HOST -p $DB_PORT -U $DB_USER -d $DB_NAME -c "\COPY spatial_data(adm_0_name, adm_1_name, adm_2_name, full_name, iso_a0, fao_gaul_code, rne_iso_code, ibge_code, calendar_start_date, calendar_end_date, year, dengue_total, case_definition_standardised, s_res, t_res, uuid) FROM '/tmp/spatial_data.csv' CSV HEADER"
-
-echo "Importing Temporal data..."
-psql -h $DB_HOST -p $DB_PORT -U $DB_USER -d $DB_NAME -c "\COPY temporal_data(adm_0_name, adm_1_name, adm_2_name, full_name, iso_a0, fao_gaul_code, rne_iso_code, ibge_code, calendar_start_date, calendar_end_date, year, dengue_total, case_definition_standardised, s_res, t_res, uuid) FROM '/tmp/temporal_data.csv' CSV HEADER"
+export DB_HOST DB_PORT DB_NAME DB_USER DB_PASSWORD
+python ../api/import_data.py --data-dir .. --schema ../sql/load_data.sql
 
 # Verify data loaded successfully
 echo "Verifying data loaded successfully..."
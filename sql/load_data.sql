@@ -19,8 +19,12 @@ CREATE TABLE IF NOT EXISTS national_data (
     uuid VARCHAR(100)
 );
 
+-- Spatial and temporal rows are partitioned by year, one partition per year, so year and
+-- date filters scan only the matching partitions and a year can be truncated and reloaded
+-- on its own. Databases created before partitioning keep their plain tables; drop both
+-- tables and re-run api/import_data.py to switch them over.
 CREATE TABLE IF NOT EXISTS spatial_data (
-    id SERIAL PRIMARY KEY,
+    id SERIAL,
     adm_0_name VARCHAR(255),
     adm_1_name VARCHAR(255),
     adm_2_name VARCHAR(255),
@@ -31,16 +35,18 @@ CREATE TABLE IF NOT EXISTS spatial_data (
     ibge_code VARCHAR(255),
     calendar_start_date DATE,
     calendar_end_date DATE,
-    year INT,
+    year INT NOT NULL,
     dengue_total FLOAT,
     case_definition_standardised VARCHAR(50),
     s_res VARCHAR(50),
     t_res VARCHAR(50),
-    uuid VARCHAR(100)
-);
+    uuid VARCHAR(100),
+    -- The partition key must be part of the primary key
+    PRIMARY KEY (id, year)
+) PARTITION BY RANGE (year);
 
 CREATE TABLE IF NOT EXISTS temporal_data (
-    id SERIAL PRIMARY KEY,
+    id SERIAL,
     adm_0_name VARCHAR(255),
     adm_1_name VARCHAR(255),
     adm_2_name VARCHAR(255),
@@ -51,14 +57,134 @@ CREATE TABLE IF NOT EXISTS temporal_data (
     ibge_code VARCHAR(255),
     calendar_start_date DATE,
     calendar_end_date DATE,
-    year INT,
+    year INT NOT NULL,
     dengue_total FLOAT,
     case_definition_standardised VARCHAR(50),
     s_res VARCHAR(50),
     t_res VARCHAR(50),
-    uuid VARCHAR(100)
+    uuid VARCHAR(100),
+    -- The partition key must be part of the primary key
+    PRIMARY KEY (id, year)
+) PARTITION BY RANGE (year);
+
+-- Add normalized country keys so case-insensitive country filters can use indexes
+ALTER TABLE national_data ADD COLUMN IF NOT EXISTS country_key VARCHAR(255) GENERATED ALWAYS AS (lower(btrim(adm_0_name))) STORED;
+ALTER TABLE spatial_data ADD COLUMN IF NOT EXISTS country_key VARCHAR(255) GENERATED ALWAYS AS (lower(btrim(adm_0_name))) STORED;
+ALTER TABLE temporal_data ADD COLUMN IF NOT EXISTS country_key VARCHAR(255) GENERATED ALWAYS AS (lower(btrim(adm_0_name))) STORED;
+
+-- Content hash of a source row, used by incremental imports to match rows between releases.
+-- Declared IMMUTABLE so it can back a generated column; it relies on the default ISO DateStyle.
+CREATE OR REPLACE FUNCTION dengue_row_hash(
+    adm_0_name VARCHAR, adm_1_name VARCHAR, adm_2_name VARCHAR, full_name VARCHAR,
+    iso_a0 VARCHAR, fao_gaul_code BIGINT, rne_iso_code VARCHAR, ibge_code VARCHAR,
+    calendar_start_date DATE, calendar_end_date DATE, year INT, dengue_total FLOAT,
+    case_definition_standardised VARCHAR, s_res VARCHAR, t_res VARCHAR, uuid VARCHAR
+) RETURNS CHAR(32) AS $$
+    SELECT md5(ROW(adm_0_name, adm_1_name, adm_2_name, full_name, iso_a0, fao_gaul_code, rne_iso_code, ibge_code, calendar_start_date, calendar_end_date, year, dengue_total, case_definition_standardised, s_res, t_res, uuid)::text)
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE;
+
+ALTER TABLE national_data ADD COLUMN IF NOT EXISTS row_hash CHAR(32) GENERATED ALWAYS AS (dengue_row_hash(adm_0_name, adm_1_name, adm_2_name, full_name, iso_a0, fao_gaul_code, rne_iso_code, ibge_code, calendar_start_date, calendar_end_date, year, dengue_total, case_definition_standardised, s_res, t_res, uuid)) STORED;
+ALTER TABLE spatial_data ADD COLUMN IF NOT EXISTS row_hash CHAR(32) GENERATED ALWAYS AS (dengue_row_hash(adm_0_name, adm_1_name, adm_2_name, full_name, iso_a0, fao_gaul_code, rne_iso_code, ibge_code, calendar_start_date, calendar_end_date, year, dengue_total, case_definition_standardised, s_res, t_res, uuid)) STORED;
+ALTER TABLE temporal_data ADD COLUMN IF NOT EXISTS row_hash CHAR(32) GENERATED ALWAYS AS (dengue_row_hash(adm_0_name, adm_1_name, adm_2_name, full_name, iso_a0, fao_gaul_code, rne_iso_code, ibge_code, calendar_start_date, calendar_end_date, year, dengue_total, case_definition_standardised, s_res, t_res, uuid)) STORED;
+
+-- One generation per import run; each table loaded by the run logs the rows it changed
+CREATE SEQUENCE IF NOT EXISTS import_generation_seq;
+
+CREATE TABLE IF NOT EXISTS import_log (
+    generation BIGINT NOT NULL,
+    table_name VARCHAR(100) NOT NULL,
+    mode VARCHAR(20) NOT NULL,
+    rows_inserted BIGINT NOT NULL DEFAULT 0,
+    rows_deleted BIGINT NOT NULL DEFAULT 0,
+    imported_at TIMESTAMP NOT NULL DEFAULT now(),
+    PRIMARY KEY (generation, table_name)
 );
 
+-- Last import generation that changed a table's rows
+CREATE OR REPLACE FUNCTION data_generation(source_table TEXT) RETURNS BIGINT AS $$
+    SELECT MAX(generation) FROM import_log
+    WHERE table_name = source_table AND rows_inserted + rows_deleted > 0
+$$ LANGUAGE sql STABLE;
+
+-- Rows are expected to fall in a year between those of their start and end dates, which lets
+-- date filters be turned into year bounds that prune partitions. A CHECK constraint would make
+-- a whole COPY fail on one inconsistent row, so api/import_data.py reports those rows instead.
+ALTER TABLE spatial_data DROP CONSTRAINT IF EXISTS spatial_data_year_range_check;
+ALTER TABLE temporal_data DROP CONSTRAINT IF EXISTS temporal_data_year_range_check;
+
+-- Default partitions catch rows of years that have no partition yet, such as rows COPYed
+-- straight into the parent table; split_default_partition() moves them out
+DO $$
+DECLARE
+    source_table TEXT;
+BEGIN
+    FOREACH source_table IN ARRAY ARRAY['spatial_data', 'temporal_data'] LOOP
+        IF (SELECT relkind FROM pg_class WHERE oid = source_table::regclass) = 'p' THEN
+            EXECUTE format('CREATE TABLE IF NOT EXISTS %I PARTITION OF %I DEFAULT', source_table || '_default', source_table);
+        END IF;
+    END LOOP;
+END $$;
+
+-- Create the missing yearly partitions of a partitioned source table, moving any rows of
+-- those years out of its default partition. Returns the number of partitions created;
+-- plain (unpartitioned) tables are left alone.
+CREATE OR REPLACE FUNCTION create_year_partitions(source_table TEXT, years INT[]) RETURNS INT AS $$
+DECLARE
+    default_partition TEXT := source_table || '_default';
+    has_default BOOLEAN := to_regclass(source_table || '_default') IS NOT NULL;
+    columns TEXT := 'id, adm_0_name, adm_1_name, adm_2_name, full_name, iso_a0, fao_gaul_code, rne_iso_code, ibge_code, '
+        'calendar_start_date, calendar_end_date, year, dengue_total, case_definition_standardised, s_res, t_res, uuid';
+    missing INT[];
+    partition_year INT;
+BEGIN
+    IF (SELECT relkind FROM pg_class WHERE oid = source_table::regclass) <> 'p' THEN
+        RETURN 0;
+    END IF;
+
+    SELECT array_agg(DISTINCT wanted ORDER BY wanted) INTO missing
+    FROM unnest(years) AS wanted
+    WHERE wanted IS NOT NULL AND to_regclass(format('%s_y%s', source_table, wanted)) IS NULL;
+    IF missing IS NULL THEN
+        RETURN 0;
+    END IF;
+
+    -- A partition cannot be added while the default partition holds rows in its range,
+    -- so the default partition is detached while those rows move to their new partition
+    IF has_default THEN
+        EXECUTE format('ALTER TABLE %I DETACH PARTITION %I', source_table, default_partition);
+    END IF;
+    FOREACH partition_year IN ARRAY missing LOOP
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%s) TO (%s)',
+            format('%s_y%s', source_table, partition_year), source_table, partition_year, partition_year + 1
+        );
+        IF has_default THEN
+            EXECUTE format(
+                'WITH moved AS (DELETE FROM %I WHERE year = %s RETURNING %s) INSERT INTO %I (%s) SELECT %s FROM moved',
+                default_partition, partition_year, columns, source_table, columns, columns
+            );
+        END IF;
+    END LOOP;
+    IF has_default THEN
+        EXECUTE format('ALTER TABLE %I ATTACH PARTITION %I DEFAULT', source_table, default_partition);
+    END IF;
+    RETURN array_length(missing, 1);
+END;
+$$ LANGUAGE plpgsql;
+
+-- Give every year found in the default partition a partition of its own
+CREATE OR REPLACE FUNCTION split_default_partition(source_table TEXT) RETURNS INT AS $$
+DECLARE
+    years INT[];
+BEGIN
+    IF to_regclass(source_table || '_default') IS NULL THEN
+        RETURN 0;
+    END IF;
+    EXECUTE format('SELECT array_agg(DISTINCT year) FROM %I', source_table || '_default') INTO years;
+    RETURN create_year_partitions(source_table, years);
+END;
+$$ LANGUAGE plpgsql;
+
 -- Create indexes
 CREATE INDEX IF NOT EXISTS national_data_iso_year_idx ON national_data(iso_a0, year);
 CREATE INDEX IF NOT EXISTS national_data_date_range_idx ON national_data(calendar_start_date, calendar_end_date);
@@ -71,18 +197,238 @@ CREATE INDEX IF NOT EXISTS temporal_data_iso_year_idx ON temporal_data(iso_a0, y
 CREATE INDEX IF NOT EXISTS temporal_data_date_range_idx ON temporal_data(calendar_start_date, calendar_end_date);
 CREATE INDEX IF NOT EXISTS temporal_data_t_res_idx ON temporal_data(t_res);
 
--- Create convenient views for distinct data access
-CREATE OR REPLACE VIEW national_data_unique AS
+CREATE INDEX IF NOT EXISTS national_data_row_hash_idx ON national_data(row_hash);
+CREATE INDEX IF NOT EXISTS spatial_data_row_hash_idx ON spatial_data(row_hash);
+CREATE INDEX IF NOT EXISTS temporal_data_row_hash_idx ON temporal_data(row_hash);
+
+CREATE INDEX IF NOT EXISTS national_data_country_key_year_idx ON national_data(country_key, year);
+CREATE INDEX IF NOT EXISTS spatial_data_country_key_region_year_idx ON spatial_data(country_key, adm_1_name, year);
+-- Covers the /temporal/data columns and its (calendar_start_date, id) page order, so pages are index-only seeks
+CREATE INDEX IF NOT EXISTS temporal_data_country_key_start_idx ON temporal_data(country_key, calendar_start_date, id)
+    INCLUDE (adm_0_name, calendar_end_date, year, dengue_total, t_res);
+
+-- Deduplicated copies of the source tables, keeping the latest row (highest id) per key.
+-- They are materialized views rebuilt by refresh_rollups() after each import, so reads never
+-- sort the raw tables. Earlier schemas defined them as plain views; replace those.
+DO $$
+DECLARE
+    view_name TEXT;
+BEGIN
+    FOR view_name IN
+        SELECT relname FROM pg_class
+        WHERE relkind = 'v' AND relname IN ('national_data_unique', 'spatial_data_unique', 'temporal_data_unique')
+    LOOP
+        EXECUTE format('DROP VIEW %I', view_name);
+    END LOOP;
+END $$;
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS national_data_unique AS
 SELECT DISTINCT ON (iso_a0, calendar_start_date, calendar_end_date) *
 FROM national_data
-ORDER BY iso_a0, calendar_start_date, calendar_end_date, id DESC;
+ORDER BY iso_a0, calendar_start_date, calendar_end_date, id DESC
+WITH NO DATA;
 
-CREATE OR REPLACE VIEW spatial_data_unique AS
+CREATE MATERIALIZED VIEW IF NOT EXISTS spatial_data_unique AS
 SELECT DISTINCT ON (iso_a0, adm_1_name, adm_2_name, calendar_start_date, calendar_end_date) *
 FROM spatial_data
-ORDER BY iso_a0, adm_1_name, adm_2_name, calendar_start_date, calendar_end_date, id DESC;
-    
-CREATE OR REPLACE VIEW temporal_data_unique AS
-SELECT DISTINCT ON (iso_a0, calendar_start_date, calendar_end_date, t_res) *
+ORDER BY iso_a0, adm_1_name, adm_2_name, calendar_start_date, calendar_end_date, id DESC
+WITH NO DATA;
+
+-- Regional rows of the same week are distinct records, so the region is part of the key
+CREATE MATERIALIZED VIEW IF NOT EXISTS temporal_data_unique AS
+SELECT DISTINCT ON (iso_a0, adm_1_name, adm_2_name, calendar_start_date, calendar_end_date, t_res) *
 FROM temporal_data
-ORDER BY iso_a0, calendar_start_date, calendar_end_date, t_res, id DESC;
\ No newline at end of file
+ORDER BY iso_a0, adm_1_name, adm_2_name, calendar_start_date, calendar_end_date, t_res, id DESC
+WITH NO DATA;
+
+-- Unique id indexes allow REFRESH MATERIALIZED VIEW CONCURRENTLY, so readers are never blocked
+CREATE UNIQUE INDEX IF NOT EXISTS national_data_unique_id_idx ON national_data_unique(id);
+CREATE UNIQUE INDEX IF NOT EXISTS spatial_data_unique_id_idx ON spatial_data_unique(id);
+CREATE UNIQUE INDEX IF NOT EXISTS temporal_data_unique_id_idx ON temporal_data_unique(id);
+
+CREATE INDEX IF NOT EXISTS national_data_unique_country_key_year_idx ON national_data_unique(country_key, year);
+CREATE INDEX IF NOT EXISTS spatial_data_unique_country_key_region_year_idx ON spatial_data_unique(country_key, adm_1_name, year);
+CREATE INDEX IF NOT EXISTS temporal_data_unique_country_key_start_idx ON temporal_data_unique(country_key, calendar_start_date, id)
+    INCLUDE (adm_0_name, calendar_end_date, year, dengue_total, t_res);
+
+-- Refresh a deduplicated materialized view, concurrently once it has been populated
+CREATE OR REPLACE FUNCTION refresh_unique_view(view_name TEXT) RETURNS void AS $$
+BEGIN
+    IF (SELECT relispopulated FROM pg_class WHERE oid = view_name::regclass) THEN
+        EXECUTE format('REFRESH MATERIALIZED VIEW CONCURRENTLY %I', view_name);
+    ELSE
+        EXECUTE format('REFRESH MATERIALIZED VIEW %I', view_name);
+    END IF;
+    EXECUTE format('ANALYZE %I', view_name);
+END;
+$$ LANGUAGE plpgsql;
+
+-- Create rollup tables holding precomputed aggregates for the API
+CREATE TABLE IF NOT EXISTS national_year_rollup (
+    adm_0_name VARCHAR(255),
+    year INT,
+    dengue_total FLOAT,
+    record_count BIGINT
+);
+
+CREATE TABLE IF NOT EXISTS spatial_region_year_rollup (
+    adm_0_name VARCHAR(255),
+    adm_1_name VARCHAR(255),
+    year INT,
+    dengue_total FLOAT,
+    record_count BIGINT
+);
+
+-- Serves /aggregate requests by resolution as well as by region and year
+CREATE TABLE IF NOT EXISTS temporal_region_year_rollup (
+    adm_0_name VARCHAR(255),
+    adm_1_name VARCHAR(255),
+    year INT,
+    s_res VARCHAR(50),
+    t_res VARCHAR(50),
+    dengue_total FLOAT,
+    record_count BIGINT
+);
+
+ALTER TABLE national_year_rollup ADD COLUMN IF NOT EXISTS country_key VARCHAR(255) GENERATED ALWAYS AS (lower(btrim(adm_0_name))) STORED;
+ALTER TABLE spatial_region_year_rollup ADD COLUMN IF NOT EXISTS country_key VARCHAR(255) GENERATED ALWAYS AS (lower(btrim(adm_0_name))) STORED;
+ALTER TABLE temporal_region_year_rollup ADD COLUMN IF NOT EXISTS country_key VARCHAR(255) GENERATED ALWAYS AS (lower(btrim(adm_0_name))) STORED;
+
+-- Count of non-NULL totals and their extremes, so /aggregate can compute means, minima and maxima from the rollups
+ALTER TABLE national_year_rollup ADD COLUMN IF NOT EXISTS value_count BIGINT;
+ALTER TABLE national_year_rollup ADD COLUMN IF NOT EXISTS min_total FLOAT;
+ALTER TABLE national_year_rollup ADD COLUMN IF NOT EXISTS max_total FLOAT;
+ALTER TABLE spatial_region_year_rollup ADD COLUMN IF NOT EXISTS value_count BIGINT;
+ALTER TABLE spatial_region_year_rollup ADD COLUMN IF NOT EXISTS min_total FLOAT;
+ALTER TABLE spatial_region_year_rollup ADD COLUMN IF NOT EXISTS max_total FLOAT;
+ALTER TABLE temporal_region_year_rollup ADD COLUMN IF NOT EXISTS value_count BIGINT;
+ALTER TABLE temporal_region_year_rollup ADD COLUMN IF NOT EXISTS min_total FLOAT;
+ALTER TABLE temporal_region_year_rollup ADD COLUMN IF NOT EXISTS max_total FLOAT;
+
+CREATE INDEX IF NOT EXISTS national_year_rollup_country_key_year_idx ON national_year_rollup(country_key, year);
+CREATE INDEX IF NOT EXISTS spatial_region_year_rollup_country_key_year_idx ON spatial_region_year_rollup(country_key, year);
+CREATE INDEX IF NOT EXISTS temporal_region_year_rollup_country_key_year_idx ON temporal_region_year_rollup(country_key, year);
+
+-- Track which source rows each rollup was built from so the API can detect stale rollups
+CREATE TABLE IF NOT EXISTS rollup_status (
+    rollup_name VARCHAR(100) PRIMARY KEY,
+    source_table VARCHAR(100) NOT NULL,
+    source_max_id BIGINT,
+    refreshed_at TIMESTAMP NOT NULL DEFAULT now()
+);
+
+ALTER TABLE rollup_status ADD COLUMN IF NOT EXISTS source_generation BIGINT;
+
+-- Rebuild the deduplicated view of a source table and the rollups built from it; run after
+-- an import changes the table
+CREATE OR REPLACE FUNCTION refresh_table_rollups(source_table TEXT) RETURNS void AS $$
+DECLARE
+    view_name TEXT := source_table || '_unique';
+    rollup_name TEXT;
+BEGIN
+    PERFORM refresh_unique_view(view_name);
+
+    IF source_table = 'national_data' THEN
+        rollup_name := 'national_year_rollup';
+        TRUNCATE national_year_rollup;
+        INSERT INTO national_year_rollup (adm_0_name, year, dengue_total, record_count, value_count, min_total, max_total)
+        SELECT adm_0_name, year, SUM(dengue_total), COUNT(*), COUNT(dengue_total), MIN(dengue_total), MAX(dengue_total)
+        FROM national_data_unique
+        GROUP BY adm_0_name, year;
+    ELSIF source_table = 'spatial_data' THEN
+        rollup_name := 'spatial_region_year_rollup';
+        TRUNCATE spatial_region_year_rollup;
+        INSERT INTO spatial_region_year_rollup (adm_0_name, adm_1_name, year, dengue_total, record_count, value_count, min_total, max_total)
+        SELECT adm_0_name, adm_1_name, year, SUM(dengue_total), COUNT(*), COUNT(dengue_total), MIN(dengue_total), MAX(dengue_total)
+        FROM spatial_data_unique
+        GROUP BY adm_0_name, adm_1_name, year;
+    ELSIF source_table = 'temporal_data' THEN
+        rollup_name := 'temporal_region_year_rollup';
+        TRUNCATE temporal_region_year_rollup;
+        INSERT INTO temporal_region_year_rollup (adm_0_name, adm_1_name, year, s_res, t_res, dengue_total, record_count, value_count, min_total, max_total)
+        SELECT adm_0_name, adm_1_name, year, s_res, t_res, SUM(dengue_total), COUNT(*), COUNT(dengue_total), MIN(dengue_total), MAX(dengue_total)
+        FROM temporal_data_unique
+        GROUP BY adm_0_name, adm_1_name, year, s_res, t_res;
+    ELSE
+        RAISE EXCEPTION 'No rollups are built from %', source_table;
+    END IF;
+
+    EXECUTE format(
+        'INSERT INTO rollup_status (rollup_name, source_table, source_max_id, source_generation, refreshed_at) '
+        'SELECT unnest(ARRAY[%L, %L]), %L, (SELECT MAX(id) FROM %I), data_generation(%L), now() '
+        'ON CONFLICT (rollup_name) DO UPDATE '
+        'SET source_table = EXCLUDED.source_table, '
+        '    source_max_id = EXCLUDED.source_max_id, '
+        '    source_generation = EXCLUDED.source_generation, '
+        '    refreshed_at = EXCLUDED.refreshed_at',
+        view_name, rollup_name, source_table, source_table, source_table
+    );
+
+    EXECUTE format('ANALYZE %I', rollup_name);
+END;
+$$ LANGUAGE plpgsql;
+
+-- Rebuild the deduplicated views and rollups of every source table
+CREATE OR REPLACE FUNCTION refresh_rollups() RETURNS void AS $$
+BEGIN
+    PERFORM refresh_table_rollups('national_data');
+    PERFORM refresh_table_rollups('spatial_data');
+    PERFORM refresh_table_rollups('temporal_data');
+END;
+$$ LANGUAGE plpgsql;
+
+-- Forecast model parameters and backtest accuracy, replaced by each run of api/train_models.py
+CREATE TABLE IF NOT EXISTS forecast_models (
+    id SERIAL PRIMARY KEY,
+    country_key VARCHAR(255) NOT NULL,
+    region_key VARCHAR(255),
+    adm_0_name VARCHAR(255),
+    adm_1_name VARCHAR(255),
+    model VARCHAR(50) NOT NULL,
+    selected BOOLEAN NOT NULL DEFAULT false,
+    parameters JSONB,
+    history_end DATE,
+    mae FLOAT,
+    mape FLOAT,
+    coverage FLOAT,
+    points INT,
+    horizon INT,
+    folds INT,
+    source_max_id BIGINT,
+    source_generation BIGINT,
+    trained_at TIMESTAMP NOT NULL DEFAULT now()
+);
+
+ALTER TABLE forecast_models ADD COLUMN IF NOT EXISTS source_generation BIGINT;
+
+CREATE INDEX IF NOT EXISTS forecast_models_country_key_region_key_idx ON forecast_models(country_key, region_key);
+
+-- Periods flagged as outbreaks in each series of temporal_data and spatial_data, kept up
+-- to date by api/detect_outbreaks.py after each import
+CREATE TABLE IF NOT EXISTS outbreak_alerts (
+    id SERIAL PRIMARY KEY,
+    source VARCHAR(20) NOT NULL,
+    country_key VARCHAR(255) NOT NULL,
+    region_key VARCHAR(255),
+    adm_0_name VARCHAR(255),
+    adm_1_name VARCHAR(255),
+    t_res VARCHAR(50),
+    period_start DATE NOT NULL,
+    period_end DATE,
+    cases FLOAT,
+    expected FLOAT,
+    threshold FLOAT,
+    score FLOAT,
+    method VARCHAR(50) NOT NULL,
+    detected_at TIMESTAMP NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS outbreak_alerts_period_start_idx ON outbreak_alerts(period_start);
+CREATE INDEX IF NOT EXISTS outbreak_alerts_country_key_region_key_idx ON outbreak_alerts(country_key, region_key, period_start);
+
+CREATE TABLE IF NOT EXISTS outbreak_status (
+    source_table VARCHAR(100) PRIMARY KEY,
+    source_max_id BIGINT,
+    source_generation BIGINT,
+    detected_at TIMESTAMP NOT NULL DEFAULT now()
+);
@@ -1,5 +1,12 @@
-from flask import Flask, render_template, request, jsonify
+from collections import OrderedDict, namedtuple
+import json
+import threading
+import time
+from urllib.parse import quote
+from flask import Flask, Response, render_template, request, jsonify
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import os
 from dotenv import load_dotenv
 from filters import format_number
@@ -15,14 +22,117 @@ app.jinja_env.filters['format_number'] = format_number
 API_HOST = os.getenv("API_HOST", "dengue-api")
 API_PORT = os.getenv("API_PORT", "8000")
 API_BASE_URL = f"http://{API_HOST}:{API_PORT}"
+API_CONNECT_TIMEOUT = float(os.getenv("API_CONNECT_TIMEOUT", "3"))
+API_READ_TIMEOUT = float(os.getenv("API_READ_TIMEOUT", "30"))
+API_RETRIES = int(os.getenv("API_RETRIES", "2"))
+API_POOL_SIZE = int(os.getenv("API_POOL_SIZE", "20"))
+PROXY_CACHE_MAX_ENTRIES = int(os.getenv("PROXY_CACHE_MAX_ENTRIES", "256"))
+CHART_MAX_POINTS = int(os.getenv("CHART_MAX_POINTS", "300"))
+
+# Response headers kept with cached API responses and passed on to the browser
+VALIDATOR_HEADERS = ('ETag', 'Last-Modified', 'Cache-Control')
+
+def create_session():
+    """HTTP session that keeps up to API_POOL_SIZE connections to the API alive and retries failed GETs"""
+    retry = Retry(
+        total=API_RETRIES,
+        backoff_factor=0.2,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset(["GET"])
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=API_POOL_SIZE, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+# Shared by all requests, so calls reuse open connections instead of reconnecting each time
+session = create_session()
+
+# An API response body with its validator headers, reused until expires_at (time.monotonic)
+CachedResponse = namedtuple('CachedResponse', ['body', 'headers', 'expires_at'])
+
+class ResponseCache:
+    """Small in-process LRU cache of API responses"""
+
+    def __init__(self, max_entries=PROXY_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+response_cache = ResponseCache()
+
+def max_age(cache_control):
+    """Seconds a response may be reused without revalidation under its Cache-Control header, or None if it must not be stored"""
+    directives = [directive.strip().lower() for directive in (cache_control or '').split(',')]
+    if 'no-store' in directives:
+        return None
+    if 'no-cache' in directives:
+        return 0
+    for directive in directives:
+        if directive.startswith('max-age='):
+            try:
+                return int(directive[len('max-age='):])
+            except ValueError:
+                return 0
+    return 0
+
+def fetch_api(endpoint, params=None, conditional_headers=None):
+    """GET an API endpoint through the response cache and return its body and validator headers.
+
+    Cached responses are reused until their max-age passes and then revalidated with their ETag,
+    so unchanged data is not transferred again. Without a cached response, conditional_headers
+    (If-None-Match, If-Modified-Since) are sent as they are; the body is None when the API
+    answers 304 to them.
+    """
+    key = (endpoint, tuple(sorted((params or {}).items())))
+    entry = response_cache.get(key)
+    if entry is not None and time.monotonic() < entry.expires_at:
+        return entry.body, entry.headers
+
+    if entry is not None:
+        conditional_headers = {'If-None-Match': entry.headers['ETag']} if 'ETag' in entry.headers else None
+    response = session.get(
+        f"{API_BASE_URL}{endpoint}",
+        params=params,
+        headers=conditional_headers,
+        timeout=(API_CONNECT_TIMEOUT, API_READ_TIMEOUT)
+    )
+    headers = {name: response.headers[name] for name in VALIDATOR_HEADERS if name in response.headers}
+    if response.status_code == 304:
+        if entry is None:
+            return None, headers
+        body = entry.body
+        headers = {**entry.headers, **headers}
+    else:
+        response.raise_for_status()
+        body = response.content
+
+    seconds = max_age(headers.get('Cache-Control'))
+    if seconds is not None and (seconds > 0 or 'ETag' in headers):
+        response_cache.set(key, CachedResponse(body, headers, time.monotonic() + seconds))
+    return body, headers
 
 def get_api_data(endpoint, params=None):
     """Helper function to call the API"""
     try:
-        response = requests.get(f"{API_BASE_URL}{endpoint}", params=params)
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
+        body, _ = fetch_api(endpoint, params)
+        return json.loads(body)
+    except (requests.exceptions.RequestException, ValueError) as e:
         print(f"API error: {str(e)}")
         return {"status": "error", "data": None, "message": str(e)}
 
@@ -30,24 +140,19 @@ def get_api_data(endpoint, params=None):
 def index():
     """Main dashboard page"""
     try:
-        # Get stats for dashboard
-        stats_response = get_api_data('/national/stats')
-        stats = stats_response.get('data', {})
-        
-        # Get top countries
-        countries_response = get_api_data('/national/countries', {'limit': 10})
-        countries = countries_response.get('data', [])
-        
-        # Get yearly data
-        yearly_response = get_api_data('/national/yearly')
-        yearly_data = yearly_response.get('data', [])
+        # Get stats, top countries and yearly data for the dashboard in one call
+        dashboard_response = get_api_data('/dashboard/global', {'limit': 10})
+        dashboard = dashboard_response.get('data') or {}
+        stats = dashboard.get('stats', {})
+        countries = dashboard.get('countries', [])
+        yearly_data = dashboard.get('yearly', [])
         
         return render_template(
             'index.html',
             stats=stats,
             countries=countries,
             yearly_data=yearly_data,
-            api_status=stats_response.get('status', 'error')
+            api_status=dashboard_response.get('status', 'error')
         )
     except Exception as e:
         return render_template('error.html', error=str(e))
@@ -56,17 +161,17 @@ def index():
 def country_details(country_name):
     """Country detail page"""
     try:
-        # Get country yearly data
-        yearly_response = get_api_data('/national/yearly', {'country': country_name})
-        yearly_data = yearly_response.get('data', [])
-        
-        # Get regional data for the country
-        regions_response = get_api_data('/spatial/regions', {'country': country_name, 'limit': 20})
-        regions = regions_response.get('data', [])
-        
-        # Get temporal data for the country
-        temporal_response = get_api_data('/temporal/data', {'country': country_name, 'limit': 100})
-        temporal_data = temporal_response.get('data', [])
+        # Get yearly, regional and temporal data for the country in one call, with the
+        # weekly series for the chart downsampled to at most CHART_MAX_POINTS points
+        dashboard_response = get_api_data(
+            f"/dashboard/country/{quote(country_name, safe='')}",
+            {'regions_limit': 20, 'temporal_limit': 100, 'series_resolution': 'week', 'series_max_points': CHART_MAX_POINTS}
+        )
+        dashboard = dashboard_response.get('data') or {}
+        yearly_data = dashboard.get('yearly', [])
+        regions = dashboard.get('regions', {}).get('data', [])
+        temporal_data = dashboard.get('temporal', {}).get('data', [])
+        series = dashboard.get('series', [])
         
         return render_template(
             'country.html',
@@ -74,17 +179,29 @@ def country_details(country_name):
             yearly_data=yearly_data,
             regions=regions,
             temporal_data=temporal_data,
-            api_status=yearly_response.get('status', 'error')
+            series=series,
+            api_status=dashboard_response.get('status', 'error')
         )
     except Exception as e:
         return render_template('error.html', error=str(e))
 
 @app.route('/api/proxy/<path:endpoint>')
 def api_proxy(endpoint):
-    """Proxy API requests to backend API service"""
+    """Proxy API requests to backend API service, passing cache validators through"""
     params = {k: v for k, v in request.args.items()}
-    response = get_api_data(f'/{endpoint}', params)
-    return jsonify(response)
+    conditional_headers = {
+        name: request.headers[name] for name in ('If-None-Match', 'If-Modified-Since') if name in request.headers
+    }
+    try:
+        body, headers = fetch_api(f'/{endpoint}', params, conditional_headers)
+    except requests.exceptions.RequestException as e:
+        print(f"API error: {str(e)}")
+        return jsonify({"status": "error", "data": None, "message": str(e)})
+
+    if body is None:
+        return Response(status=304, headers=headers)
+    # Answers 304 itself when the browser's validators match the response
+    return Response(body, mimetype='application/json', headers=headers).make_conditional(request)
 
 @app.route('/health')
 def health():